@@ -1,5 +1,5 @@
 # Interface_grafica.py
-# Janela simples de logs em tempo real para conectar no Tee do seu main.
+# Janela simples de logs em tempo real, registrada como destino do RegistroAssincrono do main.
 
 import threading
 import queue
@@ -9,52 +9,67 @@ from tkinter import ttk
 
 
 class _GuiStream:
-    """Stream compatível com Tee: implementa write/flush e entrega linhas à fila da GUI."""
+    """Destino do RegistroAssincrono: implementa write/flush e entrega linhas à fila da GUI."""
     def __init__(self, q: queue.Queue):
         self._q = q
-        self._buf = []
+        # pedaços da linha ainda sem quebra; só são unidos quando a linha fecha
+        self._parcial = []
 
     def write(self, data: str):
         if not data:
             return
-        # Acumula e envia por linha; preserva quebras parciais do Tee/print
-        self._buf.append(data)
-        joined = "".join(self._buf)
-        if "\n" in joined:
-            lines = joined.split("\n")
-            # mantém o pedaço final (possível linha incompleta) no buffer
-            self._buf = [lines.pop()]
-            for line in lines:
-                if line:  # ignora linhas vazias estritas
-                    self._q.put_nowait(line)
-        else:
+        if "\n" not in data:
             # sem newline ainda, só acumula
-            pass
+            self._parcial.append(data)
+            return
+        # Envia por linha; preserva quebras parciais entre chamadas de write
+        lines = data.split("\n")
+        self._parcial.append(lines[0])
+        lines[0] = "".join(self._parcial)
+        # mantém o pedaço final (possível linha incompleta) pendente
+        ultimo = lines.pop()
+        self._parcial = [ultimo] if ultimo else []
+        for line in lines:
+            if line:  # ignora linhas vazias estritas
+                self._q.put_nowait(line)
 
     def flush(self):
         # Se quiser forçar envio do que sobrou sem newline:
-        if self._buf:
-            pending = "".join(self._buf).strip()
+        if self._parcial:
+            pending = "".join(self._parcial).strip()
             if pending:
                 self._q.put_nowait(pending)
-            self._buf.clear()
+            self._parcial = []
 
 
 class LogViewer:
     """
     Janela com ScrolledText para exibir logs em tempo real.
-    Use .stream para plugar no seu Tee: Tee(sys.stdout, log, viewer.stream)
+    Registre .stream como destino do log: registro.adiciona_destino(viewer.stream)
     Chame .start() para abrir a janela sem bloquear seu fluxo.
+    A fila é drenada em lotes (um insert por ciclo) e a área de logs guarda só as últimas
+    `max_linhas` linhas. O painel de etapas é alimentado por .evento(etapa, **campos).
     """
-    def __init__(self, title: str = "Execução em tempo real - Logs", geometry: str = "900x520"):
+    COLUNAS_PROGRESSO = ("status", "fase", "percentual", "linhas", "MB")
+
+    def __init__(self, title: str = "Execução em tempo real - Logs", geometry: str = "900x620",
+                 max_linhas: int = 5000, lote_max: int = 2000, intervalo_ms: int = 100):
         self._title = title
         self._geometry = geometry
+        self._max_linhas = max_linhas
+        self._lote_max = lote_max
+        self._intervalo_ms = intervalo_ms
         self._q = queue.Queue()
-        self.stream = _GuiStream(self._q)  # <-- este é o "arquivo" para o Tee
+        self.stream = _GuiStream(self._q)  # <-- destino para RegistroAssincrono.adiciona_destino
         self._thread = None
         self._root = None
         self._text = None
+        self._arvore = None
         self._closing = False
+        # estado do painel de progresso: etapa -> campos (só o último valor de cada campo importa)
+        self._progresso = {}
+        self._progresso_alterado = set()
+        self._trava = threading.Lock()
 
     # ---------- API pública ----------
     def start(self):
@@ -73,6 +88,15 @@ class LogViewer:
             except Exception:
                 pass
 
+    def evento(self, etapa: str, **campos):
+        """
+        Atualiza o painel de progresso da etapa (status, fase, percentual, linhas, bytes_baixados).
+        Pode ser chamado de qualquer thread, ex.: metricas.assina(viewer.evento).
+        """
+        with self._trava:
+            self._progresso.setdefault(etapa, {}).update(campos)
+            self._progresso_alterado.add(etapa)
+
     # ---------- Internos ----------
     def _run(self):
         # Cria UI
@@ -80,6 +104,15 @@ class LogViewer:
         self._root.title(self._title)
         self._root.geometry(self._geometry)
 
+        # Painel de progresso por etapa
+        self._arvore = ttk.Treeview(self._root, columns=self.COLUNAS_PROGRESSO, height=7)
+        self._arvore.heading("#0", text="etapa")
+        self._arvore.column("#0", width=200)
+        for coluna in self.COLUNAS_PROGRESSO:
+            self._arvore.heading(coluna, text=coluna)
+            self._arvore.column(coluna, width=110, anchor="center")
+        self._arvore.pack(fill="x", padx=8, pady=(8, 0))
+
         # Caixa de texto com rolagem
         self._text = ScrolledText(self._root, wrap="word")
         self._text.pack(fill="both", expand=True, padx=8, pady=8)
@@ -91,7 +124,7 @@ class LogViewer:
         ttk.Button(bar, text="Limpar", command=self._clear).pack(side="left")
 
         # Poll da fila de logs
-        self._root.after(100, self._poll_queue)
+        self._root.after(self._intervalo_ms, self._poll_queue)
         self._root.protocol("WM_DELETE_WINDOW", self.stop)
 
         # Loop da interface
@@ -102,21 +135,57 @@ class LogViewer:
         self._text.delete("1.0", "end")
         self._text.config(state="disabled")
 
-    def _append_line(self, line: str):
+    def _append_lines(self, lines):
+        """Insere um lote de linhas com um único insert e descarta as mais antigas além de max_linhas."""
         self._text.config(state="normal")
-        self._text.insert("end", line + "\n")
+        self._text.insert("end", "\n".join(lines) + "\n")
+        excesso = int(self._text.index("end-1c").split(".")[0]) - 1 - self._max_linhas
+        if excesso > 0:
+            self._text.delete("1.0", f"{excesso + 1}.0")
         self._text.see("end")
         self._text.config(state="disabled")
 
+    def _atualiza_progresso(self):
+        with self._trava:
+            alterados = {etapa: dict(self._progresso[etapa]) for etapa in self._progresso_alterado}
+            self._progresso_alterado.clear()
+        for etapa, campos in alterados.items():
+            percentual = campos.get("percentual")
+            valores = (
+                campos.get("status", ""),
+                campos.get("fase", ""),
+                f"{percentual}%" if percentual not in (None, "") else "",
+                campos.get("linhas", "") or "",
+                f"{campos['bytes_baixados'] / (1024 * 1024):.1f}" if campos.get("bytes_baixados") else "",
+            )
+            if self._arvore.exists(etapa):
+                self._arvore.item(etapa, values=valores)
+            else:
+                self._arvore.insert("", "end", iid=etapa, text=etapa, values=valores)
+
     def _poll_queue(self):
         if self._closing:
             return
+        lote = []
+        # se a fila estiver muito atrasada, descarta o que não caberia na janela (fica só no log em arquivo)
+        descartadas = 0
+        try:
+            while self._q.qsize() > self._max_linhas:
+                self._q.get_nowait()
+                descartadas += 1
+        except queue.Empty:
+            pass
+        if descartadas:
+            lote.append(f"... {descartadas} linhas omitidas na janela (consulte o arquivo de log) ...")
+        # drena até lote_max linhas e insere tudo de uma vez
         try:
-            while True:
-                line = self._q.get_nowait()
-                self._append_line(line)
+            for _ in range(self._lote_max):
+                lote.append(self._q.get_nowait())
         except queue.Empty:
             pass
-        # agenda próximo polling
+        if lote:
+            self._append_lines(lote)
+        self._atualiza_progresso()
+        # agenda próximo polling (logo em seguida se ainda há fila acumulada)
         if self._root and not self._closing:
-            self._root.after(100, self._poll_queue)
+            self._root.after(1 if not self._q.empty() else self._intervalo_ms, self._poll_queue)
@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metricas
+
+
+class Etapa:
+    """
+    Uma etapa do book: nome, função sem argumentos e nomes das etapas das quais depende.
+    """
+    def __init__(self, nome, funcao, depende=()):
+        self.nome = nome
+        self.funcao = funcao
+        self.depende = tuple(depende)
+
+
+def _valida(etapas):
+    """Confere nomes duplicados, dependências inexistentes e ciclos."""
+    nomes = {}
+    for etapa in etapas:
+        if etapa.nome in nomes:
+            raise ValueError(f"Etapa duplicada: {etapa.nome}")
+        nomes[etapa.nome] = etapa
+
+    for etapa in etapas:
+        for dep in etapa.depende:
+            if dep not in nomes:
+                raise ValueError(f"Etapa '{etapa.nome}' depende de '{dep}', que não existe.")
+
+    # Detecta ciclo com busca em profundidade
+    visitando, concluidas = set(), set()
+
+    def visita(nome):
+        if nome in concluidas:
+            return
+        if nome in visitando:
+            raise ValueError(f"Ciclo de dependências envolvendo a etapa '{nome}'.")
+        visitando.add(nome)
+        for dep in nomes[nome].depende:
+            visita(dep)
+        visitando.discard(nome)
+        concluidas.add(nome)
+
+    for nome in nomes:
+        visita(nome)
+
+
+def executa_etapas(etapas, max_workers=None, tempos=None):
+    """
+    Executa as etapas em um pool de threads respeitando as dependências.
+    Etapas independentes rodam em paralelo, na ordem em que foram declaradas.
+    Se uma etapa lançar exceção, as que dependem dela são puladas.
+    Retorna um dict nome -> resultado (ou a exceção lançada).
+    Se `tempos` for um dict, recebe a duração em segundos de cada etapa executada.
+    """
+    _valida(etapas)
+
+    pendentes = list(etapas)
+    resultados = {}
+    falhas = set()
+    duracoes = {} if tempos is None else tempos
+    inicio_geral = time.perf_counter()
+
+    def roda(etapa):
+        inicio = time.perf_counter()
+        try:
+            with metricas.etapa(etapa.nome):
+                return etapa.funcao()
+        finally:
+            duracoes[etapa.nome] = time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(etapas) or 1,
+                            thread_name_prefix="etapa") as pool:
+        em_execucao = {}
+
+        while pendentes or em_execucao:
+            # Dispara tudo o que já tem as dependências resolvidas
+            for etapa in list(pendentes):
+                if any(dep in falhas for dep in etapa.depende):
+                    pendentes.remove(etapa)
+                    falhas.add(etapa.nome)
+                    print(f"[agendador] etapa '{etapa.nome}' pulada: dependência falhou.")
+                elif all(dep in resultados for dep in etapa.depende):
+                    pendentes.remove(etapa)
+                    print(f"[agendador] iniciando etapa '{etapa.nome}'")
+                    em_execucao[pool.submit(roda, etapa)] = etapa
+
+            if not em_execucao:
+                continue
+
+            prontas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in prontas:
+                etapa = em_execucao.pop(futuro)
+                try:
+                    resultados[etapa.nome] = futuro.result()
+                    print(f"[agendador] etapa '{etapa.nome}' concluída em {duracoes[etapa.nome]:.1f}s")
+                except Exception as e:
+                    resultados[etapa.nome] = e
+                    falhas.add(etapa.nome)
+                    print(f"[agendador] [ERRO] etapa '{etapa.nome}' falhou: {e.__class__.__name__}: {e}")
+
+    print(f"[agendador] todas as etapas finalizadas em {time.perf_counter() - inicio_geral:.1f}s")
+    return resultados
@@ -0,0 +1,234 @@
+"""
+Armazém local (SQLite) com as abas de todas as execuções do book, para consultas entre meses
+sem abrir os .xlsx. Cada aba vira uma tabela particionada por (cliente, ano_mes_ref): regravar
+o mesmo mês de um cliente substitui a partição. Índices na partição e nas chaves naturais.
+
+Uso:
+    python armazem.py "SELECT cliente, ano_mes_ref, risk FROM indices ORDER BY ano_mes_ref"
+    python armazem.py --banco armazem_book.db --cargas
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+import metricas
+
+# aba do book -> tabela no armazém
+TABELAS = {
+    "Compliance SWP": "compliance_swp",
+    "Compliance SEP": "compliance_sep",
+    "Indices": "indices",
+    "Alertas WB": "alertas_wb",
+    "endpoint inventory": "endpoint_inventory",
+    "vulnerabilidades": "vulnerabilidades",
+    # vulns_modo=normalizado
+    "vulns dispositivos": "vulns_dispositivos",
+    "vulns CVEs": "vulns_cves",
+    "vulns dispositivo x CVE": "vulns_dispositivo_cve",
+    # resumos.py
+    "Resumo alertas": "resumo_alertas",
+    "Resumo top CVEs": "resumo_top_cves",
+    "Resumo endpoints": "resumo_endpoints",
+    "Resumo vulneráveis": "resumo_vulneraveis",
+}
+
+# chaves naturais indexadas (só as que existirem na tabela). Em vulnerabilidades, "id" é o
+# dispositivo e "id_2" a CVE (colunas repetidas recebem sufixo _2, _3, ...)
+CHAVES_NATURAIS = {
+    "compliance_swp": [("Feature name",)],
+    "compliance_sep": [("Feature name",)],
+    "alertas_wb": [("id",), ("severity",), ("model",)],
+    "endpoint_inventory": [("agentGuid",), ("endpointName",)],
+    "vulnerabilidades": [("id",), ("id_2",), ("deviceName",)],
+    "vulns_dispositivos": [("id",), ("deviceName",)],
+    "vulns_cves": [("id",)],
+    "vulns_dispositivo_cve": [("deviceId",), ("cveId",)],
+}
+
+PARTICAO = ("cliente", "ano_mes_ref")
+
+
+def _ident(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def _tipo_sql(serie):
+    dtype = serie.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    if dtype.kind in "iub":
+        return "INTEGER"
+    if dtype.kind == "f":
+        return "REAL"
+    return "TEXT"
+
+
+def _valor(v):
+    """Converte um valor do DataFrame para um tipo aceito pelo SQLite."""
+    if v is None or isinstance(v, (str, int)):
+        return v
+    if isinstance(v, float):
+        return None if v != v else v
+    if isinstance(v, (dict, list, tuple)):
+        return json.dumps(v, ensure_ascii=False, default=str)
+    if v is pd.NA or v is pd.NaT:
+        return None
+    if isinstance(v, (pd.Timestamp, datetime)):
+        return v.isoformat()
+    if hasattr(v, "item"):  # escalares numpy
+        v = v.item()
+        return None if isinstance(v, float) and v != v else v
+    return str(v)
+
+
+def _colunas_unicas(colunas):
+    """Renomeia colunas repetidas: id, id -> id, id_2."""
+    vistas = {}
+    saida = []
+    for c in map(str, colunas):
+        vistas[c] = vistas.get(c, 0) + 1
+        saida.append(c if vistas[c] == 1 else f"{c}_{vistas[c]}")
+    return saida
+
+
+def mes_ref(data_ref):
+    """'01/09/2026' -> '2026-09' (ordenável)."""
+    return datetime.strptime(data_ref, "%d/%m/%Y").strftime("%Y-%m")
+
+
+class Armazem:
+    """Armazém SQLite do book. Pode ser compartilhado por vários processos (lote)."""
+    def __init__(self, caminho="armazem_book.db", timeout=60):
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(caminho, timeout=timeout)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.conexao.execute(
+            "CREATE TABLE IF NOT EXISTS cargas (cliente TEXT, ano_mes_ref TEXT, tabela TEXT, linhas INTEGER, "
+            "gravado_em TEXT, PRIMARY KEY (cliente, ano_mes_ref, tabela))"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fecha()
+
+    def fecha(self):
+        self.conexao.close()
+
+    # ---------- gravação ----------
+    def grava(self, tabela, dados, cliente, ano_mes_ref):
+        """Substitui a partição (cliente, ano_mes_ref) da tabela pelas linhas de `dados`. Retorna as linhas."""
+        dados = dados.drop(columns=[c for c in PARTICAO if c in dados.columns])
+        colunas = _colunas_unicas(dados.columns)
+
+        with self.conexao:  # uma transação por tabela
+            # IMMEDIATE: a trava de escrita vem antes do CREATE/ALTER TABLE. Com vários processos
+            # gravando no mesmo arquivo (lote), os outros esperam até o timeout da conexão
+            self.conexao.execute("BEGIN IMMEDIATE")
+            self._prepara_tabela(tabela, colunas, dados)
+            self.conexao.execute(f"DELETE FROM {_ident(tabela)} WHERE cliente = ? AND ano_mes_ref = ?",
+                                 (cliente, ano_mes_ref))
+            if len(dados):
+                valores = [[_valor(v) for v in dados.iloc[:, i].tolist()] for i in range(dados.shape[1])]
+                linhas = zip([cliente] * len(dados), [ano_mes_ref] * len(dados), *valores)
+                marcadores = ", ".join("?" * (len(colunas) + 2))
+                nomes = ", ".join(_ident(c) for c in (*PARTICAO, *colunas))
+                self.conexao.executemany(f"INSERT INTO {_ident(tabela)} ({nomes}) VALUES ({marcadores})", linhas)
+            self.conexao.execute(
+                "INSERT OR REPLACE INTO cargas VALUES (?, ?, ?, ?, ?)",
+                (cliente, ano_mes_ref, tabela, len(dados), datetime.now().isoformat(timespec="seconds")),
+            )
+        return len(dados)
+
+    def grava_livro(self, livro, cliente, data_ref):
+        """Grava no armazém todas as abas do LivroExcel que tiverem dados."""
+        ano_mes_ref = mes_ref(data_ref)
+        for aba, tabela in TABELAS.items():
+            dados = livro.dados(aba)
+            if dados is None:
+                continue
+            linhas = self.grava(tabela, dados, cliente, ano_mes_ref)
+            metricas.registra(linhas=linhas)
+            print(f"[armazem] {tabela}: {linhas} linhas gravadas ({cliente}, {ano_mes_ref})")
+
+    def _prepara_tabela(self, tabela, colunas, dados):
+        """Cria a tabela e os índices, ou acrescenta as colunas novas (o export da API muda com o tempo)."""
+        existentes = [r[1] for r in self.conexao.execute(f"PRAGMA table_info({_ident(tabela)})")]
+        tipos = {c: _tipo_sql(dados.iloc[:, i]) for i, c in enumerate(colunas)}
+        if not existentes:
+            definicao = ", ".join([f"{_ident(c)} TEXT" for c in PARTICAO] +
+                                  [f"{_ident(c)} {tipos[c]}" for c in colunas])
+            self.conexao.execute(f"CREATE TABLE {_ident(tabela)} ({definicao})")
+            existentes = [*PARTICAO, *colunas]
+            self.conexao.execute(f"CREATE INDEX {_ident(f'ix_{tabela}_particao')} "
+                                 f"ON {_ident(tabela)} (cliente, ano_mes_ref)")
+        else:
+            for c in colunas:
+                if c not in existentes:
+                    self.conexao.execute(f"ALTER TABLE {_ident(tabela)} ADD COLUMN {_ident(c)} {tipos[c]}")
+                    existentes.append(c)
+
+        for chave in CHAVES_NATURAIS.get(tabela, []):
+            if all(c in existentes for c in chave):
+                nome = "ix_" + tabela + "_" + re.sub(r"\W+", "_", "_".join(chave))
+                colunas_ix = ", ".join(_ident(c) for c in chave)
+                self.conexao.execute(f"CREATE INDEX IF NOT EXISTS {_ident(nome)} "
+                                     f"ON {_ident(tabela)} (cliente, {colunas_ix})")
+
+    # ---------- consulta ----------
+    def consulta(self, sql, parametros=()):
+        """Executa um SELECT e devolve um DataFrame."""
+        return pd.read_sql_query(sql, self.conexao, params=parametros)
+
+    def cargas(self, cliente=None):
+        """Partições gravadas (cliente, mês, tabela, linhas)."""
+        if cliente:
+            return self.consulta("SELECT * FROM cargas WHERE cliente = ? ORDER BY ano_mes_ref, tabela", (cliente,))
+        return self.consulta("SELECT * FROM cargas ORDER BY cliente, ano_mes_ref, tabela")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o armazém SQLite do book.")
+    parser.add_argument("sql", nargs="?", help="consulta SQL (SELECT ...)")
+    parser.add_argument("--banco", default="armazem_book.db", help="arquivo do armazém")
+    parser.add_argument("--cargas", action="store_true", help="lista as partições gravadas")
+    parser.add_argument("--cliente", help="filtra --cargas por cliente")
+    parser.add_argument("--csv", help="grava o resultado em CSV em vez de imprimir")
+    args = parser.parse_args()
+    if not args.sql and not args.cargas:
+        parser.error("informe uma consulta SQL ou --cargas")
+
+    if not os.path.exists(args.banco):
+        print(f"[ERRO] Armazém não encontrado: {args.banco}")
+        return 1
+
+    with Armazem(args.banco) as armazem:
+        inicio = time.perf_counter()
+        try:
+            resultado = armazem.cargas(args.cliente) if args.cargas else armazem.consulta(args.sql)
+        except Exception as e:
+            print(f"[ERRO] Falha na consulta: {e}")
+            return 1
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+
+    if args.csv:
+        resultado.to_csv(args.csv, index=False)
+        print(f"[armazem] {len(resultado)} linhas gravadas em {args.csv}")
+    else:
+        with pd.option_context("display.max_rows", 200, "display.width", 200):
+            print(resultado.to_string(index=False))
+    print(f"[armazem] {len(resultado)} linhas em {duracao_ms:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Benchmark ponta a ponta do book contra o simulador local da API (simulador_visionone.py).
+
+Cada cenário roda em um subprocesso próprio (para o pico de RSS ser do cenário) e mede:
+tempo total, tempo por etapa, pico de memória (RSS) e tamanho do Excel gerado.
+
+Uso:
+    python benchmark_book.py --escala pequena media --repeticoes 3 --saida bench.json
+    python benchmark_book.py --escala media --compara bench_anterior.json --tolerancia 0.2
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+from simulador_visionone import ESCALAS, SimuladorVisionOne, gera_relatorios_zip
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo atual em MB (None se a plataforma não informar)."""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+
+def _executa_cenario(escala, opcoes, arquivo_resultado):
+    """Roda o book uma vez contra o simulador (dentro do subprocesso) e grava o resultado em JSON."""
+    from main_book import executa_book
+
+    pasta_trabalho = tempfile.mkdtemp(prefix="bench_book_")
+    os.chdir(pasta_trabalho)
+    gera_relatorios_zip(pasta_trabalho)
+
+    parametros = dict(ESCALAS[escala])
+    parametros.update(duracao_export=opcoes["duracao_export"], latencia=opcoes["latencia"],
+                      taxa_falhas=opcoes["taxa_falhas"], arquivos_por_export=opcoes["arquivos_por_export"])
+
+    tempos = {}
+    with SimuladorVisionOne(**parametros) as sim:
+        log = open(os.path.join(pasta_trabalho, "bench.log"), "w", encoding="utf-8")
+        inicio = time.perf_counter()
+        with log, contextlib.redirect_stdout(log):
+            arquivo_excel = executa_book("bench", sim.url, "token-simulado", pasta_trabalho,
+                                         tempos=tempos, intervalo_polling=opcoes["intervalo_polling"],
+                                         normalizado=opcoes.get("vulns_normalizado", False),
+                                         fluxo=opcoes.get("vulns_fluxo", False))
+        total = time.perf_counter() - inicio
+        requisicoes, falhas = sim.requisicoes, sim.falhas_injetadas
+
+    resultado = {
+        "escala": escala,
+        "parametros": parametros,
+        "tempo_total_s": round(total, 3),
+        "tempo_etapas_s": {nome: round(t, 3) for nome, t in tempos.items()},
+        "pico_rss_mb": round(pico_rss_mb() or 0, 1) or None,
+        "tamanho_excel_mb": round(os.path.getsize(arquivo_excel) / (1024 * 1024), 3),
+        "requisicoes_http": requisicoes,
+        "falhas_injetadas": falhas,
+    }
+    if opcoes.get("manter"):
+        resultado["pasta"] = pasta_trabalho
+    else:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(pasta_trabalho, ignore_errors=True)
+    with open(arquivo_resultado, "w", encoding="utf-8") as f:
+        json.dump(resultado, f)
+
+
+def roda_benchmark(escalas, repeticoes=1, **opcoes):
+    """Executa cada escala `repeticoes` vezes, cada uma em um subprocesso, e devolve a lista de resultados."""
+    resultados = []
+    aqui = os.path.dirname(os.path.abspath(__file__))
+    for escala in escalas:
+        for rodada in range(1, repeticoes + 1):
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+                arquivo_resultado = tmp.name
+            comando = [sys.executable, os.path.join(aqui, "benchmark_book.py"), "--interno", escala,
+                       "--resultado", arquivo_resultado, "--opcoes", json.dumps(opcoes)]
+            print(f"[bench] escala={escala} rodada {rodada}/{repeticoes}...")
+            proc = subprocess.run(comando, cwd=aqui, env={**os.environ, "PYTHONPATH": aqui})
+            if proc.returncode != 0:
+                print(f"[bench] [ERRO] cenário {escala} terminou com código {proc.returncode}")
+                continue
+            with open(arquivo_resultado, encoding="utf-8") as f:
+                resultados.append(json.load(f))
+            os.remove(arquivo_resultado)
+    return resultados
+
+
+def imprime_tabela(resultados):
+    print("[bench] escala | total (s) | pico RSS (MB) | Excel (MB) | requisições | etapas (s)")
+    for r in resultados:
+        etapas = ", ".join(f"{nome}={t:.2f}" for nome, t in sorted(r["tempo_etapas_s"].items()))
+        print(f"[bench] {r['escala']} | {r['tempo_total_s']:.2f} | {r['pico_rss_mb']} | "
+              f"{r['tamanho_excel_mb']:.2f} | {r['requisicoes_http']} | {etapas}")
+
+
+def compara(resultados, arquivo_base, tolerancia):
+    """Compara a mediana por escala com um resultado anterior. Retorna a lista de regressões."""
+    with open(arquivo_base, encoding="utf-8") as f:
+        base = json.load(f)
+
+    def medianas(lista):
+        por_escala = {}
+        for r in lista:
+            por_escala.setdefault(r["escala"], []).append(r)
+        saida = {}
+        for escala, rs in por_escala.items():
+            saida[escala] = {}
+            for chave in ("tempo_total_s", "pico_rss_mb", "tamanho_excel_mb"):
+                valores = sorted(r[chave] for r in rs if r.get(chave) is not None)
+                if valores:
+                    saida[escala][chave] = valores[len(valores) // 2]
+        return saida
+
+    atual, anterior = medianas(resultados), medianas(base)
+    regressoes = []
+    for escala, metricas in atual.items():
+        for chave, valor in metricas.items():
+            antes = anterior.get(escala, {}).get(chave)
+            if antes and valor > antes * (1 + tolerancia):
+                regressoes.append(f"{escala}: {chave} {antes} -> {valor} (+{(valor / antes - 1) * 100:.0f}%)")
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do book contra o simulador do Vision One")
+    parser.add_argument("--escala", nargs="+", choices=sorted(ESCALAS), default=["pequena"])
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--duracao-export", type=float, default=3.0)
+    parser.add_argument("--intervalo-polling", type=float, default=1.0)
+    parser.add_argument("--latencia", type=float, default=0.0)
+    parser.add_argument("--taxa-falhas", type=float, default=0.0)
+    parser.add_argument("--arquivos-por-export", type=int, default=1)
+    parser.add_argument("--vulns-normalizado", action="store_true",
+                        help="vulnerabilidades nas três abas normalizadas (vulns_modo=normalizado)")
+    parser.add_argument("--vulns-fluxo", action="store_true",
+                        help="vulnerabilidades escritas em fluxo do ZIP para o Excel (vulns_modo=fluxo)")
+    parser.add_argument("--manter", action="store_true", help="mantém a pasta de cada cenário (Excel e log)")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    parser.add_argument("--compara", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    # uso interno: execução de um cenário dentro do subprocesso
+    parser.add_argument("--interno", help=argparse.SUPPRESS)
+    parser.add_argument("--resultado", help=argparse.SUPPRESS)
+    parser.add_argument("--opcoes", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        _executa_cenario(args.interno, json.loads(args.opcoes), args.resultado)
+        sys.exit(0)
+
+    resultados = roda_benchmark(
+        args.escala, args.repeticoes,
+        duracao_export=args.duracao_export, intervalo_polling=args.intervalo_polling,
+        latencia=args.latencia, taxa_falhas=args.taxa_falhas, arquivos_por_export=args.arquivos_por_export,
+        vulns_normalizado=args.vulns_normalizado, vulns_fluxo=args.vulns_fluxo, manter=args.manter,
+    )
+    imprime_tabela(resultados)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"[bench] resultados gravados em {args.saida}")
+
+    if args.compara:
+        regressoes = compara(resultados, args.compara, args.tolerancia)
+        for r in regressoes:
+            print(f"[bench] [REGRESSÃO] {r}")
+        sys.exit(1 if regressoes else 0)
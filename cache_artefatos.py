@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import hashlib
+import zipfile
+import tempfile
+import threading
+
+from checkpoint import grava_json
+
+# cópia para o cache em blocos (os exports podem ter centenas de MB)
+TAMANHO_BLOCO = 1024 * 1024
+# objeto sem entrada é apagado só depois disso (pode ser de outra execução ainda gravando a entrada)
+CARENCIA_ORFAOS = 10 * 60
+
+
+def _le_paginas(arquivo):
+    with arquivo, zipfile.ZipFile(arquivo) as z:
+        for nome in sorted(z.namelist()):
+            yield z.read(nome)
+
+
+class PacotePaginas:
+    """Páginas de uma consulta gravadas uma a uma num .zip temporário do cache (sem ficar em memória)."""
+    def __init__(self, cache, chave, descricao):
+        self.cache = cache
+        self.chave = chave
+        self.descricao = descricao
+        descritor, self.caminho = tempfile.mkstemp(suffix=".part", dir=cache.pasta_temporarios)
+        os.close(descritor)
+        self._zip = zipfile.ZipFile(self.caminho, "w", zipfile.ZIP_DEFLATED, compresslevel=1)
+        self.paginas = 0
+        self.falhou = False
+
+    def adiciona(self, conteudo):
+        if self.falhou:
+            return
+        self.paginas += 1
+        try:
+            # data fixa no ZipInfo: as mesmas páginas geram o mesmo arquivo (e o mesmo objeto no cache)
+            self._zip.writestr(zipfile.ZipInfo(f"pagina_{self.paginas:05d}.json"), conteudo,
+                               compress_type=zipfile.ZIP_DEFLATED, compresslevel=1)
+        except OSError as e:
+            print(f"[AVISO] [cache] não foi possível gravar {self.descricao}: {e}")
+            self.falhou = True
+
+    def conclui(self):
+        """Guarda o pacote no cache (só quando a consulta terminou sem erro)."""
+        try:
+            self._zip.close()
+            if not self.falhou:
+                self.cache.guarda(self.chave, self.caminho, f"{self.descricao} ({self.paginas} páginas)")
+        except OSError as e:
+            print(f"[AVISO] [cache] não foi possível gravar {self.descricao}: {e}")
+        finally:
+            self.descarta()
+
+    def descarta(self):
+        self._zip.close()
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+
+class CacheArtefatos:
+    """
+    Cache em disco dos artefatos brutos da API (ZIPs dos exports, páginas dos workbenchs) e dos
+    .zip de relatórios, para reexecutar o book logo depois sem refazer exports e downloads.
+    Os arquivos ficam uma vez só em objetos/<sha256>.zip (endereçados pelo conteúdo) e cada
+    consulta (tipo + endpoint + parâmetros, sempre dentro do tenant `escopo`) aponta para um
+    objeto em entradas/<chave>.json. Entradas valem por `ttl_horas`; acima de `max_mb` os objetos
+    usados há mais tempo são apagados (LRU). Com `atualizar` (--refresh) nada é lido do cache,
+    só gravado.
+    Erros de disco no cache só geram aviso: a coleta segue sem ele.
+    """
+    def __init__(self, pasta, escopo=(), ttl_horas=6, max_mb=2048, atualizar=False):
+        self.pasta = pasta
+        self.pasta_objetos = os.path.join(pasta, "objetos")
+        self.pasta_entradas = os.path.join(pasta, "entradas")
+        self.pasta_temporarios = os.path.join(pasta, "tmp")
+        self.ttl = ttl_horas * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.atualizar = atualizar
+        # o token entra só como hash, e só dentro do hash das chaves
+        self._escopo = [hashlib.sha256(str(parte).encode()).hexdigest() for parte in escopo]
+        self._trava = threading.Lock()
+        self.estatisticas = {}
+        self.removidos = 0
+        for subpasta in (self.pasta_objetos, self.pasta_entradas, self.pasta_temporarios):
+            os.makedirs(subpasta, exist_ok=True)
+        self.limpa()
+
+    # ---------- API pública ----------
+    def chave(self, tipo, *partes):
+        """Chave de uma consulta: (tipo, hash do tenant + tipo + partes)."""
+        texto = json.dumps([self._escopo, tipo, *partes], sort_keys=True, default=str)
+        return tipo, hashlib.sha256(texto.encode()).hexdigest()
+
+    def caminho(self, chave):
+        """Caminho do objeto em cache para a chave (None se não houver, expirou ou --refresh)."""
+        tipo, _ = chave
+        entrada = None if self.atualizar else self._entrada(chave)
+        if entrada is None:
+            self._conta(tipo, faltas=1)
+            return None
+        caminho = os.path.join(self.pasta_objetos, entrada["objeto"] + ".zip")
+        try:
+            os.utime(caminho)  # uso recente, para o LRU
+        except OSError:
+            self._conta(tipo, faltas=1)
+            return None
+        self._conta(tipo, acertos=1, bytes_reaproveitados=entrada["bytes"])
+        idade = (time.time() - entrada["criado_em"]) / 3600
+        print(f"[cache] {entrada['descricao']}: reaproveitado do cache (gravado há {idade:.1f} h)")
+        return caminho
+
+    def abre(self, chave):
+        """Arquivo em cache aberto para leitura (posicionado no início) ou None."""
+        caminho = self.caminho(chave)
+        try:
+            return open(caminho, "rb") if caminho else None
+        except OSError:
+            return None
+
+    def paginas(self, chave):
+        """Iterador com o conteúdo de cada página guardada por um PacotePaginas, ou None."""
+        arquivo = self.abre(chave)
+        return _le_paginas(arquivo) if arquivo else None
+
+    def pacote(self, chave, descricao):
+        """Novo PacotePaginas para gravar as páginas da consulta `chave` (None se o disco falhar)."""
+        try:
+            return PacotePaginas(self, chave, descricao)
+        except OSError as e:
+            print(f"[AVISO] [cache] não foi possível gravar {descricao}: {e}")
+            return None
+
+    def guarda(self, chave, origem, descricao):
+        """
+        Copia `origem` (caminho ou arquivo binário aberto, que volta ao início) para o cache e
+        aponta a chave para ele. Um conteúdo já guardado por outra chave não é duplicado.
+        """
+        tipo, nome_entrada = chave
+        temporario = None
+        try:
+            descritor, temporario = tempfile.mkstemp(suffix=".part", dir=self.pasta_temporarios)
+            resumo = hashlib.sha256()
+            tamanho = 0
+            with os.fdopen(descritor, "wb") as destino:
+                fonte = open(origem, "rb") if isinstance(origem, (str, os.PathLike)) else origem
+                try:
+                    fonte.seek(0)
+                    while bloco := fonte.read(TAMANHO_BLOCO):
+                        resumo.update(bloco)
+                        destino.write(bloco)
+                        tamanho += len(bloco)
+                finally:
+                    if fonte is not origem:
+                        fonte.close()
+                    else:
+                        fonte.seek(0)
+            if tamanho > self.max_bytes:
+                print(f"[AVISO] [cache] {descricao} ({tamanho / (1024 * 1024):.1f} MB) "
+                      f"não cabe no limite do cache; não foi guardado")
+                return
+            objeto = resumo.hexdigest()
+            caminho = os.path.join(self.pasta_objetos, objeto + ".zip")
+            if os.path.exists(caminho):
+                os.utime(caminho)
+            else:
+                os.replace(temporario, caminho)
+                temporario = None
+            grava_json(os.path.join(self.pasta_entradas, nome_entrada + ".json"), {
+                "tipo": tipo, "descricao": descricao, "objeto": objeto, "bytes": tamanho,
+                "criado_em": time.time()})
+            self._conta(tipo, bytes_gravados=tamanho)
+            self._limita(manter=caminho)
+        except OSError as e:
+            print(f"[AVISO] [cache] não foi possível guardar {descricao}: {e}")
+        finally:
+            if temporario and os.path.exists(temporario):
+                os.remove(temporario)
+
+    def limpa(self):
+        """Apaga entradas vencidas, objetos sem entrada e temporários esquecidos; aplica o limite de tamanho."""
+        agora = time.time()
+        usados = set()
+        for nome in os.listdir(self.pasta_entradas):
+            if not nome.endswith(".json"):
+                continue
+            caminho = os.path.join(self.pasta_entradas, nome)
+            entrada = self._le_entrada(caminho)
+            if entrada is None or agora - entrada["criado_em"] > self.ttl:
+                self._remove(caminho)
+            else:
+                usados.add(entrada["objeto"] + ".zip")
+        for pasta in (self.pasta_objetos, self.pasta_temporarios):
+            for item in os.scandir(pasta):
+                if item.name not in usados and agora - item.stat().st_mtime > CARENCIA_ORFAOS:
+                    self._remove(item.path)
+        self._limita()
+
+    def tamanho(self):
+        """(bytes, quantidade) dos objetos em cache."""
+        objetos = list(os.scandir(self.pasta_objetos))
+        return sum(o.stat().st_size for o in objetos), len(objetos)
+
+    def resumo(self):
+        """Tabela de texto com acertos e faltas por tipo de artefato."""
+        linhas = ["[cache] tipo | acertos | faltas | MB reaproveitados | MB gravados"]
+        with self._trava:
+            for tipo, e in sorted(self.estatisticas.items()):
+                linhas.append(f"[cache] {tipo} | {e['acertos']} | {e['faltas']} | "
+                              f"{e['bytes_reaproveitados'] / (1024 * 1024):.2f} | "
+                              f"{e['bytes_gravados'] / (1024 * 1024):.2f}")
+        ocupado, objetos = self.tamanho()
+        linhas.append(f"[cache] {self.pasta}: {ocupado / (1024 * 1024):.1f} MB em {objetos} arquivos "
+                      f"(validade {self.ttl / 3600:g} h, limite {self.max_bytes / (1024 * 1024):g} MB"
+                      + (f", {self.removidos} removidos pelo limite" if self.removidos else "")
+                      + (", --refresh" if self.atualizar else "") + ")")
+        return "\n".join(linhas)
+
+    # ---------- Internos ----------
+    def _conta(self, tipo, **contadores):
+        with self._trava:
+            estatistica = self.estatisticas.setdefault(tipo, dict.fromkeys(
+                ("acertos", "faltas", "bytes_reaproveitados", "bytes_gravados"), 0))
+            for chave, valor in contadores.items():
+                estatistica[chave] += valor
+
+    def _le_entrada(self, caminho):
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _entrada(self, chave):
+        entrada = self._le_entrada(os.path.join(self.pasta_entradas, chave[1] + ".json"))
+        if entrada is None or time.time() - entrada["criado_em"] > self.ttl:
+            return None
+        return entrada
+
+    def _limita(self, manter=None):
+        """Apaga os objetos usados há mais tempo até o cache caber em max_bytes."""
+        with self._trava:
+            objetos = sorted((o.stat().st_mtime, o.stat().st_size, o.path) for o in os.scandir(self.pasta_objetos))
+            ocupado = sum(tamanho for _, tamanho, _ in objetos)
+            for _, tamanho, caminho in objetos:
+                if ocupado <= self.max_bytes:
+                    break
+                if caminho != manter and self._remove(caminho):
+                    ocupado -= tamanho
+                    self.removidos += 1
+
+    @staticmethod
+    def _remove(caminho):
+        try:
+            os.remove(caminho)
+            return True
+        except OSError:
+            # no Windows um arquivo aberto (ex.: lido por outra execução) não pode ser apagado
+            return False
@@ -0,0 +1,130 @@
+import os
+import shutil
+import fnmatch
+import zipfile
+import threading
+import pandas as pd
+from io import TextIOWrapper
+
+# tipo do relatório executivo -> padrão do nome do .zip agendado no Vision One
+PADROES_ZIP = {
+    "security": "*Security*Configuration*.zip",
+    "risk": "*Risk*.zip",
+    "exposure": "*Exposure*.zip",
+    "attack": "*Attack*.zip",
+}
+
+
+class CatalogoRelatorios:
+    """
+    Catálogo dos .zip de relatórios da pasta: lista a pasta uma vez, abre cada .zip uma vez
+    e indexa os membros csv/ por tipo de relatório. Cada CSV pedido é lido uma única vez
+    (só as colunas/linhas necessárias) e fica em cache para os demais consumidores.
+    Os .zip só são apagados em apaga(), depois que todos terminaram.
+    O relatório que não estiver na pasta é procurado em `pasta_servico` (onde o modo serviço guarda
+    o último .zip de cada tipo do mês); esses ficam lá, não são apagados nem arquivados aqui.
+    Com `cache` (CacheArtefatos) cada .zip encontrado é guardado no cache sob o mês de `referencia`
+    (AAAA-MM) e o relatório que não estiver na pasta (ex.: já apagado por uma execução anterior do
+    mesmo mês) é lido do cache, se ainda válido, com aviso no log; os do cache nunca são apagados
+    ou arquivados aqui.
+    """
+    def __init__(self, pasta, padroes=PADROES_ZIP, cache=None, referencia=None, pasta_servico=None):
+        self.pasta = pasta
+        self.padroes = dict(padroes)
+        self.caminhos = {}
+        self.do_servico = {}
+        self.do_cache = {}
+        self._zips = {}
+        self._membros = {}
+        self._cache = {}
+        self._trava = threading.Lock()
+
+        try:
+            nomes = sorted(e.name for e in os.scandir(pasta or ".") if e.is_file())
+        except OSError as e:
+            print(f"[ERRO] Não foi possível listar a pasta dos relatórios '{pasta}': {e}")
+            nomes = []
+        # a pasta do modo serviço só existe depois que ele processou algum .zip do mês
+        nomes_servico = []
+        if pasta_servico and os.path.isdir(pasta_servico):
+            nomes_servico = sorted(e.name for e in os.scandir(pasta_servico) if e.is_file())
+        for tipo, padrao in self.padroes.items():
+            encontrados = [n for n in nomes if fnmatch.fnmatch(n, padrao)]
+            do_servico = [n for n in nomes_servico if fnmatch.fnmatch(n, padrao)]
+            if encontrados:
+                self.caminhos[tipo] = os.path.join(pasta, encontrados[0])
+                if cache:
+                    cache.guarda(cache.chave("relatorio", tipo, referencia), self.caminhos[tipo],
+                                 f"relatório {encontrados[0]}")
+            elif do_servico:
+                self.do_servico[tipo] = os.path.join(pasta_servico, do_servico[0])
+                print(f"Arquivo ZIP processado pelo modo serviço: {do_servico[0]} ({pasta_servico})")
+            elif cache and (caminho := cache.caminho(cache.chave("relatorio", tipo, referencia))):
+                self.do_cache[tipo] = caminho
+                print(f"[AVISO] relatório {tipo} ({padrao}) não está em '{pasta}': usando o .zip guardado "
+                      f"no cache para {referencia or 'o mês'} (use --refresh para não reaproveitar)")
+
+        for tipo, caminho in {**self.caminhos, **self.do_servico, **self.do_cache}.items():
+            try:
+                z = zipfile.ZipFile(caminho, "r")
+            except Exception as e:
+                print(f"[ERRO] Falha ao abrir {caminho}: {e}")
+                continue
+            self._zips[tipo] = z
+            self._membros[tipo] = [f for f in z.namelist() if f.startswith("csv/") and f.endswith(".csv")]
+
+    # ---------- API pública ----------
+    def caminho(self, tipo):
+        """Caminho do .zip do relatório `tipo` (da pasta, do modo serviço ou do cache); None se não houver."""
+        return self.caminhos.get(tipo) or self.do_servico.get(tipo) or self.do_cache.get(tipo)
+
+    def membro(self, tipo, termo):
+        """Nome do CSV do relatório `tipo` que contém `termo` (None se não houver)."""
+        return next((f for f in self._membros.get(tipo, []) if termo in f), None)
+
+    def le_csv(self, tipo, termo, usecols=None, nrows=None):
+        """
+        DataFrame do CSV do relatório `tipo` que contém `termo`, lido uma vez e guardado em cache.
+        Lança FileNotFoundError se o .zip não existe e KeyError se o CSV não está no .zip.
+        """
+        if tipo not in self._zips:
+            raise FileNotFoundError(f"Arquivo ZIP não encontrado: {self.padroes.get(tipo, tipo)}")
+        membro = self.membro(tipo, termo)
+        if membro is None:
+            raise KeyError(f"CSV com termo '{termo}' não encontrado no ZIP.")
+
+        chave = (tipo, membro, tuple(usecols) if usecols is not None else None, nrows)
+        with self._trava:
+            if chave not in self._cache:
+                with self._zips[tipo].open(membro) as f:
+                    self._cache[chave] = pd.read_csv(TextIOWrapper(f, encoding="utf-8"),
+                                                     usecols=usecols, nrows=nrows)
+            return self._cache[chave].copy()
+
+    def fecha(self):
+        for z in self._zips.values():
+            z.close()
+        self._zips.clear()
+
+    def apaga(self):
+        """Fecha e apaga os .zip catalogados (chamar só depois de todos os consumidores)."""
+        self.fecha()
+        for caminho in self.caminhos.values():
+            try:
+                os.remove(caminho)
+                print(f"Arquivo ZIP removido: {os.path.basename(caminho)}")
+            except Exception as e:
+                print(f"[AVISO] Não foi possível deletar {caminho}: {e}")
+        self.caminhos.clear()
+
+    def arquiva(self, destino):
+        """Como apaga(), mas move os .zip para `destino` (ficam disponíveis para refazer a execução)."""
+        self.fecha()
+        os.makedirs(destino, exist_ok=True)
+        for caminho in self.caminhos.values():
+            try:
+                shutil.move(caminho, os.path.join(destino, os.path.basename(caminho)))
+                print(f"Arquivo ZIP arquivado em {destino}: {os.path.basename(caminho)}")
+            except Exception as e:
+                print(f"[AVISO] Não foi possível arquivar {caminho}: {e}")
+        self.caminhos.clear()
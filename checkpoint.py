@@ -0,0 +1,123 @@
+import os
+import re
+import json
+import shutil
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+# compressão rápida: o checkpoint é gravado no fim de cada etapa, dentro da execução
+COMPRESSAO = {"method": "gzip", "compresslevel": 1}
+
+
+def _slug(nome):
+    return re.sub(r"\W+", "_", nome).strip("_").lower()
+
+
+def grava_json(caminho, dados):
+    """Grava `dados` em JSON num .tmp ao lado e troca pelo arquivo final (nunca fica meio escrito)."""
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def pasta_mes(base, cliente, ano_mes_ref):
+    """Pasta das execuções do cliente no mês: {base}/{cliente}_{AAAA-MM}."""
+    return os.path.join(base, f"{_slug(cliente)}_{ano_mes_ref}")
+
+
+class DiretorioExecucao:
+    """
+    Pasta de uma execução do book ({base}/{cliente}_{AAAA-MM}): o DataFrame de cada aba concluída
+    fica em <etapa>.pkl.gz e o manifesto.json guarda o estado de cada etapa. Os .zip de relatórios
+    são arquivados em zips/ em vez de apagados, até a execução terminar sem falhas; o modo serviço
+    guarda em relatorios/ o último .zip de cada tipo que processou.
+    Com `retomar`, as etapas concluídas são restauradas do checkpoint; sem ele, as etapas
+    `selecionadas` voltam a pendente (as demais ficam como estavam).
+    """
+    def __init__(self, base, cliente, ano_mes_ref, retomar=False, selecionadas=()):
+        self.pasta = pasta_mes(base, cliente, ano_mes_ref)
+        self.pasta_zips = os.path.join(self.pasta, "zips")
+        self.pasta_relatorios = os.path.join(self.pasta, "relatorios")
+        self.caminho_manifesto = os.path.join(self.pasta, "manifesto.json")
+        self._trava = threading.Lock()
+        os.makedirs(self.pasta, exist_ok=True)
+
+        manifesto = None
+        if os.path.exists(self.caminho_manifesto):
+            with open(self.caminho_manifesto, encoding="utf-8") as f:
+                manifesto = json.load(f)
+        if manifesto is None:
+            manifesto = {"cliente": cliente, "ano_mes_ref": ano_mes_ref,
+                         "criado_em": datetime.now().isoformat(timespec="seconds"), "etapas": {}}
+        if not retomar:
+            for nome in selecionadas:
+                manifesto["etapas"].pop(nome, None)
+        manifesto["sucesso"] = None
+        self.manifesto = manifesto
+        self._grava_manifesto()
+
+    # ---------- etapas ----------
+    def concluida(self, nome):
+        """Etapa concluída em uma execução anterior e com o checkpoint presente."""
+        estado = self.manifesto["etapas"].get(nome) or {}
+        return (estado.get("status") == "concluida"
+                and os.path.exists(os.path.join(self.pasta, estado.get("arquivo", ""))))
+
+    def restaura(self, nome):
+        estado = self.manifesto["etapas"][nome]
+        return pd.read_pickle(os.path.join(self.pasta, estado["arquivo"]), compression=COMPRESSAO["method"])
+
+    def salva(self, nome, dados):
+        """Grava o checkpoint da aba e marca a etapa como concluída."""
+        arquivo = _slug(nome) + ".pkl.gz"
+        caminho = os.path.join(self.pasta, arquivo)
+        temporario = caminho + ".tmp"
+        dados.to_pickle(temporario, compression=COMPRESSAO)
+        os.replace(temporario, caminho)
+        self._atualiza(nome, status="concluida", arquivo=arquivo, linhas=len(dados),
+                       bytes=os.path.getsize(caminho), erro=None)
+        print(f"[checkpoint] {nome}: {len(dados)} linhas salvas em {caminho} "
+              f"({os.path.getsize(caminho) / (1024 * 1024):.2f} MB)")
+
+    def marca_falha(self, nome, erro):
+        self._atualiza(nome, status="falhou", erro=str(erro)[:500])
+
+    def pendentes(self):
+        return [nome for nome, estado in self.manifesto["etapas"].items() if estado.get("status") != "concluida"]
+
+    # ---------- .zip de relatórios ----------
+    def restaura_zips(self, pasta):
+        """Devolve para a pasta dos relatórios os .zip arquivados por uma execução que falhou."""
+        if not os.path.isdir(self.pasta_zips):
+            return
+        for nome in sorted(os.listdir(self.pasta_zips)):
+            destino = os.path.join(pasta or ".", nome)
+            if not os.path.exists(destino):
+                shutil.move(os.path.join(self.pasta_zips, nome), destino)
+                print(f"[checkpoint] ZIP restaurado do arquivo da execução: {nome}")
+
+    def finaliza(self, sucesso):
+        """Registra o resultado; só com sucesso os .zip arquivados são apagados de fato."""
+        self.manifesto["sucesso"] = sucesso
+        self._grava_manifesto()
+        if sucesso:
+            if os.path.isdir(self.pasta_zips):
+                shutil.rmtree(self.pasta_zips, ignore_errors=True)
+                print(f"[checkpoint] execução concluída; ZIPs arquivados removidos de {self.pasta_zips}")
+        else:
+            print(f"[checkpoint] execução incompleta ({', '.join(self.pendentes()) or 'ver falhas'}); "
+                  f"rode novamente com --resume para refazer só o que falhou. Estado em {self.caminho_manifesto}")
+
+    # ---------- Internos ----------
+    def _atualiza(self, nome, **campos):
+        with self._trava:
+            estado = self.manifesto["etapas"].setdefault(nome, {})
+            estado.update(campos, em=datetime.now().isoformat(timespec="seconds"))
+            self._grava_manifesto()
+
+    def _grava_manifesto(self):
+        self.manifesto["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+        grava_json(self.caminho_manifesto, self.manifesto)
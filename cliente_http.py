@@ -0,0 +1,162 @@
+import re
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metricas
+
+# status que indicam falha transitória (vale tentar de novo)
+STATUS_RETENTAVEL = {429, 500, 502, 503, 504}
+# para POST só repete quando o servidor garante que não processou o pedido
+STATUS_RETENTAVEL_POST = {429, 503}
+
+
+def _endpoint(url):
+    """Agrupa a URL por endpoint: sem query e com ids (uuid, hash, números longos) trocados por {id}."""
+    caminho = urlparse(url).path
+    partes = [
+        "{id}" if re.fullmatch(r"[0-9a-fA-F-]{8,}|\d+|[A-Za-z0-9_-]*\d[A-Za-z0-9_-]{15,}", p) else p
+        for p in caminho.split("/")
+    ]
+    return "/".join(partes) or "/"
+
+
+def _retry_after(resposta):
+    """Segundos indicados no header Retry-After (número ou data HTTP), ou None."""
+    valor = resposta.headers.get("Retry-After")
+    if not valor:
+        return None
+    if valor.strip().isdigit():
+        return float(valor)
+    try:
+        return max((parsedate_to_datetime(valor) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def espera_backoff(tentativa, espera_base=1.0, espera_max=60.0):
+    """Backoff exponencial com jitter para a `tentativa` (1, 2...): metade do teto fixa, metade aleatória."""
+    teto = min(espera_max, espera_base * 2 ** (tentativa - 1))
+    return random.uniform(teto / 2, teto)
+
+
+class ClienteVisionOne:
+    """
+    Cliente HTTP compartilhado pelos coletores: uma Session keep-alive com pool de conexões,
+    header Bearer em um só lugar, timeout por requisição e retentativa com backoff exponencial
+    (com jitter) que respeita o Retry-After. Guarda contadores de latência e retentativas por endpoint.
+    """
+    def __init__(self, url_region, token, timeout=(10, 120), tentativas=5,
+                 espera_base=1.0, espera_max=60.0, tamanho_pool=16):
+        self.url_region = url_region
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=tamanho_pool, max_retries=0)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+        self.sessao.headers["Authorization"] = f"Bearer {token}"
+
+        self._trava = threading.Lock()
+        self.contadores = {}
+
+    # ---------- API pública ----------
+    def get(self, url, **kwargs):
+        return self.requisicao("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.requisicao("POST", url, **kwargs)
+
+    def requisicao(self, metodo, url, **kwargs):
+        """
+        Faz a requisição com retentativas. Devolve a última resposta recebida
+        (mesmo com status de erro) ou relança a última exceção de rede.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        retentaveis = STATUS_RETENTAVEL_POST if metodo.upper() == "POST" else STATUS_RETENTAVEL
+        endpoint = f"{metodo.upper()} {_endpoint(url)}"
+
+        for tentativa in range(1, self.tentativas + 1):
+            inicio = time.perf_counter()
+            try:
+                resposta = self.sessao.request(metodo, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._conta(endpoint, time.perf_counter() - inicio, erro=True)
+                if tentativa == self.tentativas:
+                    raise
+                espera = self._espera(tentativa)
+                print(f"[http] {endpoint}: {e.__class__.__name__}; nova tentativa em {espera:.1f}s "
+                      f"({tentativa}/{self.tentativas})")
+                self._conta_retentativa(endpoint)
+                time.sleep(espera)
+                continue
+
+            self._conta(endpoint, time.perf_counter() - inicio, erro=resposta.status_code >= 400)
+            if resposta.status_code not in retentaveis or tentativa == self.tentativas:
+                return resposta
+
+            espera = max(_retry_after(resposta) or 0, self._espera(tentativa))
+            print(f"[http] {endpoint}: HTTP {resposta.status_code}; nova tentativa em {espera:.1f}s "
+                  f"({tentativa}/{self.tentativas})")
+            self._conta_retentativa(endpoint)
+            time.sleep(espera)
+
+    def resumo(self):
+        """Tabela com chamadas, retentativas, erros e latência por endpoint."""
+        with self._trava:
+            itens = sorted(self.contadores.items())
+        if not itens:
+            return "[http] nenhuma requisição feita."
+        linhas = ["[http] endpoint | chamadas | retentativas | erros | latência média | latência máx"]
+        for endpoint, c in itens:
+            media = c["tempo_total"] / c["chamadas"] if c["chamadas"] else 0
+            linhas.append(
+                f"[http] {endpoint} | {c['chamadas']} | {c['retentativas']} | {c['erros']} | "
+                f"{media:.2f}s | {c['tempo_max']:.2f}s"
+            )
+        return "\n".join(linhas)
+
+    # ---------- Internos ----------
+    def _espera(self, tentativa):
+        return espera_backoff(tentativa, self.espera_base, self.espera_max)
+
+    def _contador(self, endpoint):
+        return self.contadores.setdefault(
+            endpoint, {"chamadas": 0, "retentativas": 0, "erros": 0, "tempo_total": 0.0, "tempo_max": 0.0}
+        )
+
+    def _conta(self, endpoint, duracao, erro=False):
+        metricas.registra(chamadas_http=1)
+        with self._trava:
+            c = self._contador(endpoint)
+            c["chamadas"] += 1
+            c["erros"] += int(erro)
+            c["tempo_total"] += duracao
+            c["tempo_max"] = max(c["tempo_max"], duracao)
+
+    def _conta_retentativa(self, endpoint):
+        metricas.registra(retentativas_http=1)
+        with self._trava:
+            self._contador(endpoint)["retentativas"] += 1
+
+
+_clientes = {}
+_trava_clientes = threading.Lock()
+
+
+def obtem_cliente(url_region, token):
+    """Devolve o cliente compartilhado para (url_region, token), criando na primeira chamada."""
+    with _trava_clientes:
+        chave = (url_region, token)
+        if chave not in _clientes:
+            _clientes[chave] = ClienteVisionOne(url_region, token)
+        return _clientes[chave]
@@ -1,67 +1,152 @@
-import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from dateutil.relativedelta import relativedelta
 
-# Cálculo do período (mês anterior)
-primeiro_dia_mes_atual = datetime.now(timezone.utc).replace(
-                 day=1, hour=0, minute=0, second=0, microsecond=0
-                )
+from cliente_http import obtem_cliente
+import metricas
+from esquemas import aplica_esquema
+from decodifica_wb import DecodificadorWB
+
+def periodo_mes(referencia=None):
+    """
+    Início e fim (ISO 8601 UTC com 'Z') do mês de `referencia` (date, qualquer dia do mês).
+    Sem referência, o mês anterior ao atual. Calculado no início da coleta, não na importação.
+    """
+    if referencia is None:
+        referencia = (datetime.now(timezone.utc).replace(day=1) - timedelta(days=1)).date()
+    primeiro_dia = datetime(referencia.year, referencia.month, 1)
+    proximo_mes = (primeiro_dia + timedelta(days=32)).replace(day=1)
+
+    # Formatação no padrão ISO 8601 UTC (com 'Z')
+    return (primeiro_dia.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            (proximo_mes - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ"))
+
+def divide_periodo(inicio, fim, fatias):
+    """
+    Divide o período [inicio, fim] (strings ISO 8601 com 'Z', fim inclusivo) em até `fatias`
+    sub-janelas contíguas, sem sobreposição, com resolução de segundos.
+    """
+    formato = "%Y-%m-%dT%H:%M:%SZ"
+    t0 = datetime.strptime(inicio, formato)
+    t1 = datetime.strptime(fim, formato)
+    total = int((t1 - t0).total_seconds()) + 1
+    fatias = max(1, min(int(fatias), total))
+
+    janelas = []
+    for i in range(fatias):
+        a = t0 + timedelta(seconds=total * i // fatias)
+        b = t0 + timedelta(seconds=total * (i + 1) // fatias - 1)
+        janelas.append((a.strftime(formato), b.strftime(formato)))
+    return janelas
 
-# Formatação no padrão ISO 8601 UTC (com 'Z')
-startDateTime = (primeiro_dia_mes_atual - relativedelta(months=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
-endDateTime = (primeiro_dia_mes_atual - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 # Função principal
-def coletaWB(url_region, token):
-    
+def coletaWB(url_region, token, cliente=None, fatias=1, concorrencia=4, referencia=None, cache=None):
+    """
+    Coleta os alertas de workbench do mês de `referencia` (date; padrão: mês anterior).
+    Com fatias > 1 o período é dividido em sub-janelas paginadas em paralelo
+    (no máximo `concorrencia` requisições simultâneas) e os alertas repetidos
+    na fronteira das janelas são removidos pelo id.
+    Com `cache` (CacheArtefatos) as páginas brutas de cada janela completa são guardadas
+    e, dentro da validade do cache, lidas de lá em vez da API.
+    """
     url_path = '/beta/xdr/workbench/alerts'
     url = url_region + url_path
 
-    query_params = {
-            "startDateTime": startDateTime,
-            "endDateTime": endDateTime
-        }
-
-    headers = {'Authorization': 'Bearer ' + token}
-
-    colunas_excluir = [
-            "schemaVersion", "workbenchLink", "alertProvider", "modelId", "modelType",
-            "ownerIds", "impactScope", "matchedRules", "indicators", "campaign",
-            "industry", "regionAndCountry", "createdBy", "totalIndicatorCount",
-            "matchedIndicatorCount", "reportLink", "matchedIndicatorPatterns"
-        ]
-
-    resultados = []
-    contador = 0
-    print("iniciando COLETA Workbenchs")
-    
-    #requisições WEB para coleta dos dados
-    while url:
+    # Session compartilhada: reaproveita as conexões TLS entre as páginas do nextLink
+    cliente = cliente or obtem_cliente(url_region, token)
+
+    # páginas decodificadas direto para os campos da aba; os campos pesados nem são montados
+    decodificador = DecodificadorWB()
+
+    startDateTime, endDateTime = periodo_mes(referencia)
+    janelas = divide_periodo(startDateTime, endDateTime, fatias)
+    print("iniciando COLETA Workbenchs" + (f" em {len(janelas)} janelas" if len(janelas) > 1 else ""))
+
+    def coleta_janela(indice, inicio, fim):
+        """Pagina uma janela; a página k+1 é buscada enquanto a página k é decodificada e processada."""
+        rotulo = f"COLETA WB [{indice + 1}/{len(janelas)}]" if len(janelas) > 1 else "COLETA WB"
+        resultados = []
+        contador = 0
+        query_params = {
+                "startDateTime": inicio,
+                "endDateTime": fim
+            }
+
+        chave = cache.chave("workbench", url, inicio, fim) if cache else None
+        paginas = cache.paginas(chave) if cache else None
+        if paginas is not None:
+            for conteudo in paginas:
+                itens, _ = decodificador.decodifica(conteudo)
+                resultados.extend(itens)
+                contador += 1
+            print(f"{rotulo} - {contador} páginas lidas do cache")
+            return resultados
+
+        # só a janela paginada até o fim, sem erro, vai para o cache
+        pacote = cache.pacote(chave, f"workbench {inicio} a {fim}") if cache else None
+        completa = False
         try:
-            resposta = requests.get(url, params=query_params, headers=headers)
-        except Exception as e:
-            print(f"COLETA WB [ERRO] Falha na requisição: {e}")
-            break
+            with ThreadPoolExecutor(max_workers=1) as busca:
+                #requisições WEB para coleta dos dados
+                futuro = metricas.submete(busca, cliente.get, url, params=query_params)
+                while futuro:
+                    try:
+                        resposta = futuro.result()
+                    except Exception as e:
+                        print(f"{rotulo} [ERRO] Falha na requisição: {e}")
+                        break
 
-        print(f"COLETA WB Status HTTP: {resposta.status_code}")
+                    print(f"{rotulo} Status HTTP: {resposta.status_code}")
 
-        if resposta.status_code != 200:
-            print(f"[ERRO] Requisição falhou: {resposta.text}")
-            break
+                    if resposta.status_code != 200:
+                        print(f"[ERRO] Requisição falhou (dados parciais: {len(resultados)} registros): {resposta.text}")
+                        break
 
-        dados = resposta.json()
-        itens = dados.get("items", [])
-        resultados.extend(itens)
-        contador += 1
-        print(f"COLETA WB - requisição {contador}")
+                    # dispara a próxima página só com o nextLink e decodifica a atual enquanto ela chega
+                    antecipado = decodificador.proximo_link(resposta.content)
+                    futuro = metricas.submete(busca, cliente.get, antecipado) if antecipado else None
+                    itens, proximo = decodificador.decodifica(resposta.content)
+                    if proximo != antecipado:
+                        # leitura rápida divergiu da página decodificada: vale o nextLink definitivo
+                        if futuro:
+                            futuro.cancel()
+                        futuro = metricas.submete(busca, cliente.get, proximo) if proximo else None
 
-        url = dados.get("nextLink")
-        query_params = None  # precisa apenas na primeira chamada
+                    if pacote:
+                        pacote.adiciona(resposta.content)
+                    resultados.extend(itens)
+                    contador += 1
+                    print(f"{rotulo} - requisição {contador}")
+                else:
+                    completa = True
+        finally:
+            if pacote and completa:
+                pacote.conclui()
+            elif pacote:
+                pacote.descarta()
+
+        return resultados
+
+    if len(janelas) == 1:
+        resultados = coleta_janela(0, *janelas[0])
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, concorrencia), thread_name_prefix="wb") as pool:
+            futuros = [metricas.submete(pool, coleta_janela, i, inicio, fim)
+                       for i, (inicio, fim) in enumerate(janelas)]
+            resultados = [item for futuro in futuros for item in futuro.result()]
+    decodificador.relatorio()
 
     if not resultados:
         return ("[ERRO] Nenhum dado retornado pela API que consulta Workbench.")
-        
-    df = pd.DataFrame(resultados).drop(columns=colunas_excluir, errors="ignore")
+
+    with metricas.etapa("DataFrame"):
+        df = pd.DataFrame(resultados)
+    if len(janelas) > 1 and "id" in df.columns:
+        repetidos = df.duplicated(subset="id")
+        if repetidos.any():
+            print(f"COLETA WB - {int(repetidos.sum())} alertas repetidos entre janelas removidos")
+            df = df[~repetidos].reset_index(drop=True)
     print(f"Total de registros coletados: {len(df)}")
-    return df
\ No newline at end of file
+    with metricas.etapa("tipos"):
+        return aplica_esquema(df, "Alertas WB")
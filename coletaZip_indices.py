@@ -1,13 +1,18 @@
-import os
-import glob
-import zipfile
 import pandas as pd
 from datetime import date, timedelta
 
-#data que aparece na primeira coluna, para indicar a referencia dos dados - sempre dia 1 do mes anterior
-data_ref = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1).strftime("%d/%m/%Y")
+import metricas
+from catalogo_relatorios import CatalogoRelatorios
 
-def coletaZip_indices(pasta, arquivo_excel, cliente, data_ref=data_ref):
+def coletaZip_indices(pasta, livro, cliente, data_ref=None, catalogo=None):
+    """
+    Calcula os índices (risk, exposure, attack, security) dos .zip executivos e registra a aba Indices.
+    Com `catalogo` compartilhado, os .zip não são apagados aqui (quem criou o catálogo apaga no final);
+    sem catálogo, apaga os .zip depois de processar, como antes.
+    """
+    #data que aparece na primeira coluna, para indicar a referencia dos dados - sempre dia 1 do mes anterior
+    if data_ref is None:
+        data_ref = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1).strftime("%d/%m/%Y")
 
     # Cria dataframe base com os nomes das colunas
     dados = pd.DataFrame([{
@@ -18,52 +23,52 @@ def coletaZip_indices(pasta, arquivo_excel, cliente, data_ref=data_ref):
             "security": 0
         }])
     
-    #Busca o .zip, extrai o .csv alvo, calcula a média e deleta o .zip após processar
-    def extrai_indicador(pasta, padrao_zip, padrao_csv, coluna, amostra=30):
-        
-        try:
-            caminho_zip = glob.glob(os.path.join(pasta, padrao_zip))[0]
-        except IndexError:
-            print(f"[ERRO] Arquivo ZIP não encontrado: {padrao_zip}")
-            return 0
+    proprio = catalogo is None
+    if proprio:
+        catalogo = CatalogoRelatorios(pasta)
 
-        try:
-            with zipfile.ZipFile(caminho_zip, 'r') as z:
-                # Localiza o CSV alvo dentro do ZIP
-                csv_alvo = [
-                    f for f in z.namelist()
-                    if f.startswith("csv/") and padrao_csv in f and f.endswith(".csv")
-                ][0]
-
-                with z.open(csv_alvo) as f:
-                    indice = pd.read_csv(f)[coluna].head(amostra).mean().round(2)
-                    print(f"calculado {padrao_csv}: {indice}")
+    # sem nenhum .zip não há índice a calcular: a aba não é registrada (uma linha zerada iria
+    # para o checkpoint e substituiria no armazém os índices já gravados do mês)
+    if all(catalogo.caminho(tipo) is None for tipo in ("risk", "exposure", "attack", "security")):
+        print(f"[ERRO] Nenhum arquivo ZIP de relatório encontrado em '{pasta}'")
+        if proprio:
+            catalogo.fecha()
+        return None
 
-        except Exception as e:
-            print(f"[ERRO] Falha ao processar {caminho_zip}: {e}")
-            indice = 0
+    #Lê só a coluna e as linhas usadas do .csv alvo e calcula a média
+    def extrai_indicador(tipo, padrao_csv, coluna, amostra=30):
+        if catalogo.caminho(tipo) is None:
+            print(f"[ERRO] Arquivo ZIP não encontrado: {catalogo.padroes[tipo]}")
+            return 0
 
-        # Após processar, tenta excluir o ZIP
         try:
-            os.remove(caminho_zip)
-            print(f"Arquivo ZIP removido: {os.path.basename(caminho_zip)}")
+            indice = catalogo.le_csv(tipo, padrao_csv, usecols=[coluna], nrows=amostra)[coluna].mean().round(2)
+            print(f"calculado {padrao_csv}: {indice}")
         except Exception as e:
-            print(f"[AVISO] Não foi possível deletar {caminho_zip}: {e}")
+            print(f"[ERRO] Falha ao processar {catalogo.caminho(tipo)}: {e}")
+            indice = 0
 
         return indice
 
     # Coleta indicadores
-    dados["risk"] = extrai_indicador(pasta,"*Risk*.zip", "Cyber Risk Index", "Your company")
-    dados["exposure"] = extrai_indicador(pasta,"*Exposure*.zip", "Exposure Index", "Your company")
-    dados["attack"] = extrai_indicador(pasta,"*Attack*.zip", "AttackIndex", "Your company")
-    dados["security"] = extrai_indicador(pasta,"*Security*Configuration*.zip", "Security Configuration Index", "Your organization")
+    dados["risk"] = extrai_indicador("risk", "Cyber Risk Index", "Your company")
+    dados["exposure"] = extrai_indicador("exposure", "Exposure Index", "Your company")
+    dados["attack"] = extrai_indicador("attack", "AttackIndex", "Your company")
+    dados["security"] = extrai_indicador("security", "Security Configuration Index", "Your organization")
+
+    # Após processar, exclui os ZIPs (só quando o catálogo é desta chamada)
+    if proprio:
+        catalogo.apaga()
 
-    # Salva no arquivo Excel
+    # Registra no livro do Excel (gravado de uma vez ao final da execução)
     nome_aba = "Indices"
     try:
-        with pd.ExcelWriter(arquivo_excel, engine="openpyxl", mode="a", if_sheet_exists="overlay") as writer:
-            dados.to_excel(writer, sheet_name=nome_aba, index=False, header=True)
+        erro = livro.registra(nome_aba, dados)
+        if erro:
+            print(erro)
+            return None
 
+        metricas.registra(linhas=len(dados))
         return "aba Indices populada com sucesso!"
 
     except Exception as e:
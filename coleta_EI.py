@@ -1,121 +1,154 @@
-import requests
 import zipfile
 import pandas as pd
-import json
-import time
-from io import BytesIO
 
+from download_zip import baixa_arquivo
+from cliente_http import obtem_cliente
+from gerenciador_exportacoes import GerenciadorExportacoes
+import metricas
+from esquemas import aplica_esquema, interna_json
+from json_incremental import itens, lotes
+from leitura_paralela import le_membros
 
-def coleta_exportacao_trend(url_region, token, tipo_export = "inventory", tempo_espera=30, tentativas_max=20):
+# Campos do export que não vão para o book, descartados já na leitura (antes do DataFrame).
+# Aceita caminho com ponto para campos aninhados ("eppAgent.policyName"). Por padrão nenhum: a aba
+# tem todas as colunas do export; no .env, ei_colunas_excluir (ex.: ipAddresses,macAddresses)
+COLUNAS_EXCLUIR = []
+
+# registros por bloco na leitura (linhas de CSV / itens de JSON)
+TAMANHO_LOTE = 20000
+
+
+def _projeta(item, caminhos):
+    """Remove do registro (dict) os campos de `caminhos`, já divididos por ponto."""
+    for caminho in caminhos:
+        alvo = item
+        for chave in caminho[:-1]:
+            alvo = alvo.get(chave) if isinstance(alvo, dict) else None
+        if isinstance(alvo, dict):
+            alvo.pop(caminho[-1], None)
+    return item
+
+
+def le_membro(z, nome, colunas_excluir=COLUNAS_EXCLUIR, tamanho_lote=TAMANHO_LOTE, gancho=None):
+    """
+    Lê um membro .csv ou .json do ZIP em blocos de `tamanho_lote` registros, já sem as colunas
+    excluídas. Retorna um DataFrame (None se o membro não for CSV/JSON).
+    O .json é decodificado item a item (json_incremental): o pico de memória cai, mas a leitura
+    fica mais lenta que um json.load do membro inteiro (100 mil endpoints em 3 arquivos:
+    200 -> 163 MB de pico, 2.3 s -> 3.1 s).
+    """
+    excluir = set(colunas_excluir)
+    partes = []
+    if nome.lower().endswith(".csv"):
+        with z.open(nome) as f:
+            leitor = pd.read_csv(f, usecols=lambda c: c not in excluir, chunksize=tamanho_lote,
+                                 engine="c", low_memory=False)
+            for parte in leitor:
+                partes.append(parte)
+    elif nome.lower().endswith(".json"):
+        caminhos = [c.split(".") for c in excluir]
+        with z.open(nome) as f:
+            for lote in lotes(itens(f, object_hook=gancho or interna_json()), tamanho_lote):
+                partes.append(pd.json_normalize([_projeta(item, caminhos) for item in lote]))
+                del lote
+    else:
+        return None
+    if not partes:
+        return pd.DataFrame()
+    return partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+
+
+def coleta_exportacao_trend(url_region, token, tipo_export = "inventory", tempo_espera=30, tentativas_max=20,
+                            cliente=None, gerenciador=None, colunas_excluir=None, tamanho_lote=TAMANHO_LOTE,
+                            processos=1, cache=None):
     """
     Executa exportações da API Trend Micro (Inventory, Vulnerabilidades, Contas Comprometidas)
     e retorna um DataFrame ou uma string de erro.
+    O polling fica a cargo do GerenciadorExportacoes (compartilhado se for informado).
+    Todos os membros .csv/.json do ZIP são lidos em blocos, sem `colunas_excluir`
+    (padrão: COLUNAS_EXCLUIR), e concatenados na ordem do ZIP; com vários membros, em até
+    `processos` processos (0 = automático, ver leitura_paralela).
+    Com `cache` (CacheArtefatos), um ZIP do export ainda válido no cache é usado sem chamar a API.
     """
-    tipo_export = "inventory"
     print(f"\n[INÍCIO] Iniciando coleta de dados para: {tipo_export.upper()}")
 
     endpoints = {
         "inventory": "v3.0/endpointSecurity/endpoints/export",
     }
+    if tipo_export not in endpoints:
+        return f"[ERRO] Tipo de exportação '{tipo_export}' inválido. Use: {', '.join(endpoints)}."
     endpoint_path = endpoints[tipo_export]
+    cliente = cliente or obtem_cliente(url_region, token)
+    gerenciador = gerenciador or GerenciadorExportacoes(cliente, intervalo_inicial=tempo_espera)
 
-    # POST inicial
-    print("EI - Enviando solicitação de exportação...")
+    chave = cache.chave("export", url_region + endpoint_path) if cache else None
+    arquivo_zip = cache.abre(chave) if cache else None
+    if arquivo_zip is None:
+        # POST inicial
+        print("EI - Enviando solicitação de exportação...")
 
-    try:
-        post_url = url_region+endpoint_path
-        query_params = {}
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json;charset=utf-8"
-        }
-        body = {}
-
-        r = requests.post(post_url, params=query_params, headers=headers, json=body, timeout=120)
-
-    except Exception as e:
-        return f"[ERRO] Falha no POST inicial: {e}"
-
-
-    if r.status_code != 202:
-        return f"[ERRO] Exportação não iniciada: HTTP {r.status_code} - {r.text[:300]}"
-
-    operation_url = r.headers.get("Operation-Location") or r.headers.get("Location")
-    if not operation_url:
-        return "[ERRO] Operation-Location ausente na resposta da API."
-
-    print("EI - Exportação iniciada. Aguardando processamento...")
-
-    # Polling de status
-    download_url = None
-    for i in range(tentativas_max):
         try:
-            resp = requests.get(operation_url, headers=headers, timeout=120)
-            payload = resp.json()
-        except Exception as e:
-            return f"[ERRO] Falha ao consultar status: {e}"
-
-        status_raw = str(payload.get("status", "")).lower()
-        print(f"   > Tentativa {i+1}/{tentativas_max} - status: {status_raw}")
-
-        if "succeed" in status_raw or "complete" in status_raw:
-            download_url = (
-                payload.get("resourceLocation")
-                or (payload.get("result") or {}).get("resourceLocation")
-                or payload.get("location")
+            futuro = gerenciador.submete(
+                tipo_export,
+                url_region + endpoint_path,
+                max_espera=tempo_espera * tentativas_max,
+                prefixo="EI -",
+                url_base=url_region
             )
-            break
-        elif "fail" in status_raw or "cancel" in status_raw:
-            return f"[ERRO] Exportação falhou (status: {status_raw})."
+        except Exception as e:
+            return f"[ERRO] Falha no POST inicial: {e}"
 
-        time.sleep(tempo_espera)
-    else:
-        return f"[ERRO] Tempo limite excedido aguardando exportação de {tipo_export}"
+        print("EI - Exportação iniciada. Aguardando processamento...")
 
-    if not download_url:
-        return "[ERRO] URL de download não encontrada após conclusão."
+        # Polling de status
+        try:
+            with metricas.etapa("polling"):
+                download_url = futuro.result()
+        except TimeoutError:
+            return f"[ERRO] Tempo limite excedido aguardando exportação de {tipo_export}"
+        except Exception as e:
+            return f"[ERRO] Exportação falhou: {e}"
 
-    print("EI - Exportação concluída! Baixando arquivo ZIP...")
+        print("EI - Exportação concluída! Baixando arquivo ZIP...")
 
-    # Download do ZIP
-    try:
-        blob = (requests.get(download_url, timeout=120)).content
-        print("EI - Download concluído.")
-    except Exception as e:
-        return f"[ERRO] Falha no download do arquivo ZIP: {e}"
+        # Download do ZIP
+        try:
+            # a URL de download é pré-assinada: vai sem o header Bearer da sessão
+            with metricas.etapa("download"):
+                arquivo_zip = baixa_arquivo(download_url, headers={"Authorization": None}, timeout=120,
+                                            prefixo="EI -", sessao=cliente.sessao)
+            print("EI - Download concluído.")
+        except Exception as e:
+            return f"[ERRO] Falha no download do arquivo ZIP: {e}"
+        if cache:
+            cache.guarda(chave, arquivo_zip, f"export {tipo_export}")
 
     # Extração e processamento
     print("EI - Processando arquivo ZIP...")
 
+    if colunas_excluir is None:
+        colunas_excluir = COLUNAS_EXCLUIR
     try:
-        with zipfile.ZipFile(BytesIO(blob)) as z:
-            for name in z.namelist():
+        with metricas.etapa("leitura"), arquivo_zip:
+            with zipfile.ZipFile(arquivo_zip) as z:
+                membros = [n for n in z.namelist() if n.lower().endswith((".csv", ".json"))]
+            for name in membros:
                 print(f"   > Encontrado arquivo: {name}")
-
-                # Detecta tipo do arquivo
-                if name.lower().endswith(".csv"):
-                    print("   > Lendo arquivo CSV...")
-                    with z.open(name) as f:
-                        df = pd.read_csv(f)
-                    print(f"   > Total de registros: {len(df)}")
-                    return df
-
-                elif name.lower().endswith(".json"):
-                    print("   > Lendo arquivo JSON...")
-                    with z.open(name) as f:
-                        dados_json = json.load(f)
-
-                    items = dados_json.get("items", dados_json)
-
-                    if not items:
-                        return "[ERRO] Nenhum item encontrado no arquivo JSON."
-
-                    df = pd.json_normalize(items)
-
-                    print(f"   > Total de registros: {len(df)}")
-                    return df
-
-        return "[ERRO] Nenhum arquivo CSV ou JSON encontrado dentro do ZIP."
-
+            lidos = le_membros(arquivo_zip, le_membro, membros, processos,
+                               argumentos=(colunas_excluir, tamanho_lote), prefixo="EI -")
+            frames = []
+            for name, df in zip(membros, lidos):
+                print(f"   > {name}: {len(df)} registros, {df.shape[1]} colunas")
+                if len(df):
+                    frames.append(df)
+            del lidos
     except Exception as e:
         return f"[ERRO] Falha ao processar o arquivo ZIP: {e}"
+
+    if not frames:
+        return "[ERRO] Nenhum registro CSV ou JSON encontrado dentro do ZIP."
+
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    del frames
+    print(f"   > Total de registros: {len(df)} ({len(df.columns)} colunas)")
+    return aplica_esquema(df, "endpoint inventory")
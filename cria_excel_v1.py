@@ -1,49 +1,255 @@
 from pathlib import Path
-import re
+from datetime import datetime, date
+import threading
 import pandas as pd
 
-def criar_planilha(cliente, data_ref):
+import metricas
+
+# limite de linhas de uma aba do Excel (inclui o cabeçalho)
+LIMITE_LINHAS_EXCEL = 1_048_576
+
+# abas do book, na ordem em que aparecem no arquivo
+ABAS = [
+    "Compliance SWP",
+    "Compliance SEP",
+    "Indices",
+    "Alertas WB",
+    "endpoint inventory",
+    "vulnerabilidades",
+]
+
+
+class LivroExcel:
+    """
+    Monta o book em memória: cada etapa registra o DataFrame da sua aba
+    e o arquivo é escrito uma única vez, com xlsxwriter, em salva().
+    Nenhuma etapa relê o arquivo que está sendo produzido.
+    """
+    def __init__(self, caminho_arquivo, abas=ABAS):
+        self.caminho_arquivo = Path(caminho_arquivo)
+        self.arquivo = self.caminho_arquivo.name
+        self._abas = {aba: [] for aba in abas}
+        self._trava = threading.Lock()
+
+    def linhas(self, aba):
+        """Linhas de dados já registradas na aba (sem o cabeçalho)."""
+        with self._trava:
+            return sum(len(df) for df in self._abas.get(aba, []))
+
+    def registrada(self, aba):
+        """True se a aba recebeu dados."""
+        with self._trava:
+            return bool(self._abas.get(aba))
+
+    def dados(self, aba):
+        """DataFrame completo da aba (None se nada foi registrado)."""
+        with self._trava:
+            partes = list(self._abas.get(aba, []))
+        if not partes:
+            return None
+        return partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+
+    def registra(self, aba, dados):
+        """
+        Acrescenta um DataFrame à aba (modo append). Retorna None em caso de sucesso
+        ou uma string de erro se o limite de linhas do Excel for excedido.
+        """
+        with self._trava:
+            partes = self._abas.setdefault(aba, [])
+            # +1 pelo cabeçalho
+            ocupadas = sum(len(df) for df in partes) + 1
+            if ocupadas + len(dados) > LIMITE_LINHAS_EXCEL:
+                return (
+                    f"[ERRO] A aba '{aba}' não pode receber {len(dados)} novas linhas — "
+                    f"isso excederia o limite de 1.048.576 linhas do Excel."
+                )
+            partes.append(dados)
+        return None
+
+    def salva(self):
+        """Escreve todas as abas em uma única passada e retorna o nome do arquivo."""
+        print(f"[INFO] Gravando arquivo Excel {self.arquivo}...")
+        try:
+            with metricas.etapa("gravação Excel"), self._trava, \
+                    pd.ExcelWriter(self.caminho_arquivo, engine="xlsxwriter") as writer:
+                for aba, partes in self._abas.items():
+                    if not partes:
+                        # Escreve um DataFrame vazio apenas para criar a aba
+                        pd.DataFrame().to_excel(writer, sheet_name=aba, index=False)
+                        continue
+                    dados = partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+                    dados.to_excel(writer, sheet_name=aba, index=False, header=True)
+                    metricas.registra(linhas=len(dados))
+                    print(f"  - aba '{aba}' gravada: {len(dados)} linhas")
+            print("[SUCESSO] Arquivo Excel gravado com sucesso.")
+        except Exception as e:
+            print(f"[ERRO] Falha ao gravar o arquivo Excel: {e}")
+            # Propaga o erro para o chamador decidir como tratar
+            raise
+        return self.arquivo
+
+
+# cabeçalho no mesmo estilo do DataFrame.to_excel
+FORMATO_CABECALHO = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+FORMATO_DATA_HORA = "yyyy-mm-dd hh:mm:ss"
+# tipos que o xlsxwriter grava sem conversão
+_DIRETOS = (str, int, bool, datetime)
+
+
+def _valor_excel(v):
+    """Valor de célula como o to_excel grava: vazio para None/NaN/NaT, texto para listas e dicts."""
+    if v is None or v is pd.NaT or v is pd.NA:
+        return None
+    if isinstance(v, float):
+        if v != v:
+            return None
+        return v if abs(v) != float("inf") else str(v)
+    if isinstance(v, (str, int, datetime, date)):
+        return v
+    if hasattr(v, "item"):  # escalares numpy
+        return _valor_excel(v.item())
+    return str(v)
+
+
+def _colunas_excel(df):
+    """Colunas do DataFrame como listas de valores prontos para write_row."""
+    colunas = []
+    for i in range(df.shape[1]):
+        serie = df.iloc[:, i]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+        if serie.dtype.kind == "M":
+            valores = [None if v is pd.NaT else v.to_pydatetime() for v in serie]
+        else:
+            valores = [v if type(v) in _DIRETOS else _valor_excel(v) for v in serie.tolist()]
+        colunas.append(valores)
+    return colunas
+
+
+class LivroExcelFluxo(LivroExcel):
+    """
+    LivroExcel gravado com xlsxwriter em constant_memory (cada linha vai para o disco assim que
+    a próxima começa). As abas em fluxo são escritas durante a coleta, linha a linha, por
+    escreve_linhas(), sem DataFrame; as abas de DataFrame são escritas também por linha em salva().
+    dados() de uma aba em fluxo é None (não há cópia em memória).
+    """
+    # linhas convertidas por vez ao gravar uma aba de DataFrame
+    BLOCO_LINHAS = 50_000
+
+    def __init__(self, caminho_arquivo, abas=ABAS):
+        import xlsxwriter
+
+        super().__init__(caminho_arquivo, abas)
+        self._workbook = xlsxwriter.Workbook(str(self.caminho_arquivo), {
+            "constant_memory": True, "default_date_format": FORMATO_DATA_HORA})
+        self._cabecalho = self._workbook.add_format(FORMATO_CABECALHO)
+        # planilhas criadas já na ordem do book; as abas em fluxo são escritas antes das demais
+        self._planilhas = {aba: self._workbook.add_worksheet(aba) for aba in abas}
+        self._fluxos = {}
+
+    def linhas(self, aba):
+        with self._trava:
+            return self._fluxos.get(aba, 0) + sum(len(df) for df in self._abas.get(aba, []))
+
+    def registrada(self, aba):
+        with self._trava:
+            return aba in self._fluxos or bool(self._abas.get(aba))
+
+    def _planilha(self, aba):
+        with self._trava:
+            if aba not in self._planilhas:
+                self._planilhas[aba] = self._workbook.add_worksheet(aba)
+            return self._planilhas[aba]
+
+    def _escreve_cabecalho(self, planilha, colunas):
+        planilha.write_row(0, 0, [str(c) for c in colunas], self._cabecalho)
+
+    def escreve_linhas(self, aba, colunas, linhas, colunas_adicionais=None):
+        """
+        Escreve direto no arquivo as `linhas` (iterável de tuplas na ordem de `colunas`) da aba.
+        `colunas_adicionais` ([(coluna, valor)]) entram no início de cada linha, como em atualiza_aba.
+        Ao chegar ao limite do Excel a escrita continua em "<aba> (2)", "<aba> (3)"...
+        Retorna o total de linhas escritas.
+        """
+        adicionais = list(colunas_adicionais or [])
+        colunas = [c for c, _ in adicionais] + list(colunas)
+        prefixo = [v for _, v in adicionais]
+        nome, parte, total = aba, 1, 0
+        planilha = self._planilha(nome)
+        self._escreve_cabecalho(planilha, colunas)
+        linha_atual = 1
+
+        with metricas.etapa(f"escrita {aba}"):
+            for linha in linhas:
+                if linha_atual >= LIMITE_LINHAS_EXCEL:
+                    parte += 1
+                    nome = f"{aba} ({parte})"
+                    print(f"[AVISO] A aba '{aba}' chegou ao limite de 1.048.576 linhas do Excel; "
+                          f"continuando na aba '{nome}'.")
+                    planilha = self._planilha(nome)
+                    self._escreve_cabecalho(planilha, colunas)
+                    linha_atual = 1
+                planilha.write_row(linha_atual, 0,
+                                   prefixo + [v if type(v) in _DIRETOS else _valor_excel(v) for v in linha])
+                linha_atual += 1
+                total += 1
+                if linha_atual >= LIMITE_LINHAS_EXCEL:
+                    with self._trava:
+                        self._fluxos[nome] = linha_atual - 1
+
+            with self._trava:
+                self._fluxos[nome] = linha_atual - 1
+            metricas.registra(linhas=total)
+        print(f"  - aba '{aba}' escrita em fluxo: {total} linhas" + (f" em {parte} abas" if parte > 1 else ""))
+        return total
+
+    def salva(self):
+        """Escreve as abas de DataFrame (por linha) e fecha o arquivo."""
+        print(f"[INFO] Gravando arquivo Excel {self.arquivo}...")
+        try:
+            with metricas.etapa("gravação Excel"):
+                with self._trava:
+                    abas = {aba: list(partes) for aba, partes in self._abas.items() if partes}
+                for aba, partes in abas.items():
+                    planilha = self._planilha(aba)
+                    dados = partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+                    self._escreve_cabecalho(planilha, dados.columns)
+                    for inicio in range(0, len(dados), self.BLOCO_LINHAS):
+                        bloco = dados.iloc[inicio:inicio + self.BLOCO_LINHAS]
+                        for i, valores in enumerate(zip(*_colunas_excel(bloco)), start=inicio + 1):
+                            planilha.write_row(i, 0, valores)
+                    metricas.registra(linhas=len(dados))
+                    print(f"  - aba '{aba}' gravada: {len(dados)} linhas")
+                self._workbook.close()
+            print("[SUCESSO] Arquivo Excel gravado com sucesso.")
+        except Exception as e:
+            print(f"[ERRO] Falha ao gravar o arquivo Excel: {e}")
+            raise
+        return self.arquivo
+
+
+def criar_planilha(cliente, data_ref, pasta_saida=None, abas=ABAS, sufixo="", fluxo=False):
     """
-    Cria um arquivo Excel no formato {cliente}_base_dados_{data_ref}.xlsx
-    com as abas:
+    Prepara o book {cliente}_base_dados_{data_ref}{sufixo}.xlsx (na pasta_saida ou na pasta atual) com as abas:
       - Compliance SWP
       - Compliance SEP
       - Indices
       - Alertas WB
       - endpoint inventory
       - vulnerabilidades
+    (ou só as `abas` informadas). Retorna um LivroExcel; o arquivo só é escrito em LivroExcel.salva().
+    Com `fluxo`, retorna um LivroExcelFluxo (arquivo aberto já aqui, abas escritas em fluxo).
     """
     # 2) Monta o nome do arquivo e o caminho final
     data_ref = data_ref.replace("/", "_")
-    arquivo_excel = f"{cliente}_base_dados_{data_ref}.xlsx"
-    caminho_arquivo = Path.cwd() / arquivo_excel 
+    arquivo_excel = f"{cliente}_base_dados_{data_ref}{sufixo}.xlsx"
+    pasta_saida = Path(pasta_saida) if pasta_saida else Path.cwd()
+    pasta_saida.mkdir(parents=True, exist_ok=True)
+    caminho_arquivo = pasta_saida.resolve() / arquivo_excel
 
     print(f"[INFO] Iniciando criação da planilha para cliente='{cliente}' e data_ref='{data_ref}'.")
     print(f"[INFO] Nome do arquivo definido: {arquivo_excel}")
 
-    # 3) Define as abas solicitadas
-    abas = [
-        "Compliance SWP",
-        "Compliance SEP",
-        "Indices",
-        "Alertas WB",
-        "endpoint inventory",
-        "vulnerabilidades",
-    ]
-
-    # 4) Cria o Excel com abas vazias usando pandas + ExcelWriter
-    try:
-        print("[INFO] Criando arquivo Excel e adicionando abas...")
-        with pd.ExcelWriter(caminho_arquivo, engine="xlsxwriter") as writer:
-            for aba in abas:
-                print(f"  - Criando aba: {aba}")
-                # Escreve um DataFrame vazio apenas para criar a aba
-                pd.DataFrame().to_excel(writer, sheet_name=aba, index=False)
-        print("[SUCESSO] Arquivo Excel criado com sucesso.")
-    except Exception as e:
-        print(f"[ERRO] Falha ao criar o arquivo Excel: {e}")
-        # Propaga o erro para o chamador decidir como tratar
-        raise
-
-    # 5) Retorna o nome do arquivo (conforme solicitado)
-    return arquivo_excel
\ No newline at end of file
+    # 3) Cria o livro em memória com as abas vazias
+    with metricas.etapa("criar_planilha"):
+        return (LivroExcelFluxo if fluxo else LivroExcel)(caminho_arquivo, abas)
@@ -0,0 +1,170 @@
+import re
+import json
+import threading
+
+from esquemas import interna_json
+
+try:
+    import msgspec
+except ImportError:  # sem msgspec: json da biblioteca padrão, com a mesma projeção e verificação
+    msgspec = None
+
+# campos do alerta que vão para a aba "Alertas WB", na ordem das colunas, com o tipo esperado
+# (todos podem vir null). Para levar um campo novo da API para o Excel, basta declará-lo aqui.
+CAMPOS_ALERTA = {
+    "id": str,
+    "investigationStatus": str,
+    "status": str,
+    "investigationResult": str,
+    "model": str,
+    "score": int,
+    "severity": str,
+    "createdDateTime": str,
+    "updatedDateTime": str,
+    "firstInvestigatedDateTime": str,
+    "incidentId": str,
+    "caseId": str,
+    "description": str,
+}
+
+# campos conhecidos da API que não vão para o Excel (os pesados, como impactScope e indicators,
+# nem chegam a ser montados como objetos Python com msgspec)
+CAMPOS_EXCLUIDOS = [
+    "schemaVersion", "workbenchLink", "alertProvider", "modelId", "modelType",
+    "ownerIds", "impactScope", "matchedRules", "indicators", "campaign",
+    "industry", "regionAndCountry", "createdBy", "totalIndicatorCount",
+    "matchedIndicatorCount", "reportLink", "matchedIndicatorPatterns",
+]
+
+_CONHECIDOS = frozenset(CAMPOS_ALERTA) | frozenset(CAMPOS_EXCLUIDOS)
+
+# chave nextLink seguida de ":" (dentro de um texto JSON as aspas vêm escapadas, então só casa com chaves)
+_CHAVE_LINK = re.compile(rb'"nextLink"\s*:\s*')
+# o link é curto: não decodifica o resto da página atrás dele
+_TAMANHO_MAX_LINK = 64 * 1024
+
+if msgspec is not None:
+    # campo ausente fica UNSET e não vira chave no dict: as colunas são as mesmas do json padrão
+    Alerta = msgspec.defstruct("Alerta", [(campo, tipo | None | msgspec.UnsetType, msgspec.UNSET)
+                                          for campo, tipo in CAMPOS_ALERTA.items()])
+
+    class _Pagina(msgspec.Struct):
+        items: list[Alerta] = []
+        nextLink: str | None = None
+
+    class _Link(msgspec.Struct):
+        # só o nextLink: os alertas são percorridos sem montar nenhum objeto
+        nextLink: str | None = None
+
+    class _Chaves(msgspec.Struct):
+        # Raw só aponta para o trecho do JSON: dá as chaves de cada alerta sem montar os valores
+        items: list[dict[str, msgspec.Raw]] = []
+
+
+class DecodificadorWB:
+    """
+    Decodifica as páginas de /workbench/alerts direto para os campos de CAMPOS_ALERTA.
+    Com msgspec os alertas são lidos em structs declaradas (campos fora delas são pulados na
+    leitura, sem alocação) e os tipos são validados; sem msgspec, ou numa página com tipo
+    inesperado, usa o json padrão e projeta os campos. Conta campos novos e tipos divergentes
+    para relatorio(). Pode ser compartilhado entre as janelas (threads).
+    """
+    def __init__(self, usar_msgspec=True):
+        self.backend = "msgspec" if usar_msgspec and msgspec is not None else "json"
+        if self.backend == "msgspec":
+            self._pagina = msgspec.json.Decoder(_Pagina)
+            self._link = msgspec.json.Decoder(_Link)
+            self._chaves = msgspec.json.Decoder(_Chaves)
+        self._trava = threading.Lock()
+        self.paginas = 0
+        self.alertas = 0
+        self.paginas_fallback = 0
+        self.campos_novos = {}
+        self.tipos_divergentes = {}
+
+    def proximo_link(self, conteudo):
+        """
+        Leitura rápida só do nextLink da página (None se não houver), para disparar a próxima
+        requisição antes de decodificar os alertas. É uma antecipação: decodifica() devolve o
+        nextLink definitivo.
+        """
+        if self.backend == "msgspec":
+            try:
+                return self._link.decode(conteudo).nextLink
+            except msgspec.DecodeError:
+                return None
+        # a API põe o nextLink no fim da página: procura a última chave de trás para frente
+        fim = len(conteudo)
+        while (posicao := conteudo.rfind(b'"nextLink"', 0, fim)) >= 0:
+            chave = _CHAVE_LINK.match(conteudo, posicao)
+            if chave:
+                trecho = conteudo[chave.end():chave.end() + _TAMANHO_MAX_LINK].decode("utf-8", "ignore")
+                try:
+                    valor, _ = json.JSONDecoder().raw_decode(trecho)
+                except ValueError:
+                    return None
+                return valor if isinstance(valor, str) else None
+            fim = posicao
+        return None
+
+    def decodifica(self, conteudo):
+        """Bytes de uma página -> (lista de dicts com os campos declarados, nextLink ou None)."""
+        if self.backend == "msgspec":
+            try:
+                pagina = self._pagina.decode(conteudo)
+            except msgspec.ValidationError:
+                # tipo fora do declarado: a página vai pelo json padrão, que registra a divergência
+                with self._trava:
+                    self.paginas_fallback += 1
+            else:
+                novos = {}
+                for chaves in self._chaves.decode(conteudo).items:
+                    for chave in chaves.keys() - _CONHECIDOS:
+                        novos[chave] = novos.get(chave, 0) + 1
+                self._conta(len(pagina.items), novos, {})
+                return msgspec.to_builtins(pagina.items), pagina.nextLink
+        return self._decodifica_json(conteudo)
+
+    def _decodifica_json(self, conteudo):
+        dados = json.loads(conteudo, object_hook=interna_json())
+        itens, novos, divergentes = [], {}, {}
+        for item in dados.get("items", []):
+            projetado = {}
+            for chave, valor in item.items():
+                tipo = CAMPOS_ALERTA.get(chave)
+                if tipo is None:
+                    if chave not in _CONHECIDOS:
+                        novos[chave] = novos.get(chave, 0) + 1
+                    continue
+                # bool é int para o isinstance, mas não para o esquema
+                if valor is not None and type(valor) is not tipo:
+                    chave_tipo = (chave, type(valor).__name__)
+                    divergentes[chave_tipo] = divergentes.get(chave_tipo, 0) + 1
+                projetado[chave] = valor
+            itens.append(projetado)
+        self._conta(len(itens), novos, divergentes)
+        return itens, dados.get("nextLink")
+
+    def _conta(self, alertas, novos, divergentes):
+        with self._trava:
+            self.paginas += 1
+            self.alertas += alertas
+            for chave, n in novos.items():
+                self.campos_novos[chave] = self.campos_novos.get(chave, 0) + n
+            for chave, n in divergentes.items():
+                self.tipos_divergentes[chave] = self.tipos_divergentes.get(chave, 0) + n
+
+    def relatorio(self, rotulo="COLETA WB"):
+        """Imprime o resumo da decodificação e avisa sobre mudanças no formato da API."""
+        print(f"{rotulo} - {self.paginas} páginas, {self.alertas} alertas decodificados ({self.backend})")
+        if self.paginas_fallback:
+            print(f"[AVISO] {rotulo} - {self.paginas_fallback} páginas com tipos fora do declarado "
+                  f"lidas pelo json padrão")
+        if self.campos_novos:
+            campos = ", ".join(f"{c} ({n} alertas)" for c, n in sorted(self.campos_novos.items()))
+            print(f"[AVISO] {rotulo} - campos novos na API, fora da aba "
+                  f"(declare em decodifica_wb.CAMPOS_ALERTA para incluir): {campos}")
+        if self.tipos_divergentes:
+            tipos = ", ".join(f"{c}: {t} em {n} alertas (esperado {CAMPOS_ALERTA[c].__name__})"
+                              for (c, t), n in sorted(self.tipos_divergentes.items()))
+            print(f"[AVISO] {rotulo} - tipos diferentes do declarado: {tipos}")
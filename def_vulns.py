@@ -1,175 +1,359 @@
-import requests
 import zipfile
+import itertools
+import numpy as np
 import pandas as pd
 import json
-from io import BytesIO
-import time
+from collections import Counter
+from datetime import datetime, timezone
 from urllib.parse import urljoin, urlparse, parse_qs
 
+from download_zip import baixa_arquivo
+from cliente_http import obtem_cliente
+from gerenciador_exportacoes import GerenciadorExportacoes
+import metricas
+from esquemas import ESQUEMAS, aplica_esquema, interna_json
+from json_incremental import itens
+from leitura_paralela import le_membros
+
+# campos removidos do export (pesados/sensíveis)
+CAMPOS_DISPOSITIVO_EXCLUIR = ("ip",)
+CAMPOS_CVE_EXCLUIR = ("protectionRules", "mitigationOption")
+
+# modo fluxo: dispositivos lidos antes da primeira linha para descobrir a ordem das colunas
+AMOSTRA_COLUNAS = 500
+# modo fluxo: campos do export de vulnerableDevices que o book mantém (sem os excluídos acima).
+# Os que não aparecem na amostra entram no fim do bloco (dispositivo ou CVE), como no achatado,
+# onde a coluna surge na ordem da primeira ocorrência; campo novo da API precisa ser declarado aqui
+CAMPOS_DISPOSITIVO = ("id", "deviceName", "osName", "osVersion", "osPlatform", "lastUser", "cveCount")
+CAMPOS_CVE = ("id", "cvssScore", "riskLevel", "publishedDateTime", "exploitAttemptCount",
+              "globalExploitActivityLevel", "mitigationStatus")
+
+# abas do modo normalizado (vulns_modo=normalizado), no lugar da aba "vulnerabilidades":
+# dispositivos, catálogo de CVEs e ligação dispositivo x CVE
+ABAS_NORMALIZADAS = ("vulns dispositivos", "vulns CVEs", "vulns dispositivo x CVE")
+
+
+def _separa_cves(items):
+    """
+    Dispositivos (sem cveRecords), registros de CVE em um DataFrame só e quantas linhas de CVE
+    cada dispositivo ocupa (lista vazia ou ausente ocupa uma linha vazia, como no explode).
+    Sem cveRecords no export, retorna (dispositivos, None, None).
+    """
+    dispositivos = pd.DataFrame(items).drop(columns=list(CAMPOS_DISPOSITIVO_EXCLUIR), errors="ignore")
+    if "cveRecords" not in dispositivos.columns:
+        return dispositivos, None, None
+
+    registros = dispositivos.pop("cveRecords")
+    listas = [r if isinstance(r, list) and r else [None] for r in registros]
+    repeticoes = np.fromiter((len(r) for r in listas), dtype=np.int64, count=len(listas))
+
+    cves = pd.DataFrame([
+        cve if isinstance(cve, dict) else {}
+        for lista in listas for cve in lista
+    ]).drop(columns=list(CAMPOS_CVE_EXCLUIR), errors="ignore")
+    return dispositivos, cves, repeticoes
+
+
+def separa_membro(z, membro):
+    """
+    Lê um .json do ZIP e devolve o lote em colunas de _separa_cves (usado também nos processos
+    de leitura_paralela: o que volta são DataFrames e um array, não a lista de dicts).
+    """
+    with z.open(membro) as f:
+        dados = json.load(f, object_hook=interna_json())
+    return _separa_cves(dados.get("items", []))
+
+
+def junta_lotes(lotes):
+    """Concatena, na ordem, os lotes (dispositivos, cves, repeticoes) de separa_membro."""
+    lotes = [lote for lote in lotes if len(lote[0])]
+    if not lotes:
+        return pd.DataFrame(), None, None
+    dispositivos = pd.concat([d for d, _, _ in lotes], ignore_index=True)
+    if all(c is None for _, c, _ in lotes):
+        return dispositivos, None, None
+    # membro sem cveRecords: uma linha vazia de CVE por dispositivo
+    cves = pd.concat([c if c is not None else pd.DataFrame(index=range(len(d))) for d, c, _ in lotes],
+                     ignore_index=True)
+    repeticoes = np.concatenate([r if r is not None else np.ones(len(d), dtype=np.int64) for d, _, r in lotes])
+    return dispositivos, cves, repeticoes
+
+
+def achata_cves(items: list) -> pd.DataFrame:
+    """
+    Transforma os itens do export (um dict por dispositivo) em um DataFrame com uma linha por CVE.
+    Monta os arrays por coluna de uma vez (dispositivos repetidos por índice + registros de CVE),
+    sem criar um pd.Series por linha. Dispositivo sem CVE vira uma linha com os campos de CVE vazios.
+    """
+    return _achata(*_separa_cves(items))
+
+
+def _achata(dispositivos, cves, repeticoes):
+    if cves is None:
+        # Caso raro: export sem lista de CVEs
+        return dispositivos
+
+    dispositivos = dispositivos.take(np.repeat(np.arange(len(dispositivos)), repeticoes)).reset_index(drop=True)
+    return pd.concat([dispositivos, cves], axis=1)
+
+
+def normaliza_cves(items: list) -> dict:
+    """
+    Separa o export nas três tabelas de ABAS_NORMALIZADAS, sem repetir os dados do dispositivo
+    em cada CVE nem os da CVE em cada dispositivo:
+      - dispositivos: uma linha por dispositivo (id, deviceName, SO, cveCount...);
+      - CVEs: uma linha por id de CVE, com os campos que não variam entre dispositivos;
+      - dispositivo x CVE: deviceId, cveId e os campos que variam por dispositivo (ex.: mitigationStatus).
+    Quais campos são do catálogo é decidido pelos dados, com drop_duplicates/duplicated por coluna.
+    """
+    return _normaliza(*_separa_cves(items))
+
+
+def _normaliza(dispositivos, cves, repeticoes):
+    if "id" in dispositivos.columns:
+        ids_dispositivo = dispositivos["id"].to_numpy()
+        dispositivos = dispositivos.drop_duplicates(subset="id", ignore_index=True)
+    else:
+        ids_dispositivo = np.arange(len(dispositivos))
+
+    if cves is None or "id" not in cves.columns:
+        cves = pd.DataFrame({"id": pd.Series(dtype=object)})
+        ligacao = pd.DataFrame({"deviceId": pd.Series(dtype=object), "cveId": pd.Series(dtype=object)})
+        return dict(zip(ABAS_NORMALIZADAS, (dispositivos, cves, ligacao)))
+
+    # uma linha por (dispositivo, CVE); dispositivo sem CVE fica só na tabela de dispositivos
+    cves.insert(0, "deviceId", np.repeat(ids_dispositivo, repeticoes))
+    cves = cves[cves["id"].notna()].reset_index(drop=True)
+
+    # campo do catálogo = um único valor por id de CVE (pares (id, valor) distintos == ids distintos)
+    total_ids = cves["id"].nunique()
+    constantes, variaveis = [], []
+    for coluna in cves.columns[2:]:
+        try:
+            unico = int((~cves.duplicated(subset=["id", coluna])).sum()) == total_ids
+        except TypeError:  # lista/dict: não dá para comparar, fica na ligação
+            unico = False
+        (constantes if unico else variaveis).append(coluna)
+    print(f"[Vulns] catálogo de CVEs: {', '.join(constantes) or '-'} | "
+          f"por dispositivo: {', '.join(variaveis) or '-'}")
+
+    catalogo = cves.drop_duplicates(subset="id", ignore_index=True)[["id", *constantes]]
+    ligacao = cves[["deviceId", "id", *variaveis]].rename(columns={"id": "cveId"})
+    return dict(zip(ABAS_NORMALIZADAS, (dispositivos, catalogo, ligacao)))
+
+
+def _data_utc(texto, cache):
+    """ISO 8601 da API -> datetime sem fuso, em UTC (como aplica_esquema); None se inválida."""
+    if texto not in cache:
+        try:
+            data = datetime.fromisoformat(texto)
+            if data.tzinfo is not None:
+                data = data.astimezone(timezone.utc).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            data = None
+        cache[texto] = data
+    return cache[texto]
+
+
+def _chaves(registros, excluir, declaradas=()):
+    """
+    Chaves dos dicts na ordem em que aparecem pela primeira vez, sem as excluídas, seguidas das
+    `declaradas` que não apareceram.
+    """
+    vistas = dict.fromkeys(k for r in registros if isinstance(r, dict) for k in r)
+    vistas.update(dict.fromkeys(declaradas))
+    return [k for k in vistas if k not in excluir]
+
+
+def fluxo_cves(z, amostra=AMOSTRA_COLUNAS):
+    """
+    Linhas de CVE (mesmas colunas e ordem de achata_cves) geradas direto dos .json do ZIP,
+    um dispositivo por vez, sem lista de itens nem DataFrame. As colunas são as dos primeiros
+    `amostra` dispositivos mais as declaradas em CAMPOS_DISPOSITIVO / CAMPOS_CVE (o cabeçalho é
+    escrito antes das linhas); um campo fora delas que só aparece depois é contado e avisado no fim.
+    Retorna (colunas, gerador de tuplas).
+    """
+    membros = [f for f in z.namelist() if f.lower().endswith(".json")]
+
+    def dispositivos():
+        for membro in membros:
+            with z.open(membro) as f:
+                yield from itens(f)
+
+    fonte = dispositivos()
+    inicio = list(itertools.islice(fonte, amostra))
+    excluir_dispositivo = {*CAMPOS_DISPOSITIVO_EXCLUIR, "cveRecords"}
+    colunas_dispositivo = _chaves(inicio, excluir_dispositivo, CAMPOS_DISPOSITIVO if inicio else ())
+    colunas_cve = _chaves((cve for d in inicio for cve in d.get("cveRecords") or []), set(CAMPOS_CVE_EXCLUIR),
+                          CAMPOS_CVE if inicio else ())
+    datas = set(ESQUEMAS["vulnerabilidades"]["data"])
+
+    def linhas():
+        conhecidas = set(colunas_dispositivo) | excluir_dispositivo | set(colunas_cve) | set(CAMPOS_CVE_EXCLUIR)
+        ignoradas = Counter()
+        cache_datas = {}
+        data_dispositivo = [c in datas for c in colunas_dispositivo]
+        data_cve = [c in datas for c in colunas_cve]
+        vazio_cve = (None,) * len(colunas_cve)
+
+        def valores(registro, colunas, e_data):
+            return tuple(_data_utc(registro.get(c), cache_datas) if d and registro.get(c) is not None
+                         else registro.get(c) for c, d in zip(colunas, e_data))
+
+        for dispositivo in itertools.chain(inicio, fonte):
+            registros = dispositivo.pop("cveRecords", None)
+            ignoradas.update(k for k in dispositivo if k not in conhecidas)
+            base = valores(dispositivo, colunas_dispositivo, data_dispositivo)
+            if not isinstance(registros, list) or not registros:
+                yield base + vazio_cve
+                continue
+            for cve in registros:
+                if not isinstance(cve, dict):
+                    yield base + vazio_cve
+                    continue
+                ignoradas.update(k for k in cve if k not in conhecidas)
+                yield base + valores(cve, colunas_cve, data_cve)
+        inicio.clear()
+        if ignoradas:
+            print(f"[Vulns] [AVISO] campos fora das colunas do fluxo (ignorados): "
+                  + ", ".join(f"{k} ({n})" for k, n in ignoradas.most_common()))
+
+    return colunas_dispositivo + colunas_cve, linhas()
+
+
+def _baixa_export(url_region, token, poll_interval, max_wait_seconds, max_restarts, stuck_minutes,
+                  cliente, gerenciador, cache=None):
+    """
+    Inicia o export de dispositivos vulneráveis, espera ficar pronto e devolve o ZIP baixado.
+    Com `cache` (CacheArtefatos), um export ainda válido no cache é devolvido sem chamar a API.
+    """
+    # Garante barra final na base
+    if not url_region.endswith('/'):
+        url_region = url_region + '/'
+
+    url_path = 'beta/asrm/vulnerableDevices/export'
+    chave = cache.chave("export", urljoin(url_region, url_path)) if cache else None
+    if cache and (arquivo_zip := cache.abre(chave)):
+        return arquivo_zip
+
+    cliente = cliente or obtem_cliente(url_region, token)
+    gerenciador = gerenciador or GerenciadorExportacoes(
+        cliente,
+        intervalo_inicial=poll_interval,
+        max_espera=max_wait_seconds,
+        minutos_preso=stuck_minutes,
+        max_reinicios=max_restarts
+    )
+
+    # 1) Inicia export
+    futuro = gerenciador.submete("vulns", urljoin(url_region, url_path),
+                                 max_espera=max_wait_seconds, prefixo="[Vulns] CREM", url_base=url_region)
+    # 2) Poll até finalizar (com circuit breaker e reinício de job preso)
+    with metricas.etapa("polling"):
+        download_url = futuro.result()
+
+    # 3) Baixa o ZIP
+    qs = parse_qs(urlparse(download_url).query)
+    is_presigned_s3 = any(k.lower().startswith('x-amz-') for k in qs.keys())
+
+    dl_headers = {'Accept': 'application/zip,application/json'}
+    if is_presigned_s3:
+        # URL pré-assinada não aceita o header Bearer da sessão
+        dl_headers['Authorization'] = None
+
+    with metricas.etapa("download"):
+        arquivo_zip = baixa_arquivo(download_url, headers=dl_headers, prefixo="[Vulns]", sessao=cliente.sessao)
+    if cache:
+        cache.guarda(chave, arquivo_zip, "export vulnerabilidades")
+    return arquivo_zip
+
+
+def coleta_vulns_fluxo(
+    url_region: str,
+    token: str,
+    livro,
+    aba: str = "vulnerabilidades",
+    colunas_adicionais=None,
+    poll_interval: int = 20,
+    max_wait_seconds: int = 10 * 60,
+    max_restarts: int = 2,
+    stuck_minutes: int = 5,
+    cliente=None,
+    gerenciador=None,
+    cache=None
+):
+    """
+    Como coleta_vulns, mas as linhas de CVE vão do JSON do ZIP direto para a aba de um
+    LivroExcelFluxo (memória constante, qualquer que seja o tamanho do tenant).
+    Retorna o número de linhas escritas ou uma string de erro.
+    """
+    try:
+        arquivo_zip = _baixa_export(url_region, token, poll_interval, max_wait_seconds, max_restarts,
+                                    stuck_minutes, cliente, gerenciador, cache)
+        with arquivo_zip, zipfile.ZipFile(arquivo_zip) as z:
+            with metricas.etapa("leitura JSON"):
+                colunas, linhas = fluxo_cves(z)
+            if not colunas:
+                raise ValueError("Nenhum item encontrado dentro dos arquivos JSON do export.")
+            return livro.escreve_linhas(aba, colunas, linhas, colunas_adicionais=colunas_adicionais)
+
+    except Exception as e:
+        return f"ERRO na coleta_vulnerabilidades: {e.__class__.__name__}: {e}"
+
+
 def coleta_vulns(
     url_region: str,
     token: str,
     poll_interval: int = 20,
     max_wait_seconds: int = 10 * 60,
     max_restarts: int = 2,
-    stuck_minutes: int = 5
+    stuck_minutes: int = 5,
+    cliente=None,
+    gerenciador=None,
+    normalizado=False,
+    processos=1,
+    cache=None
 ):
     """
     Coleta vulnerabilidades (ASRM) e retorna um DataFrame com uma linha por CVE.
+    Com `normalizado`, retorna um dict aba -> DataFrame com as três tabelas de normaliza_cves.
+    Os .json do ZIP são lidos em até `processos` processos (0 = automático, ver leitura_paralela).
+    Com `cache` (CacheArtefatos) o ZIP do export é reaproveitado dentro da validade do cache.
     Em caso de erro, retorna **uma string** descrevendo o erro (em vez de lançar exceção).
     """
     try:
-        # Garante barra final na base
-        if not url_region.endswith('/'):
-            url_region = url_region + '/'
-
-        url_path = 'beta/asrm/vulnerableDevices/export'
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json;charset=utf-8',
-            'Accept': 'application/json'
-        }
-
-        def start_export() -> str:
-            """Inicia o export e retorna a Operation-Location resolvida."""
-            r = requests.post(urljoin(url_region, url_path), headers=headers, json={})
-            if r.status_code != 202:
-                raise RuntimeError(f"Erro ao iniciar exportação: HTTP {r.status_code}, body={r.text}")
-            op = r.headers.get('Operation-Location')
-            if not op:
-                raise RuntimeError("Operation-Location não encontrado na resposta do POST.")
-            # Completa se vier relativo
-            if op.startswith(('beta/', 'v3/', 'api/')):
-                op = urljoin(url_region, op)
-            print(f"[Vulns] CREM Operation-Location: {op}")
-            return op
-
-        def poll_until_done(operation_url: str) -> str:
-            """
-            Faz polling até finalizar ou estourar timeout. Tenta reiniciar se preso.
-            Retorna a URL de download (resource/result uri).
-            """
-            start_ts = time.time()
-            attempts = 0
-            backoff = poll_interval
-            restarts = 0
-
-            last_status = None
-            last_progress = None
-            last_change_ts = start_ts
-
-            terminal_success = {"succeeded", "completed", "done", "success"}
-            terminal_fail = {"failed", "cancelled", "canceled", "error", "timeout"}
-
-            while True:
-                attempts += 1
-                elapsed = time.time() - start_ts
-                if elapsed > max_wait_seconds:
-                    raise TimeoutError(f"Polling excedeu {max_wait_seconds}s; último status={last_status}, progress={last_progress}")
-
-                resp = requests.get(operation_url, headers=headers)
-                try:
-                    payload = resp.json()
-                except Exception:
-                    raise RuntimeError(f"Não foi possível decodificar JSON do status (HTTP {resp.status_code}): {resp.text}")
-
-                status = (payload.get("status") or "").lower()
-                progress = payload.get("percentage") or payload.get("progress") or payload.get("percentComplete")
-                print(f"[Vulns] CREM Status da tarefa: {status} | progress={progress} | tent.{attempts}")
-
-                # Detecta mudança de status/progresso
-                if status != last_status or progress != last_progress:
-                    last_status, last_progress = status, progress
-                    last_change_ts = time.time()
-
-                # Sucesso
-                if status in terminal_success:
-                    download_url = (
-                        payload.get("resourceLocation")
-                        or payload.get("resultLocation")
-                        or payload.get("resourceUri")
-                        or payload.get("resultUri")
-                    )
-                    if not download_url:
-                        raise RuntimeError(f"Job finalizou sem URL de download. Resposta: {payload}")
-                    return download_url
-
-                # Falha terminal
-                if status in terminal_fail:
-                    raise RuntimeError(f"Exportação não concluída (status: {status}). Resposta: {payload}")
-
-                # Circuit breaker: preso sem progresso por stuck_minutes
-                stuck_seconds = time.time() - last_change_ts
-                if status in {"running", "inprogress", "in_progress", "queued", "accepted"} and (progress in (None, 0)):
-                    if stuck_seconds > stuck_minutes * 60:
-                        if restarts < max_restarts:
-                            restarts += 1
-                            print(f"[Vulns] CREM Job preso há {int(stuck_seconds)}s; reiniciando export (#{restarts})...")
-                            operation_url = start_export()
-                            # Reinicia contadores locais, mantém relógio global p/ timeout total
-                            attempts = 0
-                            backoff = poll_interval
-                            last_status = None
-                            last_progress = None
-                            last_change_ts = time.time()
-                            continue
-                        else:
-                            raise TimeoutError(f"Job preso em '{status}' sem progresso por {stuck_seconds:.0f}s após {restarts} reinícios.")
-
-                # Aguardar próximo poll com backoff (máx 60s)
-                time.sleep(backoff)
-                backoff = min(backoff + 5, 60)
-
-        # 1) Inicia export
-        operation_url = start_export()
-        # 2) Poll até finalizar (com circuit breaker)
-        download_url = poll_until_done(operation_url)
-
-        # 3) Baixa o ZIP
-        qs = parse_qs(urlparse(download_url).query)
-        is_presigned_s3 = any(k.lower().startswith('x-amz-') for k in qs.keys())
-
-        dl_headers = {'Accept': 'application/zip,application/json'}
-        if not is_presigned_s3:
-            dl_headers['Authorization'] = f'Bearer {token}'
-
-        dl_resp = requests.get(download_url, headers=dl_headers, allow_redirects=True)
-        if dl_resp.status_code >= 400:
-            raise RuntimeError(f"Falha ao baixar export: HTTP {dl_resp.status_code}, body={dl_resp.text}")
-        content = dl_resp.content
-
-        # 4) Descompacta e lê JSONs
-        all_items = []
-        with zipfile.ZipFile(BytesIO(content)) as z:
-            for filename in z.namelist():
-                if filename.lower().endswith(".json"):
-                    with z.open(filename) as f:
-                        data = json.load(f)
-                        items = data.get("items", [])
-                        for item in items:
-                            # Limpa campos pesados/sensíveis
-                            item.pop("ip", None)
-                            # Enxuga cveRecords
-                            if "cveRecords" in item and isinstance(item["cveRecords"], list):
-                                for cve in item["cveRecords"]:
-                                    if isinstance(cve, dict):
-                                        for campo in ("protectionRules", "mitigationOption"):
-                                            cve.pop(campo, None)
-                            all_items.append(item)
-                    print(f"[Vulns] Lido {len(items)} itens de {filename}")
-
-        if not all_items:
+        # 1-3) inicia o export, espera (circuit breaker e reinício de job preso) e baixa o ZIP
+        arquivo_zip = _baixa_export(url_region, token, poll_interval, max_wait_seconds, max_restarts,
+                                    stuck_minutes, cliente, gerenciador, cache)
+
+        # 4) Descompacta e lê JSONs (cada membro vira um lote em colunas, em paralelo se pedido)
+        with metricas.etapa("leitura JSON"), arquivo_zip:
+            with zipfile.ZipFile(arquivo_zip) as z:
+                membros = [f for f in z.namelist() if f.lower().endswith(".json")]
+            lotes = le_membros(arquivo_zip, separa_membro, membros, processos, prefixo="[Vulns]")
+        for membro, (dispositivos, _, _) in zip(membros, lotes):
+            print(f"[Vulns] Lido {len(dispositivos)} itens de {membro}")
+        partes = junta_lotes(lotes)
+        del lotes
+
+        if not len(partes[0]):
             raise ValueError("Nenhum item encontrado dentro dos arquivos JSON do export.")
 
-        # 5) DataFrame com uma linha por CVE
-        df = pd.DataFrame(all_items)
-        if "cveRecords" not in df.columns:
-            # Caso raro: export sem lista de CVEs
-            return df
+        if normalizado:
+            with metricas.etapa("normalização CVEs"):
+                tabelas = _normaliza(*partes)
+            del partes
+            with metricas.etapa("tipos"):
+                return {aba: aplica_esquema(df, aba) for aba, df in tabelas.items()}
+
+        # 5) DataFrame com uma linha por CVE (campos pesados/sensíveis removidos por coluna)
+        with metricas.etapa("achatamento CVEs"):
+            df = _achata(*partes)
+        del partes
 
-        df = df.explode("cveRecords").reset_index(drop=True)
-        cve_df = pd.concat([df.drop(columns=["cveRecords"]), df["cveRecords"].apply(pd.Series)], axis=1)
-        return cve_df
+        # 6) tipos declarados em esquemas.py (category, inteiros menores, datas)
+        with metricas.etapa("tipos"):
+            return aplica_esquema(df, "vulnerabilidades")
 
     except Exception as e:
         # Em qualquer erro, devolve uma string, não lança
@@ -0,0 +1,133 @@
+import re
+import time
+import tempfile
+import requests
+
+import metricas
+from cliente_http import espera_backoff
+
+# acima deste tamanho o arquivo temporário sai da memória e vai para o disco
+LIMITE_MEMORIA = 16 * 1024 * 1024
+TAMANHO_BLOCO = 1024 * 1024
+# Content-Range de uma resposta 206: "bytes <início>-<fim>/<total ou *>"
+FAIXA = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+def _tamanho_total(resposta):
+    """Tamanho total do arquivo a partir de Content-Range (206) ou Content-Length (200)."""
+    if resposta.headers.get("Content-Encoding"):
+        # conteúdo comprimido no transporte: o tamanho recebido não bate com o header
+        return None
+    faixa = resposta.headers.get("Content-Range", "")
+    if resposta.status_code == 206 and "/" in faixa:
+        total = faixa.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    tamanho = resposta.headers.get("Content-Length")
+    return int(tamanho) if tamanho and tamanho.isdigit() else None
+
+
+def _inicio_faixa(resposta):
+    """Byte inicial do Content-Range de uma resposta 206 (None se o header faltar ou for inválido)."""
+    faixa = FAIXA.match(resposta.headers.get("Content-Range", "").strip())
+    return int(faixa.group(1)) if faixa else None
+
+
+def baixa_arquivo(url, headers=None, timeout=120, tentativas=3, prefixo="[download]",
+                  tamanho_bloco=TAMANHO_BLOCO, limite_memoria=LIMITE_MEMORIA, sessao=None,
+                  espera_base=1.0, espera_max=30.0):
+    """
+    Baixa url em blocos para um arquivo temporário (SpooledTemporaryFile) e o devolve
+    posicionado no início, pronto para zipfile.ZipFile.
+    Confere o Content-Length e, se a transferência cair no meio, retoma com HTTP Range
+    quando o servidor aceita (Accept-Ranges: bytes, como as URLs pré-assinadas do S3); uma
+    resposta 206 que não começa no byte pedido descarta o parcial e recomeça do zero.
+    Entre as tentativas (HTTP 5xx, conexão caída, download incompleto) espera com backoff
+    exponencial, como o cliente_http.
+    Se sessao for informada (ex.: ClienteVisionOne.sessao) reaproveita as conexões dela.
+    Lança RuntimeError se não conseguir completar o download.
+    """
+    http = sessao or requests
+    arquivo = tempfile.SpooledTemporaryFile(max_size=limite_memoria)
+    recebidos = 0
+    total = None
+    aceita_range = False
+    inicio = time.perf_counter()
+
+    try:
+        for tentativa in range(1, tentativas + 1):
+            if tentativa > 1:
+                espera = espera_backoff(tentativa - 1, espera_base, espera_max)
+                print(f"{prefixo} nova tentativa em {espera:.1f}s")
+                time.sleep(espera)
+            cabecalhos = dict(headers or {})
+            if recebidos and aceita_range:
+                cabecalhos["Range"] = f"bytes={recebidos}-"
+                print(f"{prefixo} retomando download a partir de {recebidos} bytes...")
+
+            try:
+                with http.get(url, headers=cabecalhos, stream=True, timeout=timeout,
+                              allow_redirects=True) as resposta:
+                    if resposta.status_code >= 500:
+                        print(f"{prefixo} HTTP {resposta.status_code}; tentativa {tentativa}/{tentativas}")
+                        continue
+                    if resposta.status_code >= 400:
+                        raise RuntimeError(
+                            f"Falha ao baixar export: HTTP {resposta.status_code}, body={resposta.text[:300]}"
+                        )
+
+                    if resposta.status_code != 206 and recebidos:
+                        # servidor ignorou o Range: recomeça do zero
+                        arquivo.seek(0)
+                        arquivo.truncate()
+                        recebidos = 0
+                    elif resposta.status_code == 206 and _inicio_faixa(resposta) != recebidos:
+                        # faixa diferente da pedida: anexar corromperia o ZIP; recomeça sem Range
+                        print(f"{prefixo} Content-Range '{resposta.headers.get('Content-Range')}' não começa "
+                              f"em {recebidos}; recomeçando do zero (tentativa {tentativa}/{tentativas})")
+                        arquivo.seek(0)
+                        arquivo.truncate()
+                        recebidos = 0
+                        continue
+
+                    aceita_range = aceita_range or resposta.headers.get("Accept-Ranges", "").lower() == "bytes"
+                    total = _tamanho_total(resposta) or total
+
+                    ultimo_aviso = time.perf_counter()
+                    for bloco in resposta.iter_content(chunk_size=tamanho_bloco):
+                        arquivo.write(bloco)
+                        recebidos += len(bloco)
+                        metricas.registra(bytes_baixados=len(bloco))
+                        if time.perf_counter() - ultimo_aviso >= 10:
+                            ultimo_aviso = time.perf_counter()
+                            print(f"{prefixo} {_progresso(recebidos, total, inicio)}")
+
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                print(f"{prefixo} transferência interrompida após {recebidos} bytes ({e.__class__.__name__}); "
+                      f"tentativa {tentativa}/{tentativas}")
+                continue
+
+            if total is not None and recebidos != total:
+                print(f"{prefixo} recebidos {recebidos} de {total} bytes; tentativa {tentativa}/{tentativas}")
+                if recebidos > total:
+                    arquivo.seek(0)
+                    arquivo.truncate()
+                    recebidos = 0
+                continue
+            break
+        else:
+            raise RuntimeError(f"Download incompleto após {tentativas} tentativas ({recebidos} bytes recebidos).")
+    except BaseException:
+        arquivo.close()
+        raise
+
+    print(f"{prefixo} download concluído: {_progresso(recebidos, total, inicio)}")
+    arquivo.seek(0)
+    return arquivo
+
+
+def _progresso(recebidos, total, inicio):
+    decorrido = max(time.perf_counter() - inicio, 1e-6)
+    taxa = recebidos / decorrido / (1024 * 1024)
+    de_total = f" de {total / (1024 * 1024):.1f}" if total else ""
+    return f"{recebidos / (1024 * 1024):.1f}{de_total} MB em {decorrido:.1f}s ({taxa:.2f} MB/s)"
@@ -0,0 +1,108 @@
+import pandas as pd
+
+# Esquema declarado por aba: colunas que viram category (poucos valores distintos repetidos
+# em muitas linhas), inteiros reduzidos ao menor tipo que cabe e datas convertidas uma vez.
+# Colunas ausentes no DataFrame são ignoradas; o restante fica como veio.
+# Floats ficam em float64: em float32 o Excel mostraria 7.5 como 7.499999809...
+ESQUEMAS = {
+    "Alertas WB": {
+        "categoria": ["investigationStatus", "status", "investigationResult", "model", "severity",
+                      "alertProvider", "modelType", "schemaVersion"],
+        "inteiro": ["score"],
+        "data": ["createdDateTime", "updatedDateTime", "firstInvestigatedDateTime"],
+    },
+    "endpoint inventory": {
+        "categoria": ["type", "osName", "osVersion", "osPlatform", "osArchitecture", "osKernelVersion",
+                      "productCode", "agentUpdateStatus", "agentUpdatePolicy", "securityPolicy",
+                      "eppAgent.componentVersion", "eppAgent.policyName", "eppAgent.status",
+                      "eppAgent.endpointGroup", "eppAgent.protectionManager",
+                      "edrSensor.connectivity", "edrSensor.version", "edrSensor.status",
+                      "edrSensor.componentUpdatePolicy", "edrSensor.componentUpdateStatus"],
+        "inteiro": [],
+        "data": ["eppAgent.lastConnectedDateTime", "edrSensor.lastConnectedDateTime",
+                 "eppAgent.installedDateTime", "edrSensor.installedDateTime"],
+    },
+    # em vulnerabilidades há duas colunas "id" (dispositivo e CVE); as duas repetem por linha
+    "vulnerabilidades": {
+        "categoria": ["id", "deviceName", "osName", "osVersion", "osPlatform", "lastUser",
+                      "riskLevel", "globalExploitActivityLevel", "mitigationStatus"],
+        "inteiro": ["cveCount", "exploitAttemptCount"],
+        "data": ["publishedDateTime"],
+    },
+    # modo normalizado (def_vulns.normaliza_cves): aqui os ids de dispositivo/CVE só repetem na ligação
+    "vulns dispositivos": {
+        "categoria": ["osName", "osVersion", "osPlatform", "lastUser"],
+        "inteiro": ["cveCount"],
+        "data": [],
+    },
+    "vulns CVEs": {
+        "categoria": ["riskLevel", "globalExploitActivityLevel", "mitigationStatus"],
+        "inteiro": ["exploitAttemptCount"],
+        "data": ["publishedDateTime"],
+    },
+    "vulns dispositivo x CVE": {
+        "categoria": ["deviceId", "cveId", "riskLevel", "globalExploitActivityLevel", "mitigationStatus"],
+        "inteiro": ["exploitAttemptCount"],
+        "data": ["publishedDateTime"],
+    },
+}
+
+
+def interna_json():
+    """
+    object_hook para json.load/resp.json(): valores de texto repetidos (severidade, SO, id da CVE...)
+    passam a ser o mesmo objeto str, em vez de uma cópia por registro. Um cache por leitura.
+    """
+    cache = {}
+
+    def gancho(objeto):
+        for chave, valor in objeto.items():
+            if type(valor) is str:
+                objeto[chave] = cache.setdefault(valor, valor)
+        return objeto
+
+    return gancho
+
+
+def _converte(serie, tipo):
+    if tipo == "categoria":
+        return serie.astype("category")
+    if tipo == "inteiro":
+        return pd.to_numeric(serie, downcast="integer")
+    # datas ISO 8601 da API em UTC; sem fuso no resultado porque o Excel não grava datas com fuso
+    return pd.to_datetime(serie, utc=True, errors="coerce", format="ISO8601").dt.tz_localize(None)
+
+
+def aplica_esquema(df, aba, relatorio=True):
+    """
+    Converte as colunas do DataFrame conforme ESQUEMAS[aba] (no lugar, por posição, para suportar
+    colunas repetidas) e imprime quanto cada coluna economizou. Retorna o DataFrame.
+    """
+    esquema = ESQUEMAS.get(aba)
+    if not isinstance(df, pd.DataFrame) or not esquema or df.empty:
+        return df
+
+    tipos = {coluna: tipo for tipo, colunas in esquema.items() for coluna in colunas}
+    antes = df.memory_usage(index=False, deep=True).tolist() if relatorio else None
+
+    convertidas = []
+    for i, coluna in enumerate(df.columns):
+        tipo = tipos.get(coluna)
+        if tipo is None:
+            continue
+        try:
+            df.isetitem(i, _converte(df.iloc[:, i], tipo))
+            convertidas.append(i)
+        except (TypeError, ValueError) as e:
+            print(f"[tipos] [AVISO] coluna '{coluna}' de {aba} mantida como veio: {e}")
+
+    if relatorio and convertidas:
+        depois = df.memory_usage(index=False, deep=True).tolist()
+        mb = 1024 * 1024
+        for i in convertidas:
+            print(f"[tipos] {aba} | {df.columns[i]} | {df.dtypes.iloc[i]} | "
+                  f"{antes[i] / mb:.2f} MB -> {depois[i] / mb:.2f} MB")
+        total_antes, total_depois = sum(antes), sum(depois)
+        print(f"[tipos] {aba}: {total_antes / mb:.1f} MB -> {total_depois / mb:.1f} MB "
+              f"({total_antes / max(total_depois, 1):.1f}x menor)")
+    return df
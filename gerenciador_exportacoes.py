@@ -0,0 +1,210 @@
+import time
+import threading
+import contextvars
+from concurrent.futures import Future
+from urllib.parse import urljoin
+
+import metricas
+
+TERMINAL_SUCESSO = {"succeeded", "completed", "done", "success"}
+TERMINAL_FALHA = {"failed", "cancelled", "canceled", "error", "timeout"}
+EM_ANDAMENTO = {"running", "inprogress", "in_progress", "queued", "accepted", "notstarted"}
+
+CABECALHOS_JSON = {
+    "Content-Type": "application/json;charset=utf-8",
+    "Accept": "application/json",
+}
+
+
+def _sucesso(status):
+    return status in TERMINAL_SUCESSO or "succeed" in status or "complete" in status
+
+
+def _falha(status):
+    return status in TERMINAL_FALHA or "fail" in status or "cancel" in status
+
+
+def _url_download(payload):
+    """URL do arquivo exportado, nos formatos de resposta que a API já usou."""
+    return (
+        payload.get("resourceLocation")
+        or (payload.get("result") or {}).get("resourceLocation")
+        or payload.get("resultLocation")
+        or payload.get("resourceUri")
+        or payload.get("resultUri")
+        or payload.get("location")
+    )
+
+
+class _Job:
+    def __init__(self, nome, url_export, corpo, max_espera, prefixo, url_base=None):
+        self.nome = nome
+        self.url_export = url_export
+        self.url_base = url_base or url_export
+        self.corpo = corpo
+        self.max_espera = max_espera
+        self.prefixo = prefixo
+        self.futuro = Future()
+        # contexto de quem submeteu: as consultas contam para a etapa dele nas métricas
+        self.contexto = contextvars.copy_context()
+        self.operation_url = None
+        self.inicio = time.monotonic()
+        self.proximo_poll = self.inicio
+        self.intervalo = None
+        self.tentativas = 0
+        self.reinicios = 0
+        self.ultimo_status = None
+        self.ultimo_progresso = None
+        self.ultima_mudanca = self.inicio
+
+
+class GerenciadorExportacoes:
+    """
+    Dispara exportações assíncronas da API (POST -> Operation-Location) e acompanha todas
+    em um único laço de polling. O intervalo de cada job encurta enquanto a porcentagem avança
+    e alonga quando o job está parado. Job preso sem progresso por `minutos_preso` é reiniciado
+    (até `max_reinicios` vezes). Cada submete() devolve um Future com a URL de download,
+    resolvido assim que aquele job termina.
+    """
+    def __init__(self, cliente, intervalo_inicial=20, intervalo_min=5, intervalo_max=60,
+                 max_espera=10 * 60, minutos_preso=5, max_reinicios=2):
+        self.cliente = cliente
+        self.intervalo_inicial = intervalo_inicial
+        self.intervalo_min = min(intervalo_min, intervalo_inicial)
+        self.intervalo_max = intervalo_max
+        self.max_espera = max_espera
+        self.minutos_preso = minutos_preso
+        self.max_reinicios = max_reinicios
+
+        self._jobs = []
+        self._trava = threading.Lock()
+        self._acorda = threading.Event()
+        self._thread = None
+
+    # ---------- API pública ----------
+    def submete(self, nome, url_export, corpo=None, max_espera=None, prefixo=None, url_base=None):
+        """
+        Inicia a exportação em url_export e devolve um Future com a URL de download.
+        Uma Operation-Location relativa é resolvida contra url_base (a URL da região).
+        Erros do POST inicial são lançados aqui; erros do polling ficam no Future.
+        """
+        job = _Job(nome, url_export, corpo or {}, max_espera or self.max_espera, prefixo or f"[{nome}]",
+                   url_base=url_base)
+        job.intervalo = self.intervalo_inicial
+        job.operation_url = self._inicia(job)
+
+        with self._trava:
+            self._jobs.append(job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._laco, name="exportacoes", daemon=True)
+                self._thread.start()
+        self._acorda.set()
+        return job.futuro
+
+    # ---------- Internos ----------
+    def _inicia(self, job):
+        """Faz o POST do export e retorna a Operation-Location resolvida."""
+        r = self.cliente.post(job.url_export, headers=CABECALHOS_JSON, json=job.corpo)
+        if r.status_code != 202:
+            raise RuntimeError(f"Exportação não iniciada: HTTP {r.status_code} - {r.text[:300]}")
+        op = r.headers.get("Operation-Location") or r.headers.get("Location")
+        if not op:
+            raise RuntimeError("Operation-Location ausente na resposta da API.")
+        # Completa se vier relativo (sem descartar um prefixo de caminho da URL da região)
+        if not op.lower().startswith(("http://", "https://")):
+            op = urljoin(job.url_base.rstrip("/") + "/", op.lstrip("/"))
+        print(f"{job.prefixo} Operation-Location: {op}")
+        return op
+
+    def _laco(self):
+        while True:
+            with self._trava:
+                if not self._jobs:
+                    self._thread = None
+                    return
+                agora = time.monotonic()
+                devidos = [j for j in self._jobs if j.proximo_poll <= agora]
+                espera = 0 if devidos else min(j.proximo_poll for j in self._jobs) - agora
+
+            if not devidos:
+                self._acorda.wait(espera)
+                self._acorda.clear()
+                continue
+
+            for job in devidos:
+                try:
+                    url = job.contexto.run(self._consulta, job)
+                except Exception as e:
+                    self._encerra(job)
+                    job.futuro.set_exception(e)
+                    continue
+                if url:
+                    self._encerra(job)
+                    job.futuro.set_result(url)
+
+    def _encerra(self, job):
+        with self._trava:
+            self._jobs.remove(job)
+
+    def _consulta(self, job):
+        """Consulta o status do job. Retorna a URL de download quando termina, senão None."""
+        agora = time.monotonic()
+        if agora - job.inicio > job.max_espera:
+            raise TimeoutError(
+                f"Polling excedeu {job.max_espera}s; último status={job.ultimo_status}, "
+                f"progress={job.ultimo_progresso}"
+            )
+
+        job.tentativas += 1
+        resp = self.cliente.get(job.operation_url, headers=CABECALHOS_JSON)
+        try:
+            payload = resp.json()
+        except Exception:
+            raise RuntimeError(
+                f"Não foi possível decodificar JSON do status (HTTP {resp.status_code}): {resp.text[:300]}"
+            )
+
+        status = str(payload.get("status") or "").lower()
+        progresso = payload.get("percentage") or payload.get("progress") or payload.get("percentComplete")
+        print(f"{job.prefixo} status: {status} | progress={progresso} | tent.{job.tentativas}")
+        metricas.publica(status=f"export: {status}", percentual=progresso)
+
+        if _sucesso(status):
+            url = _url_download(payload)
+            if not url:
+                raise RuntimeError(f"Job finalizou sem URL de download. Resposta: {payload}")
+            return url
+
+        if _falha(status):
+            raise RuntimeError(f"Exportação não concluída (status: {status}). Resposta: {payload}")
+
+        # Detecta mudança de status/progresso e adapta o intervalo
+        agora = time.monotonic()
+        primeira = job.ultimo_status is None
+        if status != job.ultimo_status or progresso != job.ultimo_progresso:
+            job.ultimo_status, job.ultimo_progresso = status, progresso
+            job.ultima_mudanca = agora
+            if not primeira:
+                job.intervalo = max(self.intervalo_min, job.intervalo / 2)
+        else:
+            job.intervalo = min(self.intervalo_max, job.intervalo * 1.5)
+
+        # Circuit breaker: preso sem progresso por minutos_preso
+        parado = agora - job.ultima_mudanca
+        if status in EM_ANDAMENTO and progresso in (None, 0) and parado > self.minutos_preso * 60:
+            if job.reinicios >= self.max_reinicios:
+                raise TimeoutError(
+                    f"Job preso em '{status}' sem progresso por {parado:.0f}s após {job.reinicios} reinícios."
+                )
+            job.reinicios += 1
+            print(f"{job.prefixo} Job preso há {int(parado)}s; reiniciando export (#{job.reinicios})...")
+            # Reinicia contadores locais, mantém relógio global p/ timeout total
+            job.operation_url = self._inicia(job)
+            job.tentativas = 0
+            job.intervalo = self.intervalo_inicial
+            job.ultimo_status = None
+            job.ultimo_progresso = None
+            job.ultima_mudanca = time.monotonic()
+
+        job.proximo_poll = time.monotonic() + job.intervalo
+        return None
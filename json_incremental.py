@@ -0,0 +1,122 @@
+import io
+import json
+
+ESPACOS = " \t\n\r"
+CARACTERES_NUMERO = set("0123456789.eE+-")
+
+
+class _Leitor:
+    """Buffer de texto sobre um arquivo: lê em blocos e descarta o que já foi consumido."""
+    def __init__(self, arquivo, tamanho_bloco, object_hook):
+        if isinstance(arquivo, io.TextIOBase):
+            self._arquivo = arquivo
+        else:
+            self._arquivo = io.TextIOWrapper(arquivo, encoding="utf-8-sig")
+        self._tamanho_bloco = tamanho_bloco
+        self._decoder = json.JSONDecoder(object_hook=object_hook)
+        self._buffer = ""
+        self._pos = 0
+        self._fim = False
+
+    def _le_mais(self):
+        if self._fim:
+            return False
+        bloco = self._arquivo.read(self._tamanho_bloco)
+        if not bloco:
+            self._fim = True
+            return False
+        if self._pos > len(self._buffer) // 2:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        self._buffer += bloco
+        return True
+
+    def proximo(self):
+        """Pula espaços e devolve o próximo caractere sem consumir (None no fim do arquivo)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ESPACOS:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._le_mais():
+                return None
+
+    def consome(self, esperado):
+        caractere = self.proximo()
+        if caractere != esperado:
+            raise ValueError(f"JSON inválido: esperado '{esperado}', encontrado '{caractere}'")
+        self._pos += 1
+
+    def valor(self):
+        """Decodifica o próximo valor JSON completo (lendo mais blocos se ele estiver cortado)."""
+        if self.proximo() is None:
+            raise ValueError("JSON inválido: fim inesperado do arquivo")
+        while True:
+            try:
+                # scan_once é o que raw_decode chama, sem o invólucro Python por item
+                valor, fim = self._decoder.scan_once(self._buffer, self._pos)
+            except (json.JSONDecodeError, StopIteration):
+                if self._le_mais():
+                    continue
+                raise ValueError(f"JSON inválido na posição {self._pos} do bloco atual")
+            # número no fim do buffer pode estar cortado ("12" de "123", "2" de "2.5")
+            if (type(valor) in (int, float) and not self._fim
+                    and CARACTERES_NUMERO.issuperset(self._buffer[fim:fim + 32]) and self._le_mais()):
+                continue
+            self._pos = fim
+            return valor
+
+
+def _itens_lista(leitor):
+    leitor.consome("[")
+    if leitor.proximo() == "]":
+        leitor.consome("]")
+        return
+    while True:
+        yield leitor.valor()
+        if leitor.proximo() == ",":
+            leitor.consome(",")
+            continue
+        leitor.consome("]")
+        return
+
+
+def itens(arquivo, chave="items", tamanho_bloco=1024 * 1024, object_hook=None):
+    """
+    Gera, um a um, os elementos da lista `chave` de um JSON ({"items": [...], ...}) ou da lista
+    do topo ([...]), sem carregar o arquivo inteiro. `arquivo` pode ser binário (ex.: membro de ZIP)
+    ou texto. As demais chaves do objeto são lidas e descartadas.
+    """
+    leitor = _Leitor(arquivo, tamanho_bloco, object_hook)
+    inicio = leitor.proximo()
+    if inicio == "[":
+        yield from _itens_lista(leitor)
+        return
+
+    leitor.consome("{")
+    if leitor.proximo() == "}":
+        return
+    while True:
+        nome = leitor.valor()
+        leitor.consome(":")
+        if nome == chave and leitor.proximo() == "[":
+            yield from _itens_lista(leitor)
+            return
+        leitor.valor()  # outra chave (totalCount, nextLink, ...): descarta
+        if leitor.proximo() == ",":
+            leitor.consome(",")
+            continue
+        leitor.consome("}")
+        return
+
+
+def lotes(iteravel, tamanho):
+    """Agrupa um iterável em listas de até `tamanho` elementos."""
+    lote = []
+    for item in iteravel:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
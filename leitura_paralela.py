@@ -0,0 +1,68 @@
+import io
+import os
+import shutil
+import zipfile
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# modo automático (processos=0): só usa o pool se os membros somarem ao menos isso descompactado;
+# abaixo disso o custo de subir os processos é maior que o ganho
+LIMIAR_AUTOMATICO = 64 * 1024 * 1024
+MAX_AUTOMATICO = 4
+
+
+def _le(caminho, funcao, membro, argumentos):
+    """Executado no processo filho: abre o ZIP pelo caminho e lê um membro."""
+    with zipfile.ZipFile(caminho) as z:
+        return funcao(z, membro, *argumentos)
+
+
+def processos_efetivos(processos, infos):
+    """
+    Quantos processos usar para os membros `infos` (ZipInfo): `processos` > 0 é o máximo pedido;
+    0 escolhe sozinho (até MAX_AUTOMATICO, se o export for grande o bastante).
+    """
+    if processos == 0:
+        if sum(i.file_size for i in infos) < LIMIAR_AUTOMATICO:
+            return 1
+        processos = min(MAX_AUTOMATICO, os.cpu_count() or 1)
+    return max(1, min(processos, len(infos)))
+
+
+def le_membros(arquivo_zip, funcao, membros, processos=1, argumentos=(), prefixo=""):
+    """
+    Aplica funcao(z, membro, *argumentos) a cada membro do ZIP e devolve os resultados na ordem
+    de `membros`. Com mais de um processo, cada filho abre o ZIP pelo caminho (o arquivo baixado
+    é copiado para um temporário em disco se não tiver um) e devolve o seu lote já em colunas;
+    `funcao` precisa ser de nível de módulo. `arquivo_zip` é um caminho ou um arquivo aberto.
+    """
+    with zipfile.ZipFile(arquivo_zip) as z:
+        infos = [z.getinfo(m) for m in membros]
+        n = processos_efetivos(processos, infos)
+        if n <= 1:
+            return [funcao(z, membro, *argumentos) for membro in membros]
+
+    temporario = None
+    if isinstance(arquivo_zip, (str, os.PathLike)):
+        caminho = os.fspath(arquivo_zip)
+    elif isinstance(arquivo_zip, io.BufferedReader) and os.path.isfile(arquivo_zip.name):
+        # arquivo comum aberto para leitura (ex.: export do cache): os filhos abrem o mesmo caminho
+        caminho = arquivo_zip.name
+    else:
+        descritor, temporario = tempfile.mkstemp(suffix=".zip")
+        arquivo_zip.seek(0)
+        with os.fdopen(descritor, "wb") as destino:
+            shutil.copyfileobj(arquivo_zip, destino)
+        arquivo_zip.seek(0)
+        caminho = temporario
+
+    print(f"{prefixo} lendo {len(membros)} arquivos do ZIP em {n} processos")
+    try:
+        # spawn: o processo principal tem threads (etapas, log), e fork com threads pode travar
+        with ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return list(pool.map(_le, [caminho] * len(membros), [funcao] * len(membros),
+                                 membros, [tuple(argumentos)] * len(membros)))
+    finally:
+        if temporario:
+            os.remove(temporario)
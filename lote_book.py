@@ -0,0 +1,267 @@
+"""
+Modo lote: roda o book de vários clientes (tenants) em paralelo, um processo por cliente.
+
+Os perfis vêm de uma pasta com um arquivo .env por cliente (mesmas chaves do .env do book)
+ou de um manifesto .json (lista de objetos) / .csv (uma linha por cliente).
+Cada cliente grava Excel, logs e métricas em <saida>/<cliente>/; a pasta dos .zip ("pasta")
+é a do perfil (relativa ao manifesto) ou, se vazia, a própria pasta do cliente. O armazém e o
+cache de artefatos são um só para o lote todo (ver CAMINHOS_COMPARTILHADOS).
+
+Uso:
+    python lote_book.py clientes/ --processos 6 --por-regiao 2
+    python lote_book.py clientes.json --saida lote_2026-10 --limite-regiao api.xdr.trendmicro.com=4
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from urllib.parse import urlparse
+
+OBRIGATORIAS = ("cliente", "url_region", "token")
+# chaves de caminho compartilhadas por todos os clientes do lote (o armazém é particionado por cliente
+# e as chaves do cache incluem o tenant) -> padrão do main_book. Viram caminhos absolutos antes do
+# chdir para a pasta do cliente; vazio desliga, como no book
+CAMINHOS_COMPARTILHADOS = {"armazem": "armazem_book.db", "cache": "cache_api"}
+
+
+def le_perfis(origem):
+    """Lê os perfis de uma pasta de .env ou de um manifesto .json/.csv. Retorna lista de dicts."""
+    from dotenv import dotenv_values
+
+    if os.path.isdir(origem):
+        base = origem
+        perfis = []
+        for nome in sorted(os.listdir(origem)):
+            if nome.endswith(".env"):
+                perfil = dict(dotenv_values(os.path.join(origem, nome)))
+                perfil.setdefault("cliente", nome[:-len(".env")])
+                perfis.append(perfil)
+    else:
+        base = os.path.dirname(os.path.abspath(origem))
+        with open(origem, encoding="utf-8") as f:
+            if origem.lower().endswith(".csv"):
+                perfis = [dict(linha) for linha in csv.DictReader(f)]
+            else:
+                perfis = json.load(f)
+                if isinstance(perfis, dict):
+                    perfis = perfis.get("clientes") or []
+        # permite ${VARIAVEL} no manifesto (ex.: token vindo do cofre/ambiente)
+        perfis = [{k: os.path.expandvars(v) if isinstance(v, str) else v for k, v in p.items()} for p in perfis]
+
+    vistos = set()
+    for i, perfil in enumerate(perfis, 1):
+        faltando = [c for c in OBRIGATORIAS if not perfil.get(c)]
+        if faltando:
+            raise ValueError(f"Perfil #{i} ({perfil.get('cliente') or 'sem nome'}) sem: {', '.join(faltando)}")
+        if perfil["cliente"] in vistos:
+            raise ValueError(f"Cliente duplicado no lote: {perfil['cliente']}")
+        vistos.add(perfil["cliente"])
+        for chave in ("pasta", *CAMINHOS_COMPARTILHADOS):
+            if perfil.get(chave):
+                perfil[chave] = os.path.join(base, perfil[chave])
+    return perfis
+
+
+def compartilha_caminhos(perfil, env_livro=None):
+    """
+    Cópia do perfil com o armazém e o cache em caminhos absolutos: o do perfil, senão o do ambiente
+    ou do .env do book (`env_livro`), senão o padrão, relativos à pasta de onde o lote foi chamado.
+    """
+    env_livro = env_livro or {}
+    perfil = dict(perfil)
+    for chave, padrao in CAMINHOS_COMPARTILHADOS.items():
+        valor = perfil.get(chave)
+        if valor is None:
+            valor = os.getenv(chave, env_livro.get(chave, padrao))
+        perfil[chave] = os.path.abspath(valor) if valor else ""
+    return perfil
+
+
+def regiao(perfil):
+    """Chave da região (host da url_region) usada no limite de concorrência por região."""
+    return urlparse(perfil["url_region"]).netloc or perfil["url_region"]
+
+
+def _executa_cliente(perfil, pasta_cliente, retomar=False, atualizar_cache=False):
+    """Roda o book de um cliente. Executa em um processo novo (max_tasks_per_child=1)."""
+    inicio = time.perf_counter()
+    resultado = {"cliente": perfil["cliente"], "regiao": regiao(perfil), "pasta": pasta_cliente,
+                 "status": "erro", "arquivo": None, "falhas": {}, "log": None, "erro": None}
+
+    os.makedirs(pasta_cliente, exist_ok=True)
+    os.chdir(pasta_cliente)
+    # as opções do perfil (wb_fatias, verbosidade, ...) valem só para este processo;
+    # chaves ausentes caem no .env do book, que o main_book carrega sem sobrescrever estas
+    for chave, valor in perfil.items():
+        if valor not in (None, "") or chave in CAMINHOS_COMPARTILHADOS:
+            os.environ[chave] = str(valor)
+
+    from registro_log import RegistroAssincrono, le_verbosidade
+
+    # terminal silencioso: o lote só mostra o andamento por cliente; o log completo fica no arquivo
+    nulo = open(os.devnull, "w")
+    registro = RegistroAssincrono(
+        pasta="logs",
+        terminal=nulo,
+        verbosidade=le_verbosidade(perfil.get("verbosidade")),
+        max_arquivos=int(perfil.get("logs_max_arquivos") or 30),
+        max_mb=float(perfil.get("logs_max_mb") or 50),
+    )
+    resultado["log"] = os.path.abspath(registro.caminho)
+    sys.stdout = registro.stream
+    try:
+        from main_book import executa_book
+
+        falhas = {}
+        arquivo = executa_book(
+            perfil["cliente"], perfil["url_region"], perfil["token"], perfil.get("pasta") or "",
+            intervalo_polling=float(perfil.get("intervalo_polling") or 20),
+            arquivo_metricas=os.path.join("logs", f"run_metrics_{registro.carimbo}.json"),
+            falhas=falhas,
+            retomar=retomar,
+            atualizar_cache=atualizar_cache,
+        )
+        resultado.update(status="parcial" if falhas else "ok", arquivo=os.path.abspath(arquivo), falhas=falhas)
+    except Exception as e:
+        print(f"[ERRO] execução do cliente {perfil['cliente']} interrompida: {e.__class__.__name__}: {e}")
+        resultado["erro"] = f"{e.__class__.__name__}: {e}"
+    finally:
+        sys.stdout = sys.__stdout__
+        registro.fecha()
+        nulo.close()
+
+    resultado["duracao_s"] = round(time.perf_counter() - inicio, 1)
+    return resultado
+
+
+def executa_lote(perfis, pasta_saida="lote", processos=4, por_regiao=2, limites_regiao=None, retomar=False,
+                 atualizar_cache=False):
+    """
+    Distribui os clientes em um pool de processos respeitando o limite global (`processos`)
+    e o limite por região (`por_regiao`, ou `limites_regiao[host]` quando informado).
+    Com `retomar`, cada cliente restaura as abas já concluídas (checkpoints) e refaz só o que falhou;
+    com `atualizar_cache`, nenhum cliente reaproveita o cache de artefatos. Todos os clientes gravam
+    no mesmo armazém e no mesmo cache (compartilha_caminhos).
+    Retorna a lista de resultados por cliente, na ordem dos perfis.
+    """
+    from dotenv import dotenv_values, find_dotenv
+
+    limites_regiao = dict(limites_regiao or {})
+    pasta_saida = os.path.abspath(pasta_saida)
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    caminho_env = find_dotenv()
+    env_livro = dotenv_values(caminho_env) if caminho_env else {}
+    pendentes = [compartilha_caminhos(perfil, env_livro) for perfil in perfis]
+    if pendentes and pendentes[0]["armazem"]:
+        print(f"[lote] armazém compartilhado: {pendentes[0]['armazem']}")
+    resultados = {}
+    ativos = Counter()
+
+    def limite(chave):
+        return limites_regiao.get(chave, por_regiao)
+
+    def erro(perfil, mensagem):
+        return {"cliente": perfil["cliente"], "regiao": regiao(perfil), "status": "erro",
+                "falhas": {}, "erro": mensagem}
+
+    # processo novo por cliente: main_book lê o .env na importação e o cliente HTTP é compartilhado
+    with ProcessPoolExecutor(max_workers=processos, max_tasks_per_child=1) as pool:
+        em_execucao = {}
+        while pendentes or em_execucao:
+            for perfil in list(pendentes):
+                if len(em_execucao) >= processos:
+                    break
+                chave = regiao(perfil)
+                if ativos[chave] >= limite(chave):
+                    continue
+                pendentes.remove(perfil)
+                try:
+                    futuro = pool.submit(_executa_cliente, perfil, os.path.join(pasta_saida, perfil["cliente"]), retomar,
+                                         atualizar_cache)
+                except BrokenProcessPool as e:
+                    resultados[perfil["cliente"]] = erro(perfil, f"{e.__class__.__name__}: {e}")
+                    continue
+                ativos[chave] += 1
+                em_execucao[futuro] = perfil
+                print(f"[lote] iniciando {perfil['cliente']} ({chave}; {ativos[chave]}/{limite(chave)} na região)")
+
+            if not em_execucao:
+                # só sobra cliente de região com limite 0
+                for perfil in pendentes:
+                    resultados[perfil["cliente"]] = erro(perfil, "limite da região é 0")
+                break
+
+            prontas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in prontas:
+                perfil = em_execucao.pop(futuro)
+                ativos[regiao(perfil)] -= 1
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    # processo do cliente morreu (ex.: falta de memória)
+                    resultado = erro(perfil, f"{e.__class__.__name__}: {e}")
+                resultados[perfil["cliente"]] = resultado
+                print(f"[lote] {perfil['cliente']}: {resultado['status']}"
+                      + (f" em {resultado['duracao_s']}s" if resultado.get("duracao_s") is not None else "")
+                      + (f" - [ERRO] {resultado['erro']}" if resultado.get("erro") else ""))
+
+    return [resultados[p["cliente"]] for p in perfis]
+
+
+def imprime_relatorio(resultados):
+    contagem = Counter(r["status"] for r in resultados)
+    print("[lote] cliente | região | status | duração (s) | falhas")
+    for r in resultados:
+        falhas = "; ".join(f"{etapa}: {msg[:80]}" for etapa, msg in r["falhas"].items()) or r.get("erro") or "-"
+        print(f"[lote] {r['cliente']} | {r['regiao']} | {r['status']} | {r.get('duracao_s', '-')} | {falhas}")
+    print(f"[lote] total: {len(resultados)} | ok: {contagem['ok']} | parcial: {contagem['parcial']} | "
+          f"erro: {contagem['erro']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa o book de vários clientes em paralelo.")
+    parser.add_argument("perfis", help="pasta com um .env por cliente ou manifesto .json/.csv")
+    parser.add_argument("--saida", default="lote", help="pasta de saída (uma subpasta por cliente)")
+    parser.add_argument("--processos", type=int, default=4, help="máximo de clientes em paralelo")
+    parser.add_argument("--por-regiao", type=int, default=2, help="máximo de clientes em paralelo por região")
+    parser.add_argument("--limite-regiao", action="append", default=[], metavar="HOST=N",
+                        help="limite específico para uma região (pode repetir)")
+    parser.add_argument("--resume", action="store_true",
+                        help="retoma o lote: cada cliente refaz só as etapas que falharam")
+    parser.add_argument("--refresh", action="store_true",
+                        help="ignora o cache de artefatos: refaz exports e páginas dos workbenchs, não reaproveita .zip de relatórios")
+    args = parser.parse_args()
+
+    limites = {}
+    for item in args.limite_regiao:
+        host, _, n = item.rpartition("=")
+        if not host or not n.isdigit():
+            parser.error(f"--limite-regiao inválido: {item} (use HOST=N)")
+        limites[host] = int(n)
+
+    perfis = le_perfis(args.perfis)
+    print(f"[lote] {len(perfis)} clientes; até {args.processos} em paralelo, {args.por_regiao} por região")
+    inicio = time.perf_counter()
+    resultados = executa_lote(perfis, args.saida, args.processos, args.por_regiao, limites, args.resume, args.refresh)
+    imprime_relatorio(resultados)
+
+    relatorio = os.path.join(args.saida, f"relatorio_lote_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    with open(relatorio, "w", encoding="utf-8") as f:
+        json.dump({"duracao_total_s": round(time.perf_counter() - inicio, 1), "clientes": resultados},
+                  f, indent=2, ensure_ascii=False)
+    print(f"[lote] relatório consolidado gravado em {relatorio}")
+    return 0 if all(r["status"] == "ok" for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    # necessário quando o lote roda empacotado como .exe (spawn no Windows)
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,123 +1,419 @@
 from dotenv import load_dotenv
 import os
-import pandas as pd
 import sys
+import argparse
 from datetime import date, datetime, timedelta
 
-from coleta_EI import coleta_exportacao_trend
-from coletaZip_indices import coletaZip_indices
-from coletaZip_compliance import coletaZip_compliance
-from coletaWB import coletaWB
-from atualizaAba_excel import atualiza_aba
-from def_vulns import coleta_vulns
-from cria_excel_v1 import criar_planilha
-from Interface_grafica import LogViewer
+# Só módulos leves aqui: pandas, requests, openpyxl/xlsxwriter e tkinter são importados
+# dentro das etapas que os usam, para o executável abrir rápido (e rodar sem tela).
+from agendador import Etapa, executa_etapas
+import metricas
+from registro_log import RegistroAssincrono, le_verbosidade
 
 load_dotenv()
 cliente = os.getenv("cliente")
 pasta = (os.getenv("pasta") or "")
 url_region = os.getenv("url_region")
 token = os.getenv("token")
+# coleta de workbenchs em sub-janelas paralelas (1 = paginação sequencial do mês inteiro)
+wb_fatias = int(os.getenv("wb_fatias") or 1)
+wb_concorrencia = int(os.getenv("wb_concorrencia") or 4)
+# métricas (opcional): tracemalloc liga a medição de memória alocada pelo Python (mais lento);
+# perfil_etapas lista etapas (separadas por vírgula) para rodar com cProfile
+metricas_tracemalloc = (os.getenv("metricas_tracemalloc") or "").lower() in ("1", "true", "sim")
+perfil_etapas = [e.strip() for e in (os.getenv("perfil_etapas") or "").split(",") if e.strip()]
+# armazém SQLite com as abas de todos os meses (vazio desliga)
+armazem = os.getenv("armazem", "armazem_book.db")
+# pasta dos checkpoints por execução (retomada com --resume); vazio desliga e os .zip são apagados como antes
+pasta_execucoes = os.getenv("execucoes", "execucoes")
+# campos do endpoint inventory descartados na leitura (separados por vírgula; ausente ou vazio =
+# mantém todas as colunas, como o coleta_EI.COLUNAS_EXCLUIR padrão)
+ei_colunas_excluir = (None if os.getenv("ei_colunas_excluir") is None
+                      else [c.strip() for c in os.getenv("ei_colunas_excluir").split(",") if c.strip()])
+# vulnerabilidades: "normalizado" troca a aba de uma linha por CVE por três abas (dispositivos,
+# catálogo de CVEs e ligação dispositivo x CVE); "fluxo" escreve as linhas do ZIP direto no Excel,
+# com memória constante (sem DataFrame, checkpoint, armazém nem resumos da aba); padrão desnormalizado
+vulns_modo = (os.getenv("vulns_modo") or "").strip().lower()
+vulns_normalizado = vulns_modo == "normalizado"
+vulns_fluxo = vulns_modo == "fluxo"
+# abas de resumo (alertas por severidade, top CVEs, endpoints por versão, proporção de vulneráveis)
+# calculadas no fim do book completo; "nao" desliga
+gera_resumos = (os.getenv("resumos") or "sim").strip().lower() not in ("0", "false", "nao", "não")
+# processos para ler os vários arquivos dos exports (vulnerabilidades e endpoint inventory);
+# 0 = automático (só em exports grandes), 1 = sem processos extras
+leitura_processos = int(os.getenv("leitura_processos") or 0)
+# cache dos artefatos brutos (ZIPs dos exports, páginas dos workbenchs, .zip de relatórios) para
+# reexecuções próximas; vazio desliga. Validade em horas e tamanho máximo (MB, apaga os menos usados)
+pasta_cache = os.getenv("cache", "cache_api")
+cache_ttl_horas = float(os.getenv("cache_ttl_horas") or 6)
+cache_max_mb = float(os.getenv("cache_max_mb") or 2048)
 
-# registrador de logs ------------------------------------------------------
-
-
-class Tee:
-    def __init__(self, *streams):
-        self.streams = [s for s in streams if s is not None]
-
-    def write(self, data):
-        if data.strip():  # ignora quebras de linha extras
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            data = f"[{timestamp}] {data}"
-        for s in self.streams:
-            s.write(data)
-            s.flush()
-
-    def flush(self):
-        for s in self.streams:
-            try:
-                s.flush()
-            except Exception:
-                pass
-
-
-os.makedirs("logs", exist_ok=True)
-log = open(f"logs/log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log",
-           "w", encoding="utf-8")  # cria arquivo log com data atual
-sys.stdout = Tee(sys.stdout, log)
-
-# ===================== cria interface grafica
-
-# 1) cria a janela e inicia (não bloqueia)
-viewer = LogViewer()
-viewer.start()
-
-# 2) reencaminha a saída também para a GUI (envolve o Tee atual)
-# agora: terminal, arquivo e GUI
-sys.stdout = Tee(sys.stdout, log, viewer.stream)
-
-
-# ========================================== INICIO ==========================================--------------------------
-
-print(f"INICIO - execução para cliente {cliente}")
-
-# data que aparece na primeira coluna, para indicar a referencia dos dados - sempre dia 1 do mes anterior
-data_ref = (date.today().replace(day=1) - timedelta(days=1)
-            ).replace(day=1).strftime("%d/%m/%Y")
-print(f"[main] data de referencia do book: {data_ref}")
-
-# cria arquivo no excel para ser a base de dados do Vision One com o nome {cliente}_base_dados_{data_ref}.xlsx
-arquivo_excel = criar_planilha(cliente, data_ref)
-print(f"[main] nome do arquivo criado {arquivo_excel}")
-
-# Coleta dados do executive dashboard do .zip security configuration e popula o excel (aba Compliance SWP e Compliance SEP)
-result = coletaZip_compliance(pasta, "Compliance SWP")
-print(result) if not isinstance(result, pd.DataFrame) else atualiza_aba(
-    arquivo_excel=arquivo_excel,
-    aba="Compliance SWP",
-    dados=result,
-    colunas_adicionais=[("ano_mes_ref", data_ref)]
-)
-result = coletaZip_compliance(pasta, "Compliance SEP")
-print(result) if not isinstance(result, pd.DataFrame) else atualiza_aba(
-    arquivo_excel=arquivo_excel,
-    aba="Compliance SEP",
-    dados=result,
-    colunas_adicionais=[("ano_mes_ref", data_ref)]
-)
-
-# Coleta indices do executive dashboard nos .zip, popula o excel (aba Indices) e deleta os arquivos
-# --> precisa rodar depois que as abas de compliance foram preenchidas
-print(coletaZip_indices(pasta, arquivo_excel, cliente))
-
-# coletar dados de Workbenchs
-result = coletaWB(url_region, token)
-print(result) if not isinstance(result, pd.DataFrame) else atualiza_aba(
-    arquivo_excel=arquivo_excel,
-    aba="Alertas WB",
-    dados=result,
-    colunas_adicionais=[("ano_mes_ref", data_ref)]
-)
-
-# Coleta dados do Endpoint Inventory
-result = coleta_exportacao_trend(url_region, token)
-print(result) if not isinstance(result, pd.DataFrame) else atualiza_aba(
-    arquivo_excel=arquivo_excel,
-    aba="endpoint inventory",
-    dados=result,
-    colunas_adicionais=[("ano_mes_ref", data_ref)]
-)
-
-# coletar dados de vulnerabilidades
-# retorno precisa estar em dataframe, se for string é a mensagem de erro
-result = coleta_vulns(url_region, token)
-print(result) if not isinstance(result, pd.DataFrame) else atualiza_aba(
-    arquivo_excel=arquivo_excel,
-    aba="vulnerabilidades",
-    dados=result,
-    colunas_adicionais=[("ano_mes_ref", data_ref)]
-)
-
-
-print("[main] fim da execução! em caso de dúvidas consulte o arquivo de logs dessa execução")
+# etapas que usam a API (precisam de url_region e token) e as que leem os .zip de relatórios
+ETAPAS_API = ("vulnerabilidades", "endpoint inventory", "Alertas WB")
+ETAPAS_ZIP = ("Compliance SWP", "Compliance SEP", "Indices")
+
+
+def mes_referencia(texto=None):
+    """'2026-09' -> date(2026, 9, 1). Sem texto, o mês anterior ao atual."""
+    if texto:
+        return datetime.strptime(texto, "%Y-%m").date()
+    return (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+# ========================================== FLUXO ==========================================--------------------------
+
+
+def executa_book(cliente, url_region, token, pasta="", tempos=None, intervalo_polling=20,
+                 arquivo_metricas=None, falhas=None, referencia=None, somente=None, pasta_saida=None,
+                 sufixo="", retomar=False, normalizado=None, fluxo=None, atualizar_cache=False):
+    """
+    Executa o book completo. As etapas são declaradas como um pequeno DAG:
+    as exportações da API começam juntas no início e a espera delas se sobrepõe
+    à paginação dos workbenchs e à leitura dos .zip locais.
+    `tempos` (dict opcional) recebe a duração de cada etapa; `intervalo_polling`
+    é o intervalo inicial de consulta das exportações; `arquivo_metricas` é o JSON
+    com as métricas por etapa (run_metrics). `falhas` (dict opcional) recebe etapa -> mensagem
+    das etapas que não popularam a aba (usado pelo modo lote no relatório consolidado).
+    `referencia` (date) é o mês dos dados (padrão: mês anterior); `somente` limita às etapas
+    informadas (o Excel só tem as abas delas); o Excel vai para `pasta_saida` (padrão: pasta atual)
+    com `sufixo` no nome. Cada aba concluída vira um checkpoint em execucoes/; com `retomar`,
+    as etapas já concluídas neste mês são restauradas em vez de executadas. `normalizado` (padrão:
+    vulns_modo do .env) grava vulnerabilidades nas três abas normalizadas; `fluxo` (idem) escreve a aba
+    vulnerabilidades direto do ZIP para o arquivo, com memória constante. Exports, páginas de workbench
+    e .zip de relatórios ainda válidos no cache (.env `cache`) são reaproveitados; `atualizar_cache`
+    ignora o que está no cache e grava de novo. Retorna o caminho do Excel.
+    """
+    import pandas as pd
+    from atualizaAba_excel import atualiza_aba
+    from cria_excel_v1 import ABAS, criar_planilha
+
+    falhas = {} if falhas is None else falhas
+    execucao = metricas.inicia_execucao(usar_tracemalloc=metricas_tracemalloc, perfil_etapas=perfil_etapas)
+    print(f"INICIO - execução para cliente {cliente}")
+
+    # data que aparece na primeira coluna, para indicar a referencia dos dados - sempre dia 1 do mes
+    # (o mês anterior, se não for informado), calculada no início da execução
+    referencia = referencia or mes_referencia()
+    data_ref = referencia.strftime("01/%m/%Y")
+    print(f"[main] data de referencia do book: {data_ref}")
+
+    selecionadas = [aba for aba in ABAS if somente is None or aba in somente]
+
+    # etapa -> abas que ela preenche (só vulnerabilidades normalizada preenche mais de uma)
+    fluxo = (vulns_fluxo if fluxo is None else fluxo) and "vulnerabilidades" in selecionadas
+    normalizado = (vulns_normalizado if normalizado is None else normalizado) and not fluxo
+    abas_etapa = {}
+    if normalizado:
+        from def_vulns import ABAS_NORMALIZADAS
+        abas_etapa["vulnerabilidades"] = list(ABAS_NORMALIZADAS)
+
+    def abas_de(nome):
+        return abas_etapa.get(nome, [nome])
+    abas_livro = [aba for nome in selecionadas for aba in abas_de(nome)]
+
+    # cria o book em memória; o arquivo {cliente}_base_dados_{data_ref}.xlsx é gravado uma única vez no final
+    livro = criar_planilha(cliente, data_ref, pasta_saida=pasta_saida, abas=abas_livro, sufixo=sufixo,
+                           fluxo=fluxo)
+    print(f"[main] nome do arquivo criado {livro.arquivo}")
+
+    # checkpoints: restaura as abas concluídas numa execução anterior do mesmo mês (--resume)
+    checkpoints = None
+    restauradas = []
+    if pasta_execucoes:
+        from checkpoint import DiretorioExecucao
+        checkpoints = DiretorioExecucao(pasta_execucoes, cliente, referencia.strftime("%Y-%m"),
+                                        retomar=retomar, selecionadas=[*selecionadas, *abas_livro])
+        for nome in selecionadas:
+            if retomar and all(checkpoints.concluida(aba) for aba in abas_de(nome)):
+                for aba in abas_de(nome):
+                    dados = checkpoints.restaura(aba)
+                    livro.registra(aba, dados)
+                    print(f"[checkpoint] {aba}: {len(dados)} linhas restauradas; etapa não será executada")
+                restauradas.append(nome)
+    a_executar = [nome for nome in selecionadas if nome not in restauradas]
+    usa_api = any(nome in a_executar for nome in ETAPAS_API)
+    usa_zip = any(nome in a_executar for nome in ETAPAS_ZIP)
+
+    def grava(aba, result):
+        # várias abas (vulnerabilidades normalizada): dict aba -> DataFrame
+        if isinstance(result, dict):
+            for nome, dados in result.items():
+                grava(nome, dados)
+            return
+        # retorno precisa estar em dataframe, se for string é a mensagem de erro
+        if not isinstance(result, pd.DataFrame):
+            print(result)
+            falhas[aba] = str(result)
+            return
+        erro = atualiza_aba(
+            livro,
+            aba=aba,
+            dados=result,
+            colunas_adicionais=[("ano_mes_ref", data_ref)]
+        )
+        if erro:
+            print(erro)
+            falhas[aba] = erro
+
+    cache = None
+    if pasta_cache and (usa_api or usa_zip):
+        from cache_artefatos import CacheArtefatos
+        try:
+            cache = CacheArtefatos(pasta_cache, escopo=(cliente, url_region, token), ttl_horas=cache_ttl_horas,
+                                   max_mb=cache_max_mb, atualizar=atualizar_cache)
+        except OSError as e:
+            print(f"[AVISO] cache {pasta_cache} indisponível ({e}); seguindo sem cache")
+
+    catalogo = None
+    if usa_zip:
+        from catalogo_relatorios import CatalogoRelatorios
+        from checkpoint import pasta_mes
+        if checkpoints:
+            checkpoints.restaura_zips(pasta)
+        # os .zip de relatórios são listados e abertos uma vez e compartilhados pelas etapas que os leem;
+        # os que o modo serviço (watch) já tirou da pasta são lidos da pasta do mês em execucoes/
+        mes = referencia.strftime("%Y-%m")
+        catalogo = CatalogoRelatorios(pasta, cache=cache, referencia=mes, pasta_servico=os.path.join(
+            pasta_mes(pasta_execucoes or "execucoes", cliente, mes), "relatorios"))
+
+    exportacoes = None
+    if usa_api:
+        from cliente_http import obtem_cliente
+        from gerenciador_exportacoes import GerenciadorExportacoes
+        # um único laço de polling acompanha as duas exportações da API
+        exportacoes = GerenciadorExportacoes(obtem_cliente(url_region, token), intervalo_inicial=intervalo_polling)
+
+    # cada etapa importa o seu coletor só quando roda
+    def vulnerabilidades():
+        if fluxo:
+            from def_vulns import coleta_vulns_fluxo
+            resultado = coleta_vulns_fluxo(url_region, token, livro, colunas_adicionais=[("ano_mes_ref", data_ref)],
+                                           gerenciador=exportacoes, cache=cache)
+            if isinstance(resultado, str):
+                print(resultado)
+                falhas["vulnerabilidades"] = resultado
+            return
+        from def_vulns import coleta_vulns
+        grava("vulnerabilidades", coleta_vulns(url_region, token, gerenciador=exportacoes, normalizado=normalizado,
+                                               processos=leitura_processos, cache=cache))
+
+    def endpoint_inventory():
+        from coleta_EI import coleta_exportacao_trend
+        grava("endpoint inventory", coleta_exportacao_trend(url_region, token, gerenciador=exportacoes,
+                                                            colunas_excluir=ei_colunas_excluir,
+                                                            processos=leitura_processos, cache=cache))
+
+    def alertas_wb():
+        from coletaWB import coletaWB
+        grava("Alertas WB", coletaWB(url_region, token, fatias=wb_fatias, concorrencia=wb_concorrencia,
+                                     referencia=referencia, cache=cache))
+
+    def compliance(aba):
+        from coletaZip_compliance import coletaZip_compliance
+        grava(aba, coletaZip_compliance(pasta, aba, catalogo=catalogo))
+
+    def indices():
+        from coletaZip_indices import coletaZip_indices
+        resultado = coletaZip_indices(pasta, livro, cliente, data_ref=data_ref, catalogo=catalogo)
+        print(resultado)
+        if resultado is None:
+            falhas["Indices"] = "[ERRO] aba Indices não populada"
+
+    # As exportações são declaradas primeiro para serem disparadas logo no início
+    etapas = [
+        # coletar dados de vulnerabilidades
+        Etapa("vulnerabilidades", vulnerabilidades),
+        # Coleta dados do Endpoint Inventory
+        Etapa("endpoint inventory", endpoint_inventory),
+        # coletar dados de Workbenchs
+        Etapa("Alertas WB", alertas_wb),
+        # Coleta dados do executive dashboard do .zip security configuration (aba Compliance SWP e Compliance SEP)
+        Etapa("Compliance SWP", lambda: compliance("Compliance SWP")),
+        Etapa("Compliance SEP", lambda: compliance("Compliance SEP")),
+        # Coleta indices do executive dashboard nos .zip e popula o excel (aba Indices)
+        Etapa("Indices", indices),
+    ]
+    etapas = [etapa for etapa in etapas if etapa.nome in a_executar]
+
+    if checkpoints:
+        def com_checkpoint(etapa):
+            funcao = etapa.funcao
+
+            def executa():
+                funcao()
+                for aba in abas_de(etapa.nome):
+                    if etapa.nome not in falhas and aba not in falhas and livro.dados(aba) is not None:
+                        checkpoints.salva(aba, livro.dados(aba))
+            return Etapa(etapa.nome, executa, etapa.depende)
+        etapas = [com_checkpoint(etapa) for etapa in etapas]
+
+    # resumos só no book completo, a partir das abas em memória (coletadas ou restauradas do checkpoint)
+    if gera_resumos and somente is None:
+        from resumos import FONTES
+
+        def resumos():
+            from resumos import calcula_resumos
+            for aba, dados in calcula_resumos(livro).items():
+                grava(aba, dados)
+        etapas.append(Etapa("resumos", resumos, depende=[nome for nome in FONTES if nome in a_executar]))
+
+    if usa_zip and all(nome in selecionadas for nome in ETAPAS_ZIP):
+        # deleta os .zip uma única vez, depois de todas as etapas que leem o catálogo
+        # (numa coleta parcial os .zip ficam para as outras abas); com checkpoints eles vão
+        # para a pasta da execução e só são apagados quando ela termina sem falhas
+        limpeza = (lambda: catalogo.arquiva(checkpoints.pasta_zips)) if checkpoints else catalogo.apaga
+        etapas.append(Etapa("limpeza ZIPs", limpeza,
+                            depende=[nome for nome in ETAPAS_ZIP if nome in a_executar]))
+
+    for nome, resultado in executa_etapas(etapas).items():
+        if isinstance(resultado, Exception):
+            falhas[nome] = f"{resultado.__class__.__name__}: {resultado}"
+    if checkpoints:
+        for nome in a_executar:
+            for aba in abas_de(nome):
+                if nome in falhas or aba in falhas or not livro.registrada(aba):
+                    checkpoints.marca_falha(aba, falhas.get(aba) or falhas.get(nome, "aba sem dados"))
+    if catalogo:
+        catalogo.fecha()  # se a limpeza foi pulada, ao menos libera os .zip
+
+    try:
+        livro.salva()
+    except Exception:
+        if checkpoints:
+            checkpoints.finaliza(sucesso=False)
+        raise
+
+    # acrescenta as abas do mês ao armazém local (consultas entre meses sem abrir os .xlsx)
+    if armazem:
+        try:
+            from armazem import Armazem
+            with metricas.etapa("armazém"), Armazem(armazem) as banco:
+                banco.grava_livro(livro, cliente, data_ref)
+        except Exception as e:
+            print(f"[ERRO] Falha ao gravar o armazém {armazem}: {e}")
+            falhas["armazém"] = f"{e.__class__.__name__}: {e}"
+
+    # latência, chamadas e retentativas por endpoint da API
+    if usa_api:
+        print(obtem_cliente(url_region, token).resumo())
+    # acertos/faltas do cache de artefatos
+    if cache:
+        print(cache.resumo())
+
+    # tempo, linhas, bytes, chamadas HTTP e memória por etapa
+    print(execucao.resumo())
+    if arquivo_metricas:
+        execucao.grava_json(arquivo_metricas)
+    if tempos is not None:
+        tempos.update(execucao.duracoes())
+    if checkpoints:
+        checkpoints.finaliza(sucesso=not falhas)
+
+    print("[main] fim da execução! em caso de dúvidas consulte o arquivo de logs dessa execução")
+    return str(livro.caminho_arquivo)
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="BookV1",
+        description="Book mensal do Trend Micro Vision One. Sem subcomando, executa o book completo (run).")
+    comum = argparse.ArgumentParser(add_help=False)
+    comum.add_argument("--headless", action="store_true",
+                       help="sem a janela de logs (agendador/servidor sem tela)")
+    comum.add_argument("--reference-month", metavar="AAAA-MM",
+                       help="mês de referência dos dados (padrão: mês anterior)")
+    comum.add_argument("--out", metavar="PASTA", help="pasta onde o Excel é gravado (padrão: pasta atual)")
+    comum.add_argument("--resume", action="store_true",
+                       help="retoma a última execução do mês: restaura as abas concluídas e refaz só as que falharam")
+    comum.add_argument("--refresh", action="store_true",
+                       help="ignora o cache de artefatos: refaz exports e páginas dos workbenchs, não reaproveita .zip de relatórios (e atualiza o cache)")
+
+    sub = parser.add_subparsers(dest="comando")
+    sub.add_parser("run", parents=[comum], help="book completo (API + relatórios .zip)")
+    coleta = sub.add_parser("collect-only", parents=[comum], help="só uma etapa; Excel com apenas a aba dela")
+    coleta.add_argument("etapa", choices=[*ETAPAS_API, *ETAPAS_ZIP])
+    sub.add_parser("zip-only", parents=[comum], help="só as abas dos relatórios .zip (não usa a API)")
+    servico = sub.add_parser("watch", parents=[comum],
+                             help="serviço: atualiza as abas dos relatórios .zip do mês assim que cada .zip chega na pasta")
+    servico.add_argument("--intervalo", type=float, default=1.0, metavar="SEG",
+                         help="intervalo entre as varreduras da pasta (padrão 1s)")
+    servico.add_argument("--estabilidade", type=float, default=2.0, metavar="SEG",
+                         help="tempo sem mudar de tamanho para o .zip ser considerado completo (padrão 2s)")
+
+    # sem subcomando (duplo clique no .exe) = run
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv = ["run", *argv]
+    args = parser.parse_args(argv)
+    if args.reference_month:
+        try:
+            args.referencia = mes_referencia(args.reference_month)
+        except ValueError:
+            parser.error(f"--reference-month inválido: {args.reference_month} (use AAAA-MM)")
+    else:
+        args.referencia = None
+    return args
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    if args.comando == "collect-only":
+        somente, sufixo = [args.etapa], "_" + args.etapa.replace(" ", "_")
+    elif args.comando == "zip-only":
+        somente, sufixo = list(ETAPAS_ZIP), "_zip"
+    else:
+        somente, sufixo = None, ""
+
+    # ===================== registrador de logs (fila + thread escritora)
+    registro = RegistroAssincrono(
+        pasta="logs",
+        verbosidade=le_verbosidade(os.getenv("verbosidade")),
+        max_arquivos=int(os.getenv("logs_max_arquivos") or 30),
+        max_mb=float(os.getenv("logs_max_mb") or 50),
+    )
+    sys.stdout = registro.stream
+
+    # ===================== cria interface grafica
+    sem_tela = sys.platform.startswith("linux") and not os.getenv("DISPLAY") and not os.getenv("WAYLAND_DISPLAY")
+    if not args.headless and sem_tela:
+        print("[AVISO] nenhuma tela disponível; executando sem a janela de logs (--headless)")
+    if not args.headless and not sem_tela:
+        try:
+            from Interface_grafica import LogViewer
+
+            # 1) cria a janela e inicia (não bloqueia)
+            viewer = LogViewer()
+            viewer.start()
+
+            # 2) a saída vai para terminal, arquivo e GUI
+            registro.adiciona_destino(viewer.stream)
+
+            # 3) painel de progresso por etapa, alimentado pelos eventos estruturados das métricas
+            metricas.assina(viewer.evento)
+        except Exception as e:
+            print(f"[AVISO] janela de logs indisponível ({e.__class__.__name__}: {e}); seguindo sem interface")
+
+    try:
+        if args.comando == "watch":
+            if not cliente:
+                print("[ERRO] defina `cliente` no .env para o modo serviço (nome do Excel e da pasta do mês)")
+                return
+            from servico_relatorios import ServicoRelatorios
+            ServicoRelatorios(pasta, cliente, pasta_saida=args.out, referencia=args.referencia,
+                              base=pasta_execucoes or "execucoes", armazem=armazem,
+                              intervalo=args.intervalo, estabilidade=args.estabilidade).executa()
+            return
+        executa_book(cliente, url_region, token, pasta,
+                     arquivo_metricas=os.path.join("logs", f"run_metrics_{registro.carimbo}.json"),
+                     referencia=args.referencia, somente=somente, pasta_saida=args.out, sufixo=sufixo,
+                     retomar=args.resume, atualizar_cache=args.refresh)
+    finally:
+        sys.stdout = sys.__stdout__
+        registro.fecha()
+
+
+if __name__ == "__main__":
+    # necessário para a leitura em processos quando o book roda empacotado como .exe
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import cProfile
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# etapa (span) ativa no contexto atual; propagada para threads via contextvars.copy_context()
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+
+CONTADORES = ("linhas", "bytes_baixados", "chamadas_http", "retentativas_http")
+
+# funções chamadas com (etapa, **campos) a cada evento estruturado (ex.: painel de progresso da GUI)
+_assinantes = []
+
+
+def _rss_mb():
+    """Memória residente atual do processo em MB (None se não houver como medir)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Span:
+    """Medição de uma etapa (ou fase dentro de uma etapa)."""
+    def __init__(self, nome, pai=None):
+        self.nome = nome
+        self.pai = pai
+        self.inicio = time.time()
+        self._inicio_perf = time.perf_counter()
+        self.duracao = None
+        self.erro = None
+        self.contadores = dict.fromkeys(CONTADORES, 0)
+        self.pico_rss_mb = None
+        self.pico_tracemalloc_mb = None
+        self._trava = threading.Lock()
+
+    def raiz(self):
+        span = self
+        while span.pai is not None:
+            span = span.pai
+        return span
+
+    def soma(self, **contadores):
+        """Acumula contadores neste span e nos spans pais."""
+        span = self
+        while span is not None:
+            with span._trava:
+                for chave, valor in contadores.items():
+                    span.contadores[chave] = span.contadores.get(chave, 0) + (valor or 0)
+            raiz = span
+            span = span.pai
+        if _assinantes:
+            _notifica(raiz.nome, linhas=raiz.contadores["linhas"], bytes_baixados=raiz.contadores["bytes_baixados"])
+
+    def _amostra(self, rss, traced):
+        if rss is not None and (self.pico_rss_mb is None or rss > self.pico_rss_mb):
+            self.pico_rss_mb = rss
+        if traced is not None and (self.pico_tracemalloc_mb is None or traced > self.pico_tracemalloc_mb):
+            self.pico_tracemalloc_mb = traced
+
+    def como_dict(self):
+        return {
+            "etapa": self.nome,
+            "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+            "duracao_s": round(self.duracao, 3) if self.duracao is not None else None,
+            **self.contadores,
+            "pico_rss_mb": round(self.pico_rss_mb, 1) if self.pico_rss_mb is not None else None,
+            "pico_tracemalloc_mb": (round(self.pico_tracemalloc_mb, 1)
+                                    if self.pico_tracemalloc_mb is not None else None),
+            "erro": self.erro,
+        }
+
+
+class Metricas:
+    """
+    Coletor de métricas de uma execução: duração, linhas, bytes baixados, chamadas HTTP
+    e picos de memória por etapa. Os picos são do processo inteiro enquanto a etapa estava ativa
+    (etapas paralelas compartilham o mesmo pico). Com `perfil_etapas`, roda cProfile nessas
+    etapas e grava um .prof por etapa em `pasta_perfil`.
+    """
+    def __init__(self, intervalo_amostra=0.25, usar_tracemalloc=False, perfil_etapas=(), pasta_perfil="logs"):
+        self.intervalo_amostra = intervalo_amostra
+        self.usar_tracemalloc = usar_tracemalloc
+        self.perfil_etapas = set(perfil_etapas)
+        self.pasta_perfil = pasta_perfil
+        self.inicio = time.time()
+        self.spans = []
+        self._ativos = set()
+        self._trava = threading.Lock()
+        self._amostrador = None
+
+        if usar_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # ---------- API pública ----------
+    @contextmanager
+    def etapa(self, nome):
+        """Abre um span; dentro de outro span vira uma fase ('pai/nome')."""
+        pai = _span_atual.get()
+        span = Span(f"{pai.nome}/{nome}" if pai else nome, pai)
+        token = _span_atual.set(span)
+        with self._trava:
+            self.spans.append(span)
+            self._ativos.add(span)
+            self._inicia_amostrador()
+        span._amostra(*self._mede())
+        if pai is None:
+            _notifica(span.nome, status="executando")
+        else:
+            _notifica(span.raiz().nome, fase=nome)
+
+        perfil = None
+        if span.nome in self.perfil_etapas:
+            perfil = cProfile.Profile()
+            perfil.enable()
+        try:
+            yield span
+        except BaseException as e:
+            span.erro = f"{e.__class__.__name__}: {e}"
+            raise
+        finally:
+            if perfil:
+                perfil.disable()
+                os.makedirs(self.pasta_perfil, exist_ok=True)
+                destino = os.path.join(self.pasta_perfil, f"perfil_{span.nome.replace('/', '_')}.prof")
+                perfil.dump_stats(destino)
+                print(f"[metricas] perfil da etapa '{span.nome}' gravado em {destino}")
+            span.duracao = time.perf_counter() - span._inicio_perf
+            span._amostra(*self._mede())
+            if pai is None:
+                _notifica(span.nome, status="erro" if span.erro else "concluída", fase="",
+                          duracao=span.duracao)
+            with self._trava:
+                self._ativos.discard(span)
+            _span_atual.reset(token)
+
+    def como_dict(self):
+        with self._trava:
+            spans = list(self.spans)
+        return {
+            "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+            "duracao_total_s": round(time.time() - self.inicio, 3),
+            "etapas": [s.como_dict() for s in spans],
+        }
+
+    def duracoes(self):
+        """Duração por etapa (só etapas de primeiro nível)."""
+        with self._trava:
+            return {s.nome: s.duracao for s in self.spans if s.pai is None and s.duracao is not None}
+
+    def grava_json(self, caminho):
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.como_dict(), f, indent=2, ensure_ascii=False)
+        print(f"[metricas] métricas da execução gravadas em {caminho}")
+
+    def resumo(self):
+        """Tabela de texto com uma linha por etapa/fase."""
+        linhas = ["[metricas] etapa | duração (s) | linhas | MB baixados | HTTP | retentativas | pico RSS (MB)"]
+        for s in self.como_dict()["etapas"]:
+            duracao = f"{s['duracao_s']:.2f}" if s["duracao_s"] is not None else "-"
+            linhas.append(
+                f"[metricas] {s['etapa']} | {duracao} | {s['linhas']} | "
+                f"{s['bytes_baixados'] / (1024 * 1024):.2f} | {s['chamadas_http']} | "
+                f"{s['retentativas_http']} | {s['pico_rss_mb'] if s['pico_rss_mb'] is not None else '-'}"
+                + (f" | [ERRO] {s['erro']}" if s["erro"] else "")
+            )
+        return "\n".join(linhas)
+
+    # ---------- Internos ----------
+    def _mede(self):
+        traced = None
+        if self.usar_tracemalloc and tracemalloc.is_tracing():
+            traced = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+        return _rss_mb(), traced
+
+    def _inicia_amostrador(self):
+        # chamado com self._trava adquirida
+        if self._amostrador is None or not self._amostrador.is_alive():
+            self._amostrador = threading.Thread(target=self._amostra, name="metricas", daemon=True)
+            self._amostrador.start()
+
+    def _amostra(self):
+        while True:
+            time.sleep(self.intervalo_amostra)
+            with self._trava:
+                ativos = list(self._ativos)
+                if not ativos:
+                    self._amostrador = None
+                    return
+            medidas = self._mede()
+            for span in ativos:
+                span._amostra(*medidas)
+
+
+_execucao = Metricas()
+
+
+def inicia_execucao(**opcoes):
+    """Cria o coletor de métricas de uma nova execução e o torna o atual."""
+    global _execucao
+    _execucao = Metricas(**opcoes)
+    return _execucao
+
+
+def execucao_atual():
+    return _execucao
+
+
+def etapa(nome):
+    """Context manager: mede uma etapa (ou fase, se já houver uma etapa ativa) na execução atual."""
+    return _execucao.etapa(nome)
+
+
+def etapa_atual():
+    """Nome da etapa de primeiro nível ativa no contexto atual (None fora de etapas)."""
+    span = _span_atual.get()
+    return span.raiz().nome if span is not None else None
+
+
+def registra(**contadores):
+    """Soma contadores (linhas, bytes_baixados, chamadas_http, ...) à etapa ativa, se houver."""
+    span = _span_atual.get()
+    if span is not None:
+        span.soma(**contadores)
+
+
+def assina(funcao):
+    """Registra funcao(etapa, **campos) para receber os eventos de progresso das etapas."""
+    _assinantes.append(funcao)
+
+
+def publica(**campos):
+    """Publica um evento (status, percentual, ...) para a etapa ativa, se houver."""
+    span = _span_atual.get()
+    if span is not None:
+        _notifica(span.raiz().nome, **campos)
+
+
+def _notifica(etapa, **campos):
+    for funcao in list(_assinantes):
+        try:
+            funcao(etapa, **campos)
+        except Exception:
+            pass
+
+
+def submete(pool, funcao, *args, **kwargs):
+    """pool.submit que leva junto a etapa ativa para a thread do pool."""
+    return pool.submit(contextvars.copy_context().run, funcao, *args, **kwargs)
@@ -0,0 +1,183 @@
+import os
+import sys
+import glob
+import time
+import queue
+import threading
+from datetime import datetime
+
+import metricas
+
+# níveis de verbosidade por etapa (terminal e GUI; o arquivo de log sempre recebe tudo)
+NIVEIS = ("normal", "erros")
+MARCAS_ERRO = ("[ERRO]", "ERRO ", "[AVISO]", "[REGRESSÃO]")
+
+
+def le_verbosidade(texto):
+    """
+    Converte 'vulnerabilidades:erros,Alertas WB:erros' em {'vulnerabilidades': 'erros', ...}.
+    Níveis: normal (tudo) ou erros (só linhas de erro/aviso).
+    """
+    config = {}
+    for par in (texto or "").split(","):
+        if ":" not in par:
+            continue
+        etapa, nivel = (p.strip() for p in par.rsplit(":", 1))
+        if nivel not in NIVEIS:
+            raise ValueError(f"Nível de verbosidade '{nivel}' inválido para '{etapa}'. Use: {', '.join(NIVEIS)}.")
+        config[etapa] = nivel
+    return config
+
+
+class _Produtor:
+    """Objeto tipo arquivo para sys.stdout: só enfileira o texto, sem formatar nem escrever."""
+    def __init__(self, registro):
+        self._registro = registro
+
+    def write(self, data):
+        if data:
+            self._registro._fila.put((time.time(), threading.get_ident(), metricas.etapa_atual(), data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class RegistroAssincrono:
+    """
+    Pipeline de log em fila: os produtores (print de qualquer thread) só enfileiram o texto
+    e uma thread escritora monta as linhas, põe o timestamp uma única vez por linha e entrega
+    em lote para o arquivo, o terminal e os demais destinos (ex.: LogViewer.stream).
+    Mantém no máximo `max_arquivos` logs na pasta e abre um novo arquivo a cada `max_mb` MB.
+    """
+    def __init__(self, pasta="logs", terminal=None, verbosidade=None, max_arquivos=30, max_mb=50,
+                 intervalo=0.2):
+        self.pasta = pasta
+        self.verbosidade = dict(verbosidade or {})
+        self.max_arquivos = max_arquivos
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.intervalo = intervalo
+        self.carimbo = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+        os.makedirs(pasta, exist_ok=True)
+        self._rotaciona()
+        self._parte = 0
+        self.caminho = os.path.join(pasta, f"log_{self.carimbo}.log")
+        self._arquivo = open(self.caminho, "w", encoding="utf-8")  # cria arquivo log com data atual
+
+        self._terminal = terminal if terminal is not None else sys.__stdout__
+        self._destinos = []
+        self._fila = queue.SimpleQueue()
+        self._parciais = {}
+        self._segundo = None
+        self._prefixo = ""
+        self.stream = _Produtor(self)
+
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._escritor, name="registro_log", daemon=True)
+        self._thread.start()
+
+    # ---------- API pública ----------
+    def adiciona_destino(self, stream):
+        """Acrescenta um destino com write() (recebe linhas completas, já com timestamp)."""
+        self._destinos.append(stream)
+
+    def fecha(self):
+        """Esvazia a fila, grava o que estiver pendente e fecha o arquivo."""
+        self._parar.set()
+        self._thread.join()
+        self._arquivo.close()
+
+    # ---------- Internos ----------
+    def _rotaciona(self):
+        """Apaga os logs mais antigos, deixando espaço para o desta execução."""
+        antigos = sorted(glob.glob(os.path.join(self.pasta, "log_*.log")), key=os.path.getmtime)
+        excedentes = len(antigos) - (self.max_arquivos - 1)
+        for caminho in antigos[:max(excedentes, 0)]:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    def _carimbo(self, instante):
+        # formata o timestamp uma vez por segundo, não por linha
+        segundo = int(instante)
+        if segundo != self._segundo:
+            self._segundo = segundo
+            self._prefixo = datetime.fromtimestamp(segundo).strftime("[%Y-%m-%d %H:%M:%S] ")
+        return self._prefixo
+
+    def _monta_linhas(self, registros):
+        """Junta os pedaços por thread e devolve [(etapa, linha_com_timestamp)] das linhas fechadas."""
+        linhas = []
+        for instante, thread, etapa, texto in registros:
+            partes = self._parciais.setdefault(thread, [])
+            if "\n" not in texto:
+                partes.append(texto)
+                continue
+            pedacos = texto.split("\n")
+            partes.append(pedacos[0])
+            pedacos[0] = "".join(partes)
+            ultimo = pedacos.pop()
+            self._parciais[thread] = [ultimo] if ultimo else []
+            for linha in pedacos:
+                if linha.strip():  # ignora quebras de linha extras
+                    linhas.append((etapa, self._carimbo(instante) + linha))
+        return linhas
+
+    def _visivel(self, etapa, linha):
+        if self.verbosidade.get(etapa, "normal") == "normal":
+            return True
+        return any(marca in linha for marca in MARCAS_ERRO)
+
+    def _entrega(self, linhas):
+        texto_arquivo = "\n".join(linha for _, linha in linhas) + "\n"
+        visiveis = [linha for etapa, linha in linhas if self._visivel(etapa, linha)]
+        texto_tela = "\n".join(visiveis) + "\n" if visiveis else ""
+
+        self._arquivo.write(texto_arquivo)
+        self._arquivo.flush()
+        # tamanho em bytes já gravados (acentos em UTF-8 e \r\n do Windows contam)
+        if self._arquivo.tell() > self.max_bytes:
+            self._arquivo.close()
+            self._parte += 1
+            self.caminho = os.path.join(self.pasta, f"log_{self.carimbo}.{self._parte}.log")
+            self._arquivo = open(self.caminho, "w", encoding="utf-8")
+
+        if texto_tela:
+            for destino in [self._terminal, *self._destinos]:
+                try:
+                    destino.write(texto_tela)
+                    destino.flush()
+                except Exception:
+                    pass
+
+    def _escritor(self):
+        while True:
+            try:
+                registros = [self._fila.get(timeout=self.intervalo)]
+            except queue.Empty:
+                registros = []
+            # drena o que já estiver na fila para escrever em lote
+            try:
+                while len(registros) < 10_000:
+                    registros.append(self._fila.get_nowait())
+            except queue.Empty:
+                pass
+
+            linhas = self._monta_linhas(registros)
+            encerrando = self._parar.is_set() and self._fila.empty()
+            if encerrando:
+                # linhas que ficaram sem quebra no final
+                for partes in self._parciais.values():
+                    resto = "".join(partes)
+                    if resto.strip():
+                        linhas.append((None, self._carimbo(time.time()) + resto))
+                self._parciais.clear()
+            if linhas:
+                self._entrega(linhas)
+            if encerrando:
+                return
@@ -0,0 +1,142 @@
+import pandas as pd
+
+# abas de resumo, gravadas depois das abas brutas
+ABAS_RESUMO = ("Resumo alertas", "Resumo top CVEs", "Resumo endpoints", "Resumo vulneráveis")
+
+# abas brutas usadas nos resumos (etapas das quais a etapa de resumos depende)
+FONTES = ("Alertas WB", "endpoint inventory", "vulnerabilidades")
+
+# quantas CVEs entram no ranking por dispositivos afetados
+TOP_CVES = 50
+
+# colunas de severidade na ordem de leitura (as demais vêm depois, em ordem alfabética)
+ORDEM_SEVERIDADE = ["critical", "high", "medium", "low", "info"]
+
+# campos da CVE levados para o ranking (só os que existirem)
+CAMPOS_CVE = ["cvssScore", "riskLevel", "publishedDateTime"]
+
+# agrupamento do inventário: SO e versão do agente
+CHAVES_ENDPOINTS = ["osName", "eppAgent.componentVersion"]
+
+
+def _coluna(df, nome):
+    """Primeira coluna `nome` do DataFrame como Series (None se não existir); suporta colunas repetidas."""
+    posicoes = [i for i, c in enumerate(df.columns) if c == nome]
+    return df.iloc[:, posicoes[0]] if posicoes else None
+
+
+def alertas_por_severidade(alertas):
+    """Alertas por modelo (linhas) x severidade (colunas), com total, do maior para o menor."""
+    modelo, severidade = _coluna(alertas, "model"), _coluna(alertas, "severity")
+    if modelo is None or severidade is None:
+        return None
+    tabela = (pd.DataFrame({"model": modelo.astype(object), "severity": severidade.astype(object)})
+              .groupby(["model", "severity"]).size().unstack("severity", fill_value=0))
+    colunas = ([s for s in ORDEM_SEVERIDADE if s in tabela.columns]
+               + sorted(c for c in tabela.columns if c not in ORDEM_SEVERIDADE))
+    tabela = tabela[colunas]
+    tabela["total"] = tabela.sum(axis=1)
+    tabela = tabela.sort_values("total", ascending=False, kind="stable").reset_index()
+    tabela.columns.name = None
+    return tabela
+
+
+def endpoints_por_versao(inventario):
+    """Quantidade de endpoints por SO e versão do agente."""
+    chaves = [c for c in CHAVES_ENDPOINTS if _coluna(inventario, c) is not None]
+    if not chaves:
+        return None
+    base = pd.DataFrame({c: _coluna(inventario, c).astype(object) for c in chaves})
+    return (base.groupby(chaves, dropna=False).size().reset_index(name="endpoints")
+            .sort_values(["endpoints", *chaves], ascending=[False, *[True] * len(chaves)], kind="stable")
+            .reset_index(drop=True))
+
+
+def pares_vulns(vulns=None, ligacao=None, catalogo=None, dispositivos=None):
+    """
+    Pares (deviceId, cveId), campos por CVE e SO por dispositivo, da aba vulnerabilidades
+    (uma linha por CVE, com duas colunas "id") ou das abas normalizadas.
+    Retorna (pares, cves, so); cada um pode ser None.
+    """
+    if ligacao is not None:
+        pares = ligacao[["deviceId", "cveId"]]
+        cves = None
+        if catalogo is not None:
+            cves = catalogo[["id", *[c for c in CAMPOS_CVE if c in catalogo.columns]]].rename(columns={"id": "cveId"})
+        so = None
+        if dispositivos is not None and {"id", "osName"} <= set(dispositivos.columns):
+            so = dispositivos[["id", "osName"]].rename(columns={"id": "deviceId"})
+    elif vulns is not None:
+        ids = [i for i, c in enumerate(vulns.columns) if c == "id"]
+        if len(ids) < 2:
+            return None, None, None
+        pares = pd.DataFrame({"deviceId": vulns.iloc[:, ids[0]].to_numpy(),
+                              "cveId": vulns.iloc[:, ids[1]].to_numpy()})
+        # campos da CVE são os que vêm depois do segundo "id"
+        da_cve = vulns.iloc[:, ids[1] + 1:]
+        cves = pd.concat([pares[["cveId"]], *[_coluna(da_cve, c).reset_index(drop=True)
+                                              for c in CAMPOS_CVE if c in da_cve.columns]], axis=1)
+        so = None
+        if _coluna(vulns.iloc[:, :ids[1]], "osName") is not None:
+            so = pd.DataFrame({"deviceId": pares["deviceId"],
+                               "osName": _coluna(vulns.iloc[:, :ids[1]], "osName").to_numpy()})
+    else:
+        return None, None, None
+
+    pares = pares.dropna(subset=["cveId"]).drop_duplicates()
+    if cves is not None:
+        cves = cves.dropna(subset=["cveId"]).drop_duplicates(subset="cveId")
+    if so is not None:
+        so = so.drop_duplicates(subset="deviceId")
+    return pares, cves, so
+
+
+def top_cves(pares, cves=None, n=TOP_CVES):
+    """As `n` CVEs com mais dispositivos afetados, com os campos da CVE."""
+    if pares is None or pares.empty:
+        return None
+    contagem = (pares.assign(cveId=pares["cveId"].astype(object))
+                .groupby("cveId").size().reset_index(name="dispositivos_afetados")
+                .sort_values(["dispositivos_afetados", "cveId"], ascending=[False, True], kind="stable")
+                .head(n))
+    if cves is not None:
+        contagem = contagem.merge(cves.assign(cveId=cves["cveId"].astype(object)), on="cveId", how="left")
+    return contagem.reset_index(drop=True)
+
+
+def proporcao_vulneraveis(inventario=None, pares=None, so=None):
+    """
+    Por SO: endpoints do inventário, dispositivos com ao menos uma CVE e a proporção entre eles,
+    com uma linha Total no final.
+    """
+    colunas = {}
+    if inventario is not None and _coluna(inventario, "osName") is not None:
+        colunas["endpoints"] = _coluna(inventario, "osName").astype(object).value_counts(dropna=False)
+    if pares is not None and so is not None:
+        vulneraveis = so[so["deviceId"].isin(pares["deviceId"])]
+        colunas["dispositivos_vulneraveis"] = vulneraveis["osName"].astype(object).value_counts(dropna=False)
+    if not colunas:
+        return None
+
+    tabela = pd.DataFrame(colunas).fillna(0).astype("int64")
+    tabela.index.name = "osName"
+    tabela = tabela.sort_values(list(colunas), ascending=False, kind="stable")
+    tabela.loc["Total"] = tabela.sum()
+    if {"endpoints", "dispositivos_vulneraveis"} <= set(tabela.columns):
+        tabela["proporcao_vulneraveis"] = (tabela["dispositivos_vulneraveis"]
+                                           / tabela["endpoints"].where(tabela["endpoints"] > 0)).round(4)
+    return tabela.reset_index()
+
+
+def calcula_resumos(livro, n_cves=TOP_CVES):
+    """Resumos que dão para calcular com as abas do LivroExcel. Retorna um dict aba -> DataFrame."""
+    alertas, inventario = livro.dados("Alertas WB"), livro.dados("endpoint inventory")
+    pares, cves, so = pares_vulns(livro.dados("vulnerabilidades"), livro.dados("vulns dispositivo x CVE"),
+                                  livro.dados("vulns CVEs"), livro.dados("vulns dispositivos"))
+    resumos = {
+        "Resumo alertas": alertas_por_severidade(alertas) if alertas is not None else None,
+        "Resumo top CVEs": top_cves(pares, cves, n_cves),
+        "Resumo endpoints": endpoints_por_versao(inventario) if inventario is not None else None,
+        "Resumo vulneráveis": proporcao_vulneraveis(inventario, pares, so),
+    }
+    return {aba: df for aba, df in resumos.items() if df is not None and not df.empty}
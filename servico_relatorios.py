@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import fnmatch
+import hashlib
+import zipfile
+import shutil
+from datetime import date, datetime, timedelta
+
+try:
+    import msvcrt
+except ImportError:  # fora do Windows não há como saber se outro processo ainda escreve no arquivo
+    msvcrt = None
+
+import metricas
+from catalogo_relatorios import PADROES_ZIP, CatalogoRelatorios
+from checkpoint import DiretorioExecucao, grava_json
+
+# abas refeitas quando chega o .zip de cada tipo de relatório (Indices usa os quatro)
+ABAS_POR_TIPO = {
+    "security": ["Compliance SWP", "Compliance SEP", "Indices"],
+    "risk": ["Indices"],
+    "exposure": ["Indices"],
+    "attack": ["Indices"],
+}
+ABAS_RELATORIOS = ["Compliance SWP", "Compliance SEP", "Indices"]
+
+
+def _sha256(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        while bloco := f.read(1024 * 1024):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def tipo_relatorio(nome, padroes=PADROES_ZIP):
+    """Tipo do relatório (security, risk...) pelo nome do .zip; None se não for um relatório do book."""
+    return next((tipo for tipo, padrao in padroes.items() if fnmatch.fnmatch(nome, padrao)), None)
+
+
+def _em_uso(caminho):
+    """
+    No Windows, True se outro processo mantém o arquivo aberto sem compartilhar a escrita ou com
+    trava no início dele (abrir para escrita ou travar o 1º byte falha). Fora do Windows, sempre False.
+    """
+    if msvcrt is None:
+        return False
+    try:
+        with open(caminho, "r+b") as f:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    except OSError:
+        return True
+    return False
+
+
+def arquivo_completo(caminho):
+    """
+    True se o .zip parece terminado: no Windows, nenhum processo o mantém aberto em uso exclusivo
+    (_em_uso), e o diretório central do ZIP já está no fim. Não detecta quem ainda escreve
+    compartilhando o arquivo (e nada disso no Linux): por isso o serviço só chama depois da
+    janela de estabilidade de tamanho e data.
+    """
+    if _em_uso(caminho):
+        return False
+    return zipfile.is_zipfile(caminho)
+
+
+class ServicoRelatorios:
+    """
+    Modo serviço: observa a `pasta` dos relatórios (polling a cada `intervalo` segundos) e processa
+    cada .zip assim que ele fica completo (tamanho e data sem mudar por `estabilidade` segundos,
+    ZIP íntegro e, no Windows, sem outro processo com o arquivo em uso). O .zip vai para a pasta do mês em `base`/{cliente}_{AAAA-MM}/relatorios
+    (o último de cada tipo), só as abas que dependem dele são refeitas com coletaZip_compliance /
+    coletaZip_indices e o Excel {cliente}_base_dados_{data}_zip.xlsx, o checkpoint e o armazém do
+    mês são atualizados. Um .zip com o mesmo sha256 de um já processado é só removido da pasta.
+    """
+    def __init__(self, pasta, cliente, pasta_saida=None, referencia=None, base="execucoes",
+                 armazem=None, intervalo=1.0, estabilidade=2.0):
+        self.pasta = pasta or "."
+        self.cliente = cliente
+        self.pasta_saida = pasta_saida
+        self.referencia = referencia
+        self.base = base
+        self.armazem = armazem
+        self.intervalo = intervalo
+        self.estabilidade = estabilidade
+        self.caminho_registro = os.path.join(base, "servico_processados.json")
+        os.makedirs(base, exist_ok=True)
+        self.processados = {}
+        if os.path.exists(self.caminho_registro):
+            with open(self.caminho_registro, encoding="utf-8") as f:
+                self.processados = json.load(f)
+        # caminho -> ((tamanho, mtime), desde quando está assim)
+        self._vistos = {}
+        self._ignorados = set()
+        # caminho -> (tamanho, mtime) do .zip cujo processamento falhou: só tenta de novo se ele mudar
+        self._falhas = {}
+        # mês (AAAA-MM) -> {aba: DataFrame já com ano_mes_ref} e -> DiretorioExecucao
+        self._abas = {}
+        self._diretorios = {}
+        self._pendentes = set()
+
+    # ---------- laço ----------
+    def executa(self, ciclos=None):
+        """Observa a pasta até Ctrl+C (ou por `ciclos` varreduras)."""
+        print(f"[servico] observando {os.path.abspath(self.pasta)} a cada {self.intervalo:g}s "
+              f"(Ctrl+C encerra)")
+        ciclo = 0
+        try:
+            while ciclos is None or ciclo < ciclos:
+                ciclo += 1
+                for caminho in self.prontos():
+                    try:
+                        self.processa(caminho)
+                    except Exception as e:
+                        print(f"[ERRO] [servico] falha ao processar {os.path.basename(caminho)}: "
+                              f"{e.__class__.__name__}: {e}")
+                        self._falhas[caminho] = self._assinatura(caminho)
+                for mes in list(self._pendentes):
+                    self._salva(mes)
+                time.sleep(self.intervalo)
+        except KeyboardInterrupt:
+            print("[servico] encerrado pelo usuário")
+
+    def prontos(self):
+        """Os .zip de relatórios da pasta que terminaram de ser gravados."""
+        agora = time.monotonic()
+        try:
+            entradas = [e for e in os.scandir(self.pasta) if e.is_file() and e.name.lower().endswith(".zip")]
+        except OSError as e:
+            print(f"[ERRO] [servico] não foi possível listar a pasta '{self.pasta}': {e}")
+            return []
+
+        prontos = []
+        presentes = set()
+        for entrada in entradas:
+            presentes.add(entrada.path)
+            if tipo_relatorio(entrada.name) is None:
+                if entrada.path not in self._ignorados:
+                    self._ignorados.add(entrada.path)
+                    print(f"[AVISO] [servico] {entrada.name} não é um relatório do book; ignorado")
+                continue
+            estado = entrada.stat()
+            assinatura = (estado.st_size, estado.st_mtime_ns)
+            if self._falhas.get(entrada.path) == assinatura:
+                continue
+            anterior, desde = self._vistos.get(entrada.path, (None, agora))
+            if assinatura != anterior:
+                self._vistos[entrada.path] = (assinatura, agora)
+                continue
+            if estado.st_size and agora - desde >= self.estabilidade and arquivo_completo(entrada.path):
+                prontos.append(entrada.path)
+        for caminho in set(self._vistos) - presentes:
+            del self._vistos[caminho]
+        self._ignorados &= presentes
+        self._falhas = {c: a for c, a in self._falhas.items() if c in presentes}
+        return sorted(prontos)
+
+    # ---------- processamento ----------
+    def processa(self, caminho):
+        """Processa um .zip completo da pasta. Retorna as abas atualizadas (vazio se já processado)."""
+        nome = os.path.basename(caminho)
+        tipo = tipo_relatorio(nome)
+        self._vistos.pop(caminho, None)
+        inicio = time.perf_counter()
+        try:
+            sha = _sha256(caminho)
+        except OSError as e:
+            print(f"[ERRO] [servico] não foi possível ler {nome}: {e}")
+            return []
+
+        anterior = self.processados.get(sha)
+        if anterior:
+            print(f"[servico] {nome}: mesmo conteúdo de {anterior['arquivo']} (processado em "
+                  f"{anterior['em']}); removido sem reprocessar")
+            self._remove(caminho)
+            return []
+
+        # mês de referência calculado a cada .zip: o serviço atravessa a virada do mês
+        referencia = self.referencia or (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+        mes = referencia.strftime("%Y-%m")
+        # métricas novas por .zip: o serviço não acumula etapas indefinidamente
+        metricas.inicia_execucao()
+        with metricas.etapa(f"relatório {tipo}"):
+            pasta_mes = self._pasta_relatorios(mes)
+            if mes not in self._abas:
+                # primeiro .zip do mês neste processo: recupera as abas dos .zip que já estavam lá
+                self._abas[mes] = {}
+                if os.listdir(pasta_mes):
+                    self._atualiza(mes, referencia, ABAS_RELATORIOS)
+
+            # fica só o último .zip de cada tipo na pasta do mês
+            for antigo in os.listdir(pasta_mes):
+                if tipo_relatorio(antigo) == tipo:
+                    os.remove(os.path.join(pasta_mes, antigo))
+            shutil.move(caminho, os.path.join(pasta_mes, nome))
+
+            abas = self._atualiza(mes, referencia, ABAS_POR_TIPO[tipo])
+            self._salva(mes)
+        self.processados[sha] = {"arquivo": nome, "tipo": tipo, "mes": mes,
+                                 "em": datetime.now().isoformat(timespec="seconds")}
+        grava_json(self.caminho_registro, self.processados)
+        print(f"[servico] {nome} ({tipo}) processado em {time.perf_counter() - inicio:.2f}s; "
+              f"abas atualizadas: {', '.join(abas) or 'nenhuma'}")
+        return abas
+
+    def _atualiza(self, mes, referencia, abas):
+        """Refaz `abas` a partir dos .zip da pasta do mês. Retorna as que ficaram com dados."""
+        import pandas as pd
+        from atualizaAba_excel import atualiza_aba
+        from cria_excel_v1 import LivroExcel
+        from coletaZip_compliance import coletaZip_compliance
+        from coletaZip_indices import coletaZip_indices
+
+        data_ref = referencia.strftime("01/%m/%Y")
+        pasta_mes = self._pasta_relatorios(mes)
+        # livro só de passagem: as funções de coleta registram nele e as abas ficam em self._abas
+        livro = LivroExcel(os.devnull, abas)
+        catalogo = CatalogoRelatorios(pasta_mes)
+        try:
+            for aba in abas:
+                if aba == "Indices":
+                    resultado = coletaZip_indices(pasta_mes, livro, self.cliente, data_ref=data_ref, catalogo=catalogo)
+                    if resultado is None:
+                        print("[ERRO] [servico] aba Indices não atualizada")
+                    continue
+                resultado = coletaZip_compliance(pasta_mes, aba, catalogo=catalogo)
+                if isinstance(resultado, pd.DataFrame):
+                    atualiza_aba(livro, aba, resultado, colunas_adicionais=[("ano_mes_ref", data_ref)])
+                else:
+                    print(resultado)
+        finally:
+            catalogo.fecha()
+
+        atualizadas = [aba for aba in abas if livro.dados(aba) is not None]
+        for aba in atualizadas:
+            self._abas[mes][aba] = livro.dados(aba)
+        if atualizadas:
+            self._pendentes.add(mes)
+        return atualizadas
+
+    def _salva(self, mes):
+        """Grava o Excel, o checkpoint e o armazém do mês com as abas em memória."""
+        from cria_excel_v1 import criar_planilha
+
+        abas = self._abas.get(mes) or {}
+        if not abas:
+            self._pendentes.discard(mes)
+            return
+        data_ref = datetime.strptime(mes, "%Y-%m").strftime("01/%m/%Y")
+        livro = criar_planilha(self.cliente, data_ref, pasta_saida=self.pasta_saida,
+                               abas=[aba for aba in ABAS_RELATORIOS if aba in abas], sufixo="_zip")
+        for aba, dados in abas.items():
+            livro.registra(aba, dados)
+        try:
+            livro.salva()
+        except Exception:
+            # ex.: o Excel está aberto; tenta de novo na próxima varredura
+            print(f"[AVISO] [servico] {livro.arquivo} não foi gravado; nova tentativa em {self.intervalo:g}s")
+            return
+        self._pendentes.discard(mes)
+
+        # checkpoint do mês: um `run --resume` depois só refaz as etapas da API
+        checkpoints = self._diretorio(mes)
+        for aba, dados in abas.items():
+            checkpoints.salva(aba, dados)
+        if self.armazem:
+            try:
+                from armazem import Armazem
+                with Armazem(self.armazem) as banco:
+                    banco.grava_livro(livro, self.cliente, data_ref)
+            except Exception as e:
+                print(f"[ERRO] [servico] Falha ao gravar o armazém {self.armazem}: {e}")
+
+    # ---------- Internos ----------
+    def _diretorio(self, mes):
+        """DiretorioExecucao do mês (o mesmo do `run`), sem descartar as etapas já concluídas."""
+        if mes not in self._diretorios:
+            self._diretorios[mes] = DiretorioExecucao(self.base, self.cliente, mes, retomar=True)
+        return self._diretorios[mes]
+
+    def _pasta_relatorios(self, mes):
+        pasta = self._diretorio(mes).pasta_relatorios
+        os.makedirs(pasta, exist_ok=True)
+        return pasta
+
+    @staticmethod
+    def _assinatura(caminho):
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            return None
+        return estado.st_size, estado.st_mtime_ns
+
+    @staticmethod
+    def _remove(caminho):
+        try:
+            os.remove(caminho)
+        except OSError as e:
+            print(f"[AVISO] [servico] Não foi possível deletar {caminho}: {e}")
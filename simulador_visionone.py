@@ -0,0 +1,407 @@
+"""
+Simulador local da API do Vision One para medir o book sem tenant e sem token reais.
+
+Responde aos endpoints usados pelos coletores:
+  - GET  /beta/xdr/workbench/alerts (paginação por nextLink)
+  - POST /v3.0/endpointSecurity/endpoints/export e /beta/asrm/vulnerableDevices/export
+    (202 + Operation-Location, polling com porcentagem e URL de download "pré-assinada")
+  - GET  /sim/downloads/<job>.zip (aceita Range)
+Gera os dados sinteticamente, na escala pedida, e pode injetar latência e falhas (429/503).
+
+Uso avulso:
+    python simulador_visionone.py --alertas 5000 --endpoints 2000 --porta 8080
+"""
+import io
+import os
+import json
+import time
+import random
+import zipfile
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+FORMATO_DATA = "%Y-%m-%dT%H:%M:%SZ"
+
+# escalas prontas para o benchmark
+ESCALAS = {
+    "pequena": {"alertas": 500, "endpoints": 300, "dispositivos_vulneraveis": 200, "cves_por_dispositivo": 5},
+    "media": {"alertas": 5_000, "endpoints": 5_000, "dispositivos_vulneraveis": 3_000, "cves_por_dispositivo": 15},
+    "grande": {"alertas": 30_000, "endpoints": 40_000, "dispositivos_vulneraveis": 25_000, "cves_por_dispositivo": 30},
+}
+
+
+class SimuladorVisionOne:
+    """
+    Servidor HTTP local que imita a API do Vision One.
+    Use como context manager ou com iniciar()/parar(); `url` é a url_region a passar para os coletores.
+    """
+    def __init__(self, alertas=500, endpoints=300, dispositivos_vulneraveis=200, cves_por_dispositivo=5,
+                 tamanho_pagina=200, duracao_export=3.0, arquivos_por_export=1,
+                 latencia=0.0, taxa_falhas=0.0, semente=42, porta=0):
+        self.alertas = alertas
+        self.endpoints = endpoints
+        self.dispositivos_vulneraveis = dispositivos_vulneraveis
+        self.cves_por_dispositivo = cves_por_dispositivo
+        self.tamanho_pagina = tamanho_pagina
+        self.duracao_export = duracao_export
+        self.arquivos_por_export = arquivos_por_export
+        self.latencia = latencia
+        self.taxa_falhas = taxa_falhas
+        self.semente = semente
+        self.porta = porta
+
+        self._rnd = random.Random(semente)
+        self._trava = threading.Lock()
+        self._jobs = {}
+        self._zips = {}
+        self._lista_alertas = None
+        self._servidor = None
+        self._thread = None
+        self.requisicoes = 0
+        self.falhas_injetadas = 0
+
+    # ---------- ciclo de vida ----------
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._servidor.server_port}/"
+
+    def iniciar(self):
+        simulador = self
+
+        class _Handler(_Requisicao):
+            sim = simulador
+
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", self.porta), _Handler)
+        self._servidor.daemon_threads = True
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name="simulador", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def parar(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        self.iniciar()
+        return self
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    # ---------- dados sintéticos ----------
+    def _alertas(self):
+        with self._trava:
+            if self._lista_alertas is None:
+                rnd = random.Random(self.semente)
+                fim = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                inicio = (fim - timedelta(days=1)).replace(day=1)
+                segundos = int((fim - inicio).total_seconds())
+                lista = []
+                for i in range(self.alertas):
+                    criado = inicio + timedelta(seconds=rnd.randrange(segundos))
+                    lista.append(_alerta(rnd, i, criado))
+                lista.sort(key=lambda a: a["createdDateTime"])
+                self._lista_alertas = lista
+            return self._lista_alertas
+
+    def _zip_export(self, tipo):
+        """ZIP do export (gerado uma vez por tipo e reaproveitado)."""
+        with self._trava:
+            if tipo not in self._zips:
+                rnd = random.Random(f"{self.semente}-{tipo}")
+                if tipo == "inventory":
+                    itens = [_endpoint(rnd, i) for i in range(self.endpoints)]
+                else:
+                    itens = [_dispositivo_vulneravel(rnd, i, self.cves_por_dispositivo)
+                             for i in range(self.dispositivos_vulneraveis)]
+                buffer = io.BytesIO()
+                partes = max(1, self.arquivos_por_export)
+                with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+                    for p in range(partes):
+                        fatia = itens[p::partes]
+                        z.writestr(f"{tipo}_{p:03d}.json", json.dumps({"items": fatia}))
+                self._zips[tipo] = buffer.getvalue()
+            return self._zips[tipo]
+
+    # ---------- jobs de exportação ----------
+    def _novo_job(self, tipo):
+        with self._trava:
+            job_id = f"{tipo}-{len(self._jobs) + 1:04d}-{self._rnd.getrandbits(48):012x}"
+            self._jobs[job_id] = {"tipo": tipo, "inicio": time.monotonic()}
+        return job_id
+
+    def _status_job(self, job_id):
+        job = self._jobs.get(job_id)
+        if not job:
+            return None
+        decorrido = time.monotonic() - job["inicio"]
+        if decorrido < self.duracao_export:
+            return {"status": "running", "percentage": int(100 * decorrido / self.duracao_export)}
+        assinatura = urlencode({"X-Amz-Algorithm": "AWS4-HMAC-SHA256", "X-Amz-Signature": job_id})
+        return {
+            "status": "succeeded",
+            "percentage": 100,
+            "resourceLocation": f"{self.url}sim/downloads/{job['tipo']}.zip?{assinatura}",
+        }
+
+    def _deve_falhar(self):
+        if self.taxa_falhas <= 0:
+            return False
+        with self._trava:
+            falha = self._rnd.random() < self.taxa_falhas
+            self.falhas_injetadas += int(falha)
+        return falha
+
+
+class _Requisicao(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    sim = None
+
+    def log_message(self, *args):
+        pass
+
+    def _responde(self, codigo, corpo=b"", cabecalhos=None):
+        if isinstance(corpo, (dict, list)):
+            corpo = json.dumps(corpo).encode("utf-8")
+            cabecalhos = {"Content-Type": "application/json", **(cabecalhos or {})}
+        self.send_response(codigo)
+        for chave, valor in (cabecalhos or {}).items():
+            self.send_header(chave, valor)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _preambulo(self, injeta_falha=True):
+        """Conta, aplica latência e decide se a requisição falha. Retorna True se já respondeu."""
+        sim = self.sim
+        with sim._trava:
+            sim.requisicoes += 1
+        if sim.latencia:
+            time.sleep(sim.latencia * random.uniform(0.5, 1.5))
+        if injeta_falha and sim._deve_falhar():
+            if random.random() < 0.5:
+                self._responde(429, {"error": "TooManyRequests"}, {"Retry-After": "1"})
+            else:
+                self._responde(503, {"error": "ServiceUnavailable"})
+            return True
+        return False
+
+    def do_POST(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        if tamanho:
+            self.rfile.read(tamanho)
+        if self._preambulo(injeta_falha=False):
+            return
+        caminho = urlparse(self.path).path
+        if caminho.endswith("/v3.0/endpointSecurity/endpoints/export"):
+            tipo = "inventory"
+        elif caminho.endswith("/beta/asrm/vulnerableDevices/export"):
+            tipo = "vulns"
+        else:
+            return self._responde(404, {"error": "NotFound"})
+        job_id = self.sim._novo_job(tipo)
+        self._responde(202, b"", {"Operation-Location": f"{self.sim.url}v3.0/sim/tasks/{job_id}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        caminho = url.path
+
+        if caminho.startswith("/sim/downloads/"):
+            if self._preambulo(injeta_falha=False):
+                return
+            return self._download(caminho.rsplit("/", 1)[1].removesuffix(".zip"))
+
+        if self._preambulo():
+            return
+
+        if caminho.endswith("/beta/xdr/workbench/alerts"):
+            return self._alertas(parse_qs(url.query))
+        if "/v3.0/sim/tasks/" in caminho:
+            status = self.sim._status_job(caminho.rsplit("/", 1)[1])
+            return self._responde(200, status) if status else self._responde(404, {"error": "NotFound"})
+        self._responde(404, {"error": "NotFound"})
+
+    def _alertas(self, query):
+        inicio = query.get("startDateTime", [""])[0]
+        fim = query.get("endDateTime", ["9999"])[0]
+        pulo = int(query.get("skip", ["0"])[0])
+        selecionados = [a for a in self.sim._alertas() if inicio <= a["createdDateTime"] <= fim]
+        pagina = selecionados[pulo:pulo + self.sim.tamanho_pagina]
+        corpo = {"totalCount": len(selecionados), "count": len(pagina), "items": pagina}
+        if pulo + self.sim.tamanho_pagina < len(selecionados):
+            proxima = urlencode({"startDateTime": inicio, "endDateTime": fim,
+                                 "skip": pulo + self.sim.tamanho_pagina})
+            corpo["nextLink"] = f"{self.sim.url}beta/xdr/workbench/alerts?{proxima}"
+        self._responde(200, corpo)
+
+    def _download(self, tipo):
+        if tipo not in ("inventory", "vulns"):
+            return self._responde(404, {"error": "NotFound"})
+        dados = self.sim._zip_export(tipo)
+        faixa = self.headers.get("Range", "")
+        if faixa.startswith("bytes="):
+            inicio = int(faixa[6:].split("-")[0] or 0)
+            return self._responde(206, dados[inicio:], {
+                "Accept-Ranges": "bytes",
+                "Content-Type": "application/zip",
+                "Content-Range": f"bytes {inicio}-{len(dados) - 1}/{len(dados)}",
+            })
+        self._responde(200, dados, {"Accept-Ranges": "bytes", "Content-Type": "application/zip"})
+
+
+# ---------- geradores de registros ----------
+SEVERIDADES = ["low", "medium", "high", "critical"]
+MODELOS = ["Possible Credential Dumping", "Suspicious PowerShell", "Ransomware Behavior",
+           "Lateral Movement via SMB", "Phishing Link Clicked", "Unusual Logon"]
+SISTEMAS = [("Windows", "10.0.19045"), ("Windows", "10.0.22631"), ("Windows Server", "2019"),
+            ("Linux", "Ubuntu 22.04"), ("Linux", "RHEL 8.9"), ("macOS", "14.4")]
+
+
+def _alerta(rnd, i, criado):
+    return {
+        "schemaVersion": "1.12",
+        "id": f"WB-9002-{criado:%Y%m%d}-{i:06d}",
+        "investigationStatus": rnd.choice(["New", "In Progress", "Closed"]),
+        "status": rnd.choice(["Open", "Closed"]),
+        "investigationResult": rnd.choice(["No Findings", "True Positive", "Benign True Positive"]),
+        "workbenchLink": f"https://portal.xdr.trendmicro.com/index.html#/workbench?workbenchId={i}",
+        "alertProvider": "SAE",
+        "modelId": f"{rnd.getrandbits(64):016x}",
+        "model": rnd.choice(MODELOS),
+        "modelType": "preset",
+        "score": rnd.randint(1, 100),
+        "severity": rnd.choice(SEVERIDADES),
+        "createdDateTime": criado.strftime(FORMATO_DATA),
+        "updatedDateTime": (criado + timedelta(hours=rnd.randint(0, 72))).strftime(FORMATO_DATA),
+        "ownerIds": [],
+        "impactScope": {
+            "desktopCount": rnd.randint(0, 5), "serverCount": rnd.randint(0, 2), "accountCount": rnd.randint(0, 3),
+            "entities": [{"entityType": "host", "entityValue": {"name": f"host{rnd.randint(1, 5000)}"},
+                          "relatedIndicatorIds": list(range(rnd.randint(1, 6)))} for _ in range(rnd.randint(1, 4))],
+        },
+        "description": "Alerta sintético gerado pelo simulador",
+        "matchedRules": [{"id": f"{rnd.getrandbits(32):08x}", "name": "Regra sintética",
+                          "matchedFilters": [{"name": "filtro", "mitreTechniqueIds": ["T1059"]}]}],
+        "indicators": [{"id": n, "type": "command_line", "value": "powershell -enc " + "A" * rnd.randint(50, 400)}
+                       for n in range(rnd.randint(1, 6))],
+    }
+
+
+def _endpoint(rnd, i):
+    so, versao = rnd.choice(SISTEMAS)
+    return {
+        "agentGuid": f"{rnd.getrandbits(128):032x}",
+        "endpointName": f"host{i:06d}",
+        "type": "desktop" if so in ("Windows", "macOS") else "server",
+        "osName": so,
+        "osVersion": versao,
+        "osPlatform": so.split()[0].lower(),
+        "lastUsedIp": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+        "ipAddresses": [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"],
+        "eppAgent": {"componentVersion": rnd.choice(["14.0.12980", "14.0.13140", "14.0.13300"]),
+                     "policyName": "Default", "status": rnd.choice(["on", "off"])},
+        "edrSensor": {"connectivity": rnd.choice(["connected", "disconnected"]), "version": "1.2.0.5070"},
+    }
+
+
+def _dispositivo_vulneravel(rnd, i, cves_por_dispositivo):
+    so, versao = rnd.choice(SISTEMAS)
+    cves = []
+    for _ in range(rnd.randint(1, max(1, 2 * cves_por_dispositivo - 1))):
+        numero = rnd.randint(1000, 1000 + 40 * cves_por_dispositivo)
+        cves.append({
+            "id": f"CVE-2024-{numero}",
+            "cvssScore": round(4 + (numero % 60) / 10, 1),
+            "riskLevel": SEVERIDADES[numero % 4],
+            "publishedDateTime": f"2024-{numero % 12 + 1:02d}-15T00:00:00Z",
+            "exploitAttemptCount": rnd.randint(0, 3),
+            "globalExploitActivityLevel": rnd.choice(["low", "medium", "high"]),
+            "mitigationStatus": rnd.choice(["mitigated", "notMitigated"]),
+            "protectionRules": [{"id": f"1{rnd.randint(0, 99999):05d}", "name": "Regra IPS sintética"}],
+            "mitigationOption": {"patch": True, "virtualPatch": rnd.random() < 0.5},
+        })
+    return {
+        "id": f"{rnd.getrandbits(128):032x}",
+        "deviceName": f"host{i:06d}",
+        "ip": [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"],
+        "osName": so,
+        "osVersion": versao,
+        "osPlatform": so.split()[0].lower(),
+        "lastUser": f"user{rnd.randint(1, 3000)}",
+        "cveCount": len(cves),
+        "cveRecords": cves,
+    }
+
+
+def gera_relatorios_zip(pasta, semente=42):
+    """
+    Cria na pasta os .zip dos relatórios agendados (Security Configuration, Risk, Exposure, Attack)
+    no formato lido por coletaZip_compliance e coletaZip_indices.
+    """
+    rnd = random.Random(semente)
+
+    def csv_indice(coluna):
+        linhas = [f"Date,{coluna},Industry average"]
+        for d in range(60):
+            linhas.append(f"2024-01-{d % 28 + 1:02d},{rnd.uniform(20, 80):.2f},{rnd.uniform(20, 80):.2f}")
+        return "\n".join(linhas) + "\n"
+
+    def csv_compliance():
+        linhas = ["Feature name,Total endpoints,Feature enabled"]
+        for recurso in ["Anti-malware", "Web Reputation", "Behavior Monitoring", "Device Control",
+                        "Predictive Machine Learning", "Firewall", "Intrusion Prevention"]:
+            total = rnd.randint(100, 5000)
+            linhas.append(f"{recurso},{total},{rnd.randint(0, total)}")
+        return "\n".join(linhas) + "\n"
+
+    relatorios = {
+        "Executive Security Configuration report.zip": {
+            "csv/Server & Workload Protection.csv": csv_compliance(),
+            "csv/Standard Endpoint Protection.csv": csv_compliance(),
+            "csv/Security Configuration Index.csv": csv_indice("Your organization"),
+        },
+        "Executive Cyber Risk report.zip": {"csv/Cyber Risk Index.csv": csv_indice("Your company")},
+        "Executive Exposure report.zip": {"csv/Exposure Index.csv": csv_indice("Your company")},
+        "Executive Attack report.zip": {"csv/AttackIndex.csv": csv_indice("Your company")},
+    }
+    caminhos = []
+    for nome, membros in relatorios.items():
+        caminho = os.path.join(pasta, nome)
+        with zipfile.ZipFile(caminho, "w", zipfile.ZIP_DEFLATED) as z:
+            for membro, conteudo in membros.items():
+                z.writestr(membro, conteudo)
+        caminhos.append(caminho)
+    return caminhos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulador local da API do Vision One")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    parser.add_argument("--alertas", type=int)
+    parser.add_argument("--endpoints", type=int)
+    parser.add_argument("--dispositivos-vulneraveis", type=int)
+    parser.add_argument("--cves-por-dispositivo", type=int)
+    parser.add_argument("--duracao-export", type=float, default=3.0)
+    parser.add_argument("--latencia", type=float, default=0.0)
+    parser.add_argument("--taxa-falhas", type=float, default=0.0)
+    parser.add_argument("--porta", type=int, default=8080)
+    args = parser.parse_args()
+
+    escala = dict(ESCALAS[args.escala])
+    for chave in ("alertas", "endpoints", "dispositivos_vulneraveis", "cves_por_dispositivo"):
+        if getattr(args, chave) is not None:
+            escala[chave] = getattr(args, chave)
+
+    with SimuladorVisionOne(**escala, duracao_export=args.duracao_export, latencia=args.latencia,
+                            taxa_falhas=args.taxa_falhas, porta=args.porta) as sim:
+        print(f"simulador ouvindo em {sim.url} — use url_region={sim.url} no .env (Ctrl+C para sair)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,115 @@
+import os
+import time
+import zipfile
+
+import cache_artefatos
+from cache_artefatos import CacheArtefatos
+from catalogo_relatorios import CatalogoRelatorios
+
+
+def _arquivo(pasta, nome, conteudo):
+    caminho = os.path.join(pasta, nome)
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+    return caminho
+
+
+def _objetos(cache):
+    return sorted(os.listdir(cache.pasta_objetos))
+
+
+def test_entrada_expira_depois_do_ttl(tmp_path, monkeypatch):
+    cache = CacheArtefatos(str(tmp_path / "cache"), ttl_horas=1)
+    chave = cache.chave("export", "https://api/vulns")
+    cache.guarda(chave, _arquivo(tmp_path, "a.zip", b"a" * 100), "export a")
+    assert cache.caminho(chave) is not None
+
+    agora = time.time()
+    monkeypatch.setattr(cache_artefatos.time, "time", lambda: agora + 3601)
+    assert cache.caminho(chave) is None
+
+    # limpa() apaga a entrada vencida e, passada a carência, o objeto que ficou sem entrada
+    monkeypatch.setattr(cache_artefatos.time, "time", lambda: agora + 3601 + cache_artefatos.CARENCIA_ORFAOS + 1)
+    cache.limpa()
+    assert os.listdir(cache.pasta_entradas) == []
+    assert _objetos(cache) == []
+
+
+def test_lru_apaga_o_menos_usado_e_mantem_o_novo(tmp_path):
+    cache = CacheArtefatos(str(tmp_path / "cache"), max_mb=3000 / (1024 * 1024))
+    chaves = {}
+    for nome in ("a", "b", "c"):
+        chaves[nome] = cache.chave("export", nome)
+        cache.guarda(chaves[nome], _arquivo(tmp_path, nome, nome.encode() * 1000), nome)
+    caminhos = {nome: cache.caminho(chave) for nome, chave in chaves.items()}
+    # a, b, c usados em ordem; depois `a` é lido de novo e `b` passa a ser o menos usado
+    for i, nome in enumerate(("a", "b", "c")):
+        os.utime(caminhos[nome], (1000 + i, 1000 + i))
+    assert cache.caminho(chaves["a"]) == caminhos["a"]
+
+    # o novo objeto passa do limite: sai só o `b`
+    cache.guarda(cache.chave("export", "d"), _arquivo(tmp_path, "d", b"d" * 1000), "d")
+    assert not os.path.exists(caminhos["b"])
+    assert os.path.exists(caminhos["a"]) and os.path.exists(caminhos["c"])
+    assert cache.caminho(cache.chave("export", "d")) is not None
+    assert cache.removidos == 1
+
+    # mesmo sendo o mais antigo pelo mtime, o objeto recém-guardado não é apagado
+    antigo = _arquivo(tmp_path, "e", b"e" * 2500)
+    os.utime(antigo, (1, 1))
+    cache.guarda(cache.chave("export", "e"), antigo, "e")
+    assert cache.caminho(cache.chave("export", "e")) is not None
+    assert cache.tamanho()[0] <= 3000
+
+
+def test_conteudo_igual_em_duas_chaves_fica_uma_vez(tmp_path):
+    cache = CacheArtefatos(str(tmp_path / "cache"))
+    origem = _arquivo(tmp_path, "x.zip", b"mesmo conteudo" * 50)
+    primeira, segunda = cache.chave("export", "um"), cache.chave("workbench", "dois")
+    cache.guarda(primeira, origem, "um")
+    with open(origem, "rb") as arquivo:
+        cache.guarda(segunda, arquivo, "dois")
+        # arquivo aberto volta ao início para quem o passou
+        assert arquivo.tell() == 0
+
+    assert len(_objetos(cache)) == 1
+    assert len(os.listdir(cache.pasta_entradas)) == 2
+    assert cache.caminho(primeira) == cache.caminho(segunda)
+
+
+def test_escopo_separa_tenants_e_nao_grava_o_token(tmp_path):
+    pasta = str(tmp_path / "cache")
+    token = "token-secreto-123"
+    cache = CacheArtefatos(pasta, escopo=("cliente", "https://api", token))
+    outro = CacheArtefatos(pasta, escopo=("cliente", "https://api", "outro-token"))
+    chave = cache.chave("export", "https://api/vulns")
+    assert chave != outro.chave("export", "https://api/vulns")
+
+    cache.guarda(chave, _arquivo(tmp_path, "v.zip", b"v" * 10), "export")
+    assert outro.caminho(outro.chave("export", "https://api/vulns")) is None
+    for raiz, _, nomes in os.walk(pasta):
+        for nome in nomes:
+            assert token not in nome
+            with open(os.path.join(raiz, nome), "rb") as f:
+                assert token.encode() not in f.read()
+
+
+def test_catalogo_so_reaproveita_relatorio_do_mesmo_mes(tmp_path):
+    cache = CacheArtefatos(str(tmp_path / "cache"))
+    pasta = tmp_path / "relatorios"
+    pasta.mkdir()
+    caminho = pasta / "Risk_Report.zip"
+    with zipfile.ZipFile(caminho, "w") as z:
+        z.writestr("csv/risk.csv", "a,b\n1,2\n")
+
+    CatalogoRelatorios(str(pasta), cache=cache, referencia="2026-09").fecha()
+    caminho.unlink()
+
+    catalogo = CatalogoRelatorios(str(pasta), cache=cache, referencia="2026-09")
+    assert "risk" in catalogo.do_cache
+    assert catalogo.le_csv("risk", "risk").to_dict("records") == [{"a": 1, "b": 2}]
+    catalogo.fecha()
+    assert CatalogoRelatorios(str(pasta), cache=cache, referencia="2026-10").caminho("risk") is None
+
+    cache.atualizar = True
+    assert CatalogoRelatorios(str(pasta), cache=cache, referencia="2026-09").caminho("risk") is None
@@ -0,0 +1,108 @@
+import json
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from coletaWB import coletaWB, divide_periodo, periodo_mes
+from decodifica_wb import DecodificadorWB
+
+FORMATO = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class _Resposta:
+    def __init__(self, corpo):
+        self.status_code = 200
+        self.content = json.dumps(corpo).encode("utf-8")
+        self.text = self.content.decode()
+
+
+class _ClienteFalso:
+    """Imita /workbench/alerts: filtra por createdDateTime, pagina por nextLink e devolve o alerta
+    `fronteira` em toda janela que toca o seu período (como a API faz com alertas atualizados)."""
+    def __init__(self, alertas, tamanho_pagina=3):
+        self.alertas = alertas
+        self.tamanho_pagina = tamanho_pagina
+        self.requisicoes = []
+
+    def get(self, url, params=None):
+        self.requisicoes.append(url if params is None else (url, tuple(sorted(params.items()))))
+        if params is None:
+            consulta = {k: v[0] for k, v in parse_qs(urlparse(url).query).items()}
+        else:
+            consulta = dict(params, pagina="0")
+        inicio, fim, pagina = consulta["startDateTime"], consulta["endDateTime"], int(consulta["pagina"])
+        selecionados = [a for a in self.alertas
+                        if inicio <= a["createdDateTime"] <= fim or a["id"] == "fronteira"]
+        fatia = selecionados[pagina * self.tamanho_pagina:(pagina + 1) * self.tamanho_pagina]
+        corpo = {"items": fatia}
+        if (pagina + 1) * self.tamanho_pagina < len(selecionados):
+            corpo["nextLink"] = (f"https://api/beta/xdr/workbench/alerts?startDateTime={inicio}"
+                                 f"&endDateTime={fim}&pagina={pagina + 1}")
+        return _Resposta(corpo)
+
+
+def _alertas(referencia, quantidade=40):
+    inicio, _ = periodo_mes(referencia)
+    t0 = datetime.strptime(inicio, FORMATO)
+    alertas = [{"id": f"wb-{i}", "severity": "high", "score": i,
+                "createdDateTime": (t0 + timedelta(hours=17 * i)).strftime(FORMATO),
+                "impactScope": {"desktopCount": i}}
+               for i in range(quantidade)]
+    alertas.append({"id": "fronteira", "severity": "low", "score": 1,
+                    "createdDateTime": (t0 + timedelta(days=3)).strftime(FORMATO)})
+    return alertas
+
+
+@pytest.mark.parametrize("fatias", [1, 2, 7, 31, 1000])
+def test_divide_periodo_cobre_o_mes_sem_sobreposicao(fatias):
+    inicio, fim = periodo_mes(date(2026, 2, 1))
+    janelas = divide_periodo(inicio, fim, fatias)
+
+    assert len(janelas) == fatias
+    assert janelas[0][0] == inicio and janelas[-1][1] == fim
+    for (a, b), (proximo, _) in zip(janelas, janelas[1:]):
+        assert a <= b
+        # contíguas: a próxima começa um segundo depois do fim da anterior
+        assert datetime.strptime(proximo, FORMATO) - datetime.strptime(b, FORMATO) == timedelta(seconds=1)
+
+
+def test_divide_periodo_nao_passa_de_uma_janela_por_segundo():
+    assert divide_periodo("2026-01-01T00:00:00Z", "2026-01-01T00:00:02Z", 10) == [
+        ("2026-01-01T00:00:00Z", "2026-01-01T00:00:00Z"),
+        ("2026-01-01T00:00:01Z", "2026-01-01T00:00:01Z"),
+        ("2026-01-01T00:00:02Z", "2026-01-01T00:00:02Z"),
+    ]
+
+
+@pytest.mark.parametrize("fatias", [4, 9])
+def test_janelas_dao_o_mesmo_dataframe_a_menos_da_ordem(fatias):
+    referencia = date(2026, 9, 1)
+    alertas = _alertas(referencia)
+
+    sequencial = coletaWB("https://api", "t", cliente=_ClienteFalso(alertas), referencia=referencia)
+    cliente = _ClienteFalso(alertas)
+    paralelo = coletaWB("https://api", "t", cliente=cliente, fatias=fatias, concorrencia=3, referencia=referencia)
+
+    # o alerta da fronteira vem de todas as janelas e fica uma vez só
+    assert (paralelo["id"] == "fronteira").sum() == 1
+    assert len(paralelo) == len(alertas)
+    ordena = lambda df: df.sort_values("id").reset_index(drop=True)
+    assert list(paralelo.columns) == list(sequencial.columns)
+    assert ordena(paralelo).equals(ordena(sequencial))
+    # cada página pedida uma vez: a busca antecipada pelo nextLink não gera requisição extra
+    assert len(cliente.requisicoes) == len(set(cliente.requisicoes))
+
+
+@pytest.mark.parametrize("usar_msgspec", [True, False])
+def test_proximo_link_antecipa_o_next_link_da_pagina(usar_msgspec):
+    decodificador = DecodificadorWB(usar_msgspec=usar_msgspec)
+    paginas = [
+        {"items": [{"id": "a", "description": '"nextLink": "falso"'}], "nextLink": "https://api/p2"},
+        {"nextLink": "https://api/p3", "items": [{"id": "b"}]},
+        {"items": [{"id": "c"}], "nextLink": None},
+        {"items": []},
+    ]
+    for pagina in paginas:
+        conteudo = json.dumps(pagina).encode("utf-8")
+        assert decodificador.proximo_link(conteudo) == decodificador.decodifica(conteudo)[1]
@@ -0,0 +1,144 @@
+import random
+
+import pandas as pd
+
+from def_vulns import achata_cves
+
+
+def _export_sintetico(dispositivos=200, max_cves=8, semente=7):
+    """Itens no formato do export beta/asrm/vulnerableDevices."""
+    rnd = random.Random(semente)
+    items = []
+    for i in range(dispositivos):
+        cves = []
+        for j in range(rnd.randint(1, max_cves)):
+            cves.append({
+                "id": f"CVE-2024-{rnd.randint(1000, 1100)}",
+                "cvssScore": round(rnd.uniform(1, 10), 1),
+                "riskLevel": rnd.choice(["low", "medium", "high"]),
+                "publishedDateTime": "2024-05-01T00:00:00Z",
+                "protectionRules": [{"id": f"rule-{j}"}],
+                "mitigationOption": {"patch": True},
+                "exploitAttemptCount": rnd.randint(0, 3),
+            })
+        items.append({
+            "id": f"dev-{i}",
+            "deviceName": f"host{i}",
+            "ip": [f"10.0.0.{i % 255}"],
+            "osName": rnd.choice(["Windows", "Linux"]),
+            "cveCount": len(cves),
+            "cveRecords": cves,
+        })
+    return items
+
+
+def _achata_legado(items):
+    """Implementação anterior de coleta_vulns: explode + apply(pd.Series)."""
+    for item in items:
+        item.pop("ip", None)
+        for cve in item.get("cveRecords", []):
+            for campo in ("protectionRules", "mitigationOption"):
+                cve.pop(campo, None)
+    df = pd.DataFrame(items)
+    df = df.explode("cveRecords").reset_index(drop=True)
+    return pd.concat([df.drop(columns=["cveRecords"]), df["cveRecords"].apply(pd.Series)], axis=1)
+
+
+def test_achata_cves_igual_ao_legado():
+    esperado = _achata_legado(_export_sintetico())
+    obtido = achata_cves(_export_sintetico())
+
+    assert list(obtido.columns) == list(esperado.columns)
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def test_achata_cves_remove_campos_e_mantem_dispositivo_sem_cve():
+    items = _export_sintetico(dispositivos=3)
+    items[1]["cveRecords"] = []
+
+    df = achata_cves(items)
+
+    assert not {"ip", "protectionRules", "mitigationOption"} & set(df.columns)
+    sem_cve = df[df.iloc[:, 0] == "dev-1"]
+    assert len(sem_cve) == 1
+    assert sem_cve["cvssScore"].isna().all()
+
+
+def test_achata_cves_sem_cve_records():
+    df = achata_cves([{"id": "dev-0", "ip": ["10.0.0.1"], "osName": "Linux"}])
+
+    assert list(df.columns) == ["id", "osName"]
+
+
+def test_normaliza_cves_reconstroi_o_achatado():
+    from def_vulns import normaliza_cves
+
+    dispositivos, catalogo, ligacao = normaliza_cves(_export_sintetico()).values()
+    plano = achata_cves(_export_sintetico())
+    # id do dispositivo e id da CVE, as duas colunas "id" do achatado
+    segundo_id = list(plano.columns).index("id", 1)
+    plano.columns = ["deviceId", *plano.columns[1:segundo_id], "cveId", *plano.columns[segundo_id + 1:]]
+
+    assert dispositivos["id"].is_unique and catalogo["id"].is_unique
+    assert len(ligacao) == len(plano)
+    remontado = (ligacao.merge(dispositivos.rename(columns={"id": "deviceId"}), on="deviceId")
+                 .merge(catalogo.rename(columns={"id": "cveId"}), on="cveId"))
+    pd.testing.assert_frame_equal(remontado[plano.columns], plano)
+
+
+def test_normaliza_cves_separa_campos_por_dispositivo():
+    from def_vulns import normaliza_cves
+
+    items = _export_sintetico(dispositivos=3)
+    items[0]["cveRecords"] = [{"id": "CVE-1", "cvssScore": 9.8, "mitigationStatus": "mitigated"}]
+    items[1]["cveRecords"] = [{"id": "CVE-1", "cvssScore": 9.8, "mitigationStatus": "notMitigated"}]
+    items[2]["cveRecords"] = []
+
+    dispositivos, catalogo, ligacao = normaliza_cves(items).values()
+
+    assert len(dispositivos) == 3
+    assert list(catalogo.columns) == ["id", "cvssScore"]
+    assert list(ligacao.columns) == ["deviceId", "cveId", "mitigationStatus"]
+    assert ligacao["deviceId"].tolist() == ["dev-0", "dev-1"]
+
+
+def test_fluxo_igual_a_coleta_vulns_com_campo_depois_da_amostra(tmp_path):
+    import io
+    import json
+    import zipfile
+    from urllib.parse import urljoin
+
+    from atualizaAba_excel import atualiza_aba
+    from cache_artefatos import CacheArtefatos
+    from cria_excel_v1 import LivroExcel, LivroExcelFluxo
+    from def_vulns import AMOSTRA_COLUNAS, coleta_vulns, coleta_vulns_fluxo
+
+    items = _export_sintetico(dispositivos=AMOSTRA_COLUNAS + 100, max_cves=3)
+    for item in items:
+        item.update(osVersion="10", osPlatform="x64")
+        for cve in item["cveRecords"]:
+            cve["mitigationStatus"] = "notMitigated"
+    # campos declarados que só aparecem depois da amostra usada para as colunas
+    items[AMOSTRA_COLUNAS + 10]["lastUser"] = "usuario"
+    items[AMOSTRA_COLUNAS + 20]["cveRecords"][0]["globalExploitActivityLevel"] = "high"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        for parte, inicio in enumerate(range(0, len(items), 250)):
+            z.writestr(f"vulnerableDevices_{parte}.json", json.dumps({"items": items[inicio:inicio + 250]}))
+    buffer.seek(0)
+
+    url_region = "https://api.exemplo"
+    cache = CacheArtefatos(str(tmp_path / "cache"))
+    cache.guarda(cache.chave("export", urljoin(url_region + "/", "beta/asrm/vulnerableDevices/export")), buffer, "export")
+
+    livro = LivroExcel(tmp_path / "dataframe.xlsx", ["vulnerabilidades"])
+    atualiza_aba(livro, "vulnerabilidades", coleta_vulns(url_region, "token", cache=cache))
+    livro.salva()
+    fluxo = LivroExcelFluxo(tmp_path / "fluxo.xlsx", ["vulnerabilidades"])
+    coleta_vulns_fluxo(url_region, "token", fluxo, cache=cache)
+    fluxo.salva()
+
+    esperado = pd.read_excel(tmp_path / "dataframe.xlsx")
+    obtido = pd.read_excel(tmp_path / "fluxo.xlsx")
+    assert {"lastUser", "globalExploitActivityLevel"} <= set(obtido.columns)
+    pd.testing.assert_frame_equal(obtido, esperado)
@@ -0,0 +1,74 @@
+import requests
+
+import download_zip
+from download_zip import baixa_arquivo
+
+CONTEUDO = bytes(range(256)) * 40
+
+
+class _Resposta:
+    def __init__(self, status_code, corpo, cabecalhos=None, cai_apos=None):
+        self.status_code = status_code
+        self.headers = {"Content-Length": str(len(corpo)), "Accept-Ranges": "bytes", **(cabecalhos or {})}
+        self.text = ""
+        self._corpo = corpo
+        self._cai_apos = cai_apos
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size):
+        for inicio in range(0, len(self._corpo), chunk_size):
+            if self._cai_apos is not None and inicio >= self._cai_apos:
+                raise requests.exceptions.ChunkedEncodingError("conexão caiu")
+            yield self._corpo[inicio:inicio + chunk_size]
+
+
+class _Sessao:
+    def __init__(self, respostas):
+        self.respostas = list(respostas)
+        self.ranges = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.ranges.append((headers or {}).get("Range"))
+        return self.respostas.pop(0)
+
+
+def _baixa(sessao, monkeypatch, **kwargs):
+    esperas = []
+    monkeypatch.setattr(download_zip.time, "sleep", esperas.append)
+    with baixa_arquivo("https://s3/x.zip", sessao=sessao, tamanho_bloco=1000, **kwargs) as arquivo:
+        return arquivo.read(), esperas
+
+
+def test_retoma_com_range_e_espera_com_backoff(monkeypatch):
+    total = len(CONTEUDO)
+    sessao = _Sessao([
+        _Resposta(503, b""),
+        _Resposta(200, CONTEUDO, cai_apos=3000),
+        _Resposta(206, CONTEUDO[3000:], {"Content-Range": f"bytes 3000-{total - 1}/{total}"}),
+    ])
+    conteudo, esperas = _baixa(sessao, monkeypatch, espera_base=1.0, espera_max=30.0)
+
+    assert conteudo == CONTEUDO
+    assert sessao.ranges == [None, None, "bytes=3000-"]
+    # backoff exponencial com jitter: 0.5-1 s e depois 1-2 s
+    assert len(esperas) == 2
+    assert 0.5 <= esperas[0] <= 1.0 and 1.0 <= esperas[1] <= 2.0
+
+
+def test_faixa_diferente_da_pedida_recomeca_do_zero(monkeypatch):
+    total = len(CONTEUDO)
+    sessao = _Sessao([
+        _Resposta(200, CONTEUDO, cai_apos=3000),
+        # servidor devolve outra faixa: não pode ser anexada aos 3000 bytes já recebidos
+        _Resposta(206, CONTEUDO[1000:], {"Content-Range": f"bytes 1000-{total - 1}/{total}"}),
+        _Resposta(200, CONTEUDO),
+    ])
+    conteudo, _ = _baixa(sessao, monkeypatch, tentativas=3)
+
+    assert conteudo == CONTEUDO
+    assert sessao.ranges == [None, "bytes=3000-", None]
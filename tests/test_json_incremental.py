@@ -0,0 +1,86 @@
+import io
+import json
+import random
+
+import pytest
+
+from json_incremental import itens, lotes
+
+# escapes (inclusive par substituto), números, literais e aninhamento: cortados em blocos pequenos
+# os valores caem entre um bloco e outro em todas as posições
+DOCUMENTO = (
+    '{"totalCount": 4, "nextLink": "https://x/y?a=1&b=\\"2\\"", "items": [\n'
+    '  {"id": "d\\u00e9v-1", "nome": "a\\\\b\\/c\\n\\t", "emoji": "\\ud83d\\ude00", "n": -12.5e-3},\n'
+    '  {"id": "dev-2", "ok": true, "falso": false, "nada": null, "grande": 1234567890123,\n'
+    '   "cves": [{"id": "CVE-2024-1", "score": 9.8}, {"id": "CVE-2024-2", "score": 10}]},\n'
+    '  [1, 2.0, "três", {}],\n'
+    '  "só texto", 0, 7\n'
+    '], "depois": {"ignorado": [1, 2, 3]}}'
+)
+
+
+def _export_aleatorio(semente):
+    rnd = random.Random(semente)
+    textos = ["", "a", "é", "\"aspas\"", "barra\\", "linha\nnova", "ção", "\U0001f600", "\t"]
+
+    def valor(profundidade):
+        escolha = rnd.randint(0, 7 if profundidade < 3 else 4)
+        if escolha == 0:
+            return rnd.choice(textos) + rnd.choice(textos)
+        if escolha == 1:
+            return rnd.randint(-10 ** 12, 10 ** 12)
+        if escolha == 2:
+            return rnd.uniform(-1e6, 1e6)
+        if escolha == 3:
+            return rnd.choice([True, False, None])
+        if escolha == 4:
+            return rnd.randint(0, 9)
+        if escolha in (5, 6):
+            return {rnd.choice(textos) + str(i): valor(profundidade + 1) for i in range(rnd.randint(0, 4))}
+        return [valor(profundidade + 1) for _ in range(rnd.randint(0, 4))]
+
+    return {"totalCount": 3, "items": [valor(0) for _ in range(30)], "nextLink": None}
+
+
+@pytest.mark.parametrize("tamanho_bloco", [1, 2, 3, 5, 7, 16, 1024])
+def test_itens_igual_ao_json_loads_com_blocos_pequenos(tamanho_bloco):
+    esperado = json.loads(DOCUMENTO)["items"]
+
+    binario = list(itens(io.BytesIO(DOCUMENTO.encode("utf-8")), tamanho_bloco=tamanho_bloco))
+    texto = list(itens(io.StringIO(DOCUMENTO), tamanho_bloco=tamanho_bloco))
+
+    assert binario == esperado
+    assert texto == esperado
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_itens_aleatorios_com_escapes_cortados_entre_blocos(semente):
+    dados = _export_aleatorio(semente)
+    # ensure_ascii gera \uXXXX (e pares substitutos) para serem cortados no meio
+    for ensure_ascii in (True, False):
+        conteudo = json.dumps(dados, ensure_ascii=ensure_ascii).encode("utf-8")
+        for tamanho_bloco in (1, 3, 4, 6, 11):
+            assert list(itens(io.BytesIO(conteudo), tamanho_bloco=tamanho_bloco)) == dados["items"]
+
+
+def test_itens_lista_no_topo_vazia_bom_e_object_hook():
+    assert list(itens(io.BytesIO(b"[]"), tamanho_bloco=1)) == []
+    assert list(itens(io.BytesIO(b'{"items": []}'), tamanho_bloco=1)) == []
+    assert list(itens(io.BytesIO(b"{}"), tamanho_bloco=1)) == []
+    assert list(itens(io.BytesIO(b'{"outra": 1}'), tamanho_bloco=1)) == []
+
+    conteudo = "\ufeff" + json.dumps([{"a": 1}, {"a": 22}, 333])
+    obtido = list(itens(io.BytesIO(conteudo.encode("utf-8")), tamanho_bloco=2,
+                        object_hook=lambda o: tuple(o.items())))
+    assert obtido == [(("a", 1),), (("a", 22),), 333]
+
+
+@pytest.mark.parametrize("conteudo", [b'{"items": [1, 2', b'{"items": [{"a": }]}', b'{"items": [1 2]}', b""])
+def test_itens_json_invalido_gera_value_error(conteudo):
+    with pytest.raises(ValueError):
+        list(itens(io.BytesIO(conteudo), tamanho_bloco=3))
+
+
+def test_lotes():
+    assert list(lotes(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(lotes([], 3)) == []
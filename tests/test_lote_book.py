@@ -0,0 +1,51 @@
+import os
+import multiprocessing
+
+import pandas as pd
+
+from armazem import Armazem
+from lote_book import compartilha_caminhos, le_perfis
+
+
+def _grava(caminho, cliente):
+    dados = pd.DataFrame({"ano_mes_ref": ["01/09/2026"] * 50, "id": range(50), "valor": [cliente] * 50})
+    with Armazem(caminho) as banco:
+        for _ in range(5):
+            banco.grava("alertas_wb", dados, cliente, "2026-09")
+
+
+def test_armazem_e_cache_sao_compartilhados_e_absolutos(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("armazem", raising=False)
+    monkeypatch.delenv("cache", raising=False)
+    manifesto = tmp_path / "perfis" / "clientes.json"
+    manifesto.parent.mkdir()
+    manifesto.write_text('[{"cliente": "a", "url_region": "https://api", "token": "t"},'
+                         ' {"cliente": "b", "url_region": "https://api", "token": "t", "armazem": "b.db"},'
+                         ' {"cliente": "c", "url_region": "https://api", "token": "t", "cache": ""}]',
+                         encoding="utf-8")
+
+    a, b, c = [compartilha_caminhos(p, {"cache": "cache_lote"}) for p in le_perfis(str(manifesto))]
+
+    assert a["armazem"] == str(tmp_path / "armazem_book.db") == c["armazem"]
+    assert a["cache"] == str(tmp_path / "cache_lote") == b["cache"]
+    # valor do perfil é relativo ao manifesto; vazio desliga
+    assert b["armazem"] == str(tmp_path / "perfis" / "b.db")
+    assert c["cache"] == ""
+
+
+def test_processos_gravam_no_mesmo_armazem(tmp_path):
+    caminho = str(tmp_path / "armazem.db")
+    contexto = multiprocessing.get_context("spawn")
+    processos = [contexto.Process(target=_grava, args=(caminho, f"cliente{i}")) for i in range(4)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join(120)
+    assert [p.exitcode for p in processos] == [0] * 4
+
+    with Armazem(caminho) as banco:
+        cargas = banco.cargas()
+        linhas = banco.consulta("SELECT cliente, COUNT(*) AS n FROM alertas_wb GROUP BY cliente")
+    assert sorted(cargas["cliente"]) == [f"cliente{i}" for i in range(4)]
+    assert linhas["n"].tolist() == [50] * 4
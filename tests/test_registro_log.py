@@ -0,0 +1,22 @@
+import glob
+import io
+import os
+import time
+
+from registro_log import RegistroAssincrono
+
+
+def test_rotacao_conta_bytes_gravados(tmp_path):
+    # 1 KB de limite; cada linha tem 100 caracteres acentuados, ~200 bytes em UTF-8
+    registro = RegistroAssincrono(pasta=str(tmp_path), terminal=io.StringIO(), max_mb=1 / 1024,
+                                  intervalo=0.01)
+    for _ in range(8):
+        registro.stream.write("ã" * 100 + "\n")
+        time.sleep(0.05)
+    registro.fecha()
+
+    arquivos = glob.glob(os.path.join(tmp_path, "log_*.log"))
+    assert len(arquivos) > 1
+    # nenhum arquivo passa do limite por mais de um lote
+    assert max(os.path.getsize(a) for a in arquivos) <= 1024 + 8 * 250
+    assert sum(open(a, encoding="utf-8").read().count("ã" * 100) for a in arquivos) == 8
@@ -0,0 +1,54 @@
+import os
+import contextlib
+from datetime import date
+
+import pandas as pd
+
+import main_book
+from armazem import Armazem
+from main_book import executa_book
+from servico_relatorios import ServicoRelatorios
+from simulador_visionone import SimuladorVisionOne, gera_relatorios_zip
+
+
+def _tabelas(caminho_armazem):
+    with Armazem(caminho_armazem) as banco:
+        return {tabela: banco.consulta(f"SELECT * FROM {tabela} ORDER BY 1, 2, 3")
+                for tabela in ("indices", "compliance_swp", "compliance_sep")}
+
+
+def test_run_depois_do_watch_le_os_relatorios_da_pasta_do_mes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    caminho_armazem = str(tmp_path / "armazem.db")
+    monkeypatch.setattr(main_book, "pasta_execucoes", "execucoes")
+    monkeypatch.setattr(main_book, "armazem", caminho_armazem)
+    # sem cache: os relatórios só podem vir da pasta do modo serviço
+    monkeypatch.setattr(main_book, "pasta_cache", "")
+    pasta = tmp_path / "relatorios"
+    pasta.mkdir()
+    referencia = date(2026, 9, 1)
+
+    # watch: cada .zip sai da pasta e vai para execucoes/cli_2026-09/relatorios
+    servico = ServicoRelatorios(str(pasta), "cli", pasta_saida=str(tmp_path / "watch"), referencia=referencia,
+                                base="execucoes", armazem=caminho_armazem)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for caminho in gera_relatorios_zip(str(pasta)):
+            servico.processa(caminho)
+    assert not list(pasta.glob("*.zip"))
+    do_servico = _tabelas(caminho_armazem)
+    assert (do_servico["indices"][["risk", "exposure", "attack", "security"]] > 0).all(axis=None)
+
+    # run simples (sem --resume) do mesmo mês, com a pasta já vazia
+    falhas = {}
+    with SimuladorVisionOne(alertas=20, endpoints=10, dispositivos_vulneraveis=5, cves_por_dispositivo=2,
+                            duracao_export=0.2) as sim, contextlib.redirect_stdout(open(os.devnull, "w")):
+        executa_book("cli", sim.url, "token-simulado", str(pasta), intervalo_polling=1, falhas=falhas,
+                     referencia=referencia, pasta_saida=str(tmp_path / "run"))
+
+    assert falhas == {}
+    do_run = _tabelas(caminho_armazem)
+    for tabela, dados in do_servico.items():
+        colunas = [c for c in dados.columns if c != "gravado_em"]
+        pd.testing.assert_frame_equal(do_run[tabela][colunas], dados[colunas])
+    # os .zip do modo serviço continuam lá para as próximas execuções
+    assert len(os.listdir(tmp_path / "execucoes" / "cli_2026-09" / "relatorios")) == 4